@@ -1,25 +1,35 @@
 from typing import Any, Dict
-from os import urandom
-import re
 from datetime import datetime
-from flask import Flask, request, jsonify, make_response, session, send_file
+from flask import Flask, request, jsonify, session
 from flask_cors import CORS, cross_origin  # type: ignore
 from backend.utils.authentication import check_login, require_session
-from backend.utils.query import (
-    insert_into,
-    query,
-    CHECK_AGENT_LOGIN,
-    CHECK_CUST_LOGIN,
-    CHECK_STAFF_LOGIN,
-    UPDATE_STATUS,
-    STAFF_AIRLINE,
-    TICKET_PRICE,
-    FetchMode,
+from backend.utils.query import insert_into, query, UPDATE_STATUS
+from backend.utils.authentication import DataType, is_user
+from backend.utils.flight import (
+    check_flight_times,
+    describe_flight_error,
+    get_ticket_price,
+    get_ticket_prices,
+    FLIGHT_KEYS,
+)
+from backend.utils.flight_import import get_import_format, import_schedule
+from backend.utils.airports import AIRPORTS, COMPLETION_TYPES
+from backend.utils.flight_index import FLIGHTS
+from backend.utils.itinerary import ITINERARIES, parse_itinerary_search
+from backend.utils.purchase import (
+    parse_bulk_purchase,
+    purchase_ticket,
+    purchase_tickets,
 )
-from backend.utils.authentication import PublicFilters, DataType, is_user
-from backend.utils.flight import get_ticket_price
 from backend.utils.parsing import handle_login_data
-from backend.utils.encryption import check_hash, generate_hash
+from backend.utils.profile import (
+    get_version,
+    set_profile_cookie,
+    PROFILE_COOKIE,
+    PROFILES,
+)
+from backend.utils.staff import get_staff_airline, remember_staff_airline
+from backend.utils.encryption import generate_hash
 from backend.utils.error import (
     raise_error,
     JsonError,
@@ -28,21 +38,53 @@ from backend.utils.error import (
     QueryKeyError,
     QueryDuplicateError,
     ExistingRegisterError,
+    PoolTimeoutError,
+    ExecutorBusyError,
+)
+from backend.utils.metrics import snapshot
+from backend.utils.pool import ConnectionPool
+from backend.utils.serialize import dumps_rows, dumps_legacy
+from backend.utils.session import (
+    create_session_store,
+    get_secret_key,
+    ServerSessionInterface,
 )
 from backend.search import do_search
+from backend import config
 
-import json
 import pymysql.cursors
 
 app = Flask(__name__, static_url_path="", static_folder="../web/build")
 CORS(app, with_credentials=True)
-app.secret_key = urandom(16)
-conn = pymysql.connect(
-    host="localhost",
-    user="airbook_admin",
-    password="Airbook_admin_x7fo1a",
-    database="airbook",
+app.secret_key = get_secret_key(config.SESSION_BACKEND)
+app.session_interface = ServerSessionInterface(
+    create_session_store(config.SESSION_BACKEND), config.SESSION_TTL
+)
+pool = ConnectionPool(
+    lambda: pymysql.connect(
+        host=config.DB_HOST,
+        port=config.DB_PORT,
+        user=config.DB_USER,
+        password=config.DB_PASSWORD,
+        database=config.DB_NAME,
+        autocommit=True,
+    ),
+    min_size=config.POOL_MIN_SIZE,
+    max_size=config.POOL_MAX_SIZE,
+    timeout=config.POOL_TIMEOUT,
+    idle_check=config.POOL_IDLE_CHECK,
 )
+pool.init_app(app)
+
+
+@app.before_request
+def preload_flight_index():
+    """
+    Start loading the flight index with the first request of each worker, rather than
+    whenever the app is imported (like by the tests, or before the workers fork).
+    """
+    if config.FLIGHT_INDEX_ENABLED:
+        FLIGHTS.preload(pool.connection)
 
 
 # @app.route("/", defaults={"path": ""})
@@ -71,9 +113,7 @@ def register(register_type: str):
         hashed_password, salt = generate_hash(data["password"])
 
         if user_type is DataType.CUST:
-            insert_into(
-                conn,
-                user_type.get_table(),
+            user_data = dict(
                 email=data["email"],
                 name=data["name"],
                 password=hashed_password,
@@ -87,11 +127,8 @@ def register(register_type: str):
                 city=data.get("city", ""),
                 state=data.get("state", ""),
             )
-            session["email"] = data["email"]
         elif user_type is DataType.STAFF:
-            insert_into(
-                conn,
-                user_type.get_table(),
+            user_data = dict(
                 username=data["username"],
                 password=hashed_password,
                 salt=salt,
@@ -100,16 +137,18 @@ def register(register_type: str):
                 date_of_birth=data["date_of_birth"],
                 airline_name=data["airline_name"],
             )
+        elif user_type is DataType.AGENT:
+            user_data = dict(email=data["email"], password=hashed_password, salt=salt)
+
+        # Only taken once the request is complete
+        user_ID = insert_into(pool.get_conn(), user_type.get_table(), **user_data)
+        if user_type is DataType.CUST:
+            session["email"] = data["email"]
+        elif user_type is DataType.STAFF:
             session["username"] = data["username"]
+            remember_staff_airline(session, data["airline_name"])
         elif user_type is DataType.AGENT:
-            agent_id = insert_into(
-                conn,
-                user_type.get_table(),
-                email=data["email"],
-                password=hashed_password,
-                salt=salt,
-            )
-            session["agent_id"] = agent_id
+            session["agent_id"] = user_ID
             session["agent_email"] = data["email"]
     except KeyError as err:
         raise MissingKeyError(err.args[0])
@@ -121,24 +160,65 @@ def register(register_type: str):
     session["user_type"] = user_type.value
 
     if user_type is DataType.AGENT:
-        return jsonify(result="success", user_data=dict(agent_id=agent_id))
+        return jsonify(result="success", user_data=dict(agent_id=user_ID))
     else:
         return jsonify(result="success")
 
 
+def search_response(result):
+    """
+    Search results are sent as compact row arrays with a typed column header.
+    Clients that still expect the rows as a JSON string in "data" can pass `?format=legacy`.
+    "next" holds the token for the next page of the paginated filters.
+    """
+    rows, description, next_cursor = result
+    if request.args.get("format") == "legacy":
+        return jsonify(result="success", data=dumps_legacy(rows), next=next_cursor)
+    return app.response_class(
+        dumps_rows(rows, description, next=next_cursor), mimetype="application/json"
+    )
+
+
 @app.route("/search-public/<filter>", methods=["POST"])
 @raise_error
 def search_public(filter: str):
-    data = request.get_json()
-    result = json.dumps(
-        do_search(conn, data, session, filter, True),
-        indent=4,
-        sort_keys=True,
-        default=str,
-    )
+    # The filters work without a body, which Flask would otherwise refuse with a 415
+    data = request.get_json(silent=True)
+    return search_response(do_search(pool.get_conn, data, session, filter, True))
+
+
+@app.route("/search_itineraries", methods=["POST"])
+@raise_error
+def search_itineraries():
+    search = parse_itinerary_search(request.get_json())
+    conn = pool.get_conn()
+    return jsonify(result="success", data=ITINERARIES.search(conn, search))
+
+
+@app.route("/autocomplete", methods=["GET"])
+@raise_error
+def autocomplete():
+    """
+    Suggest the airports or the cities that start with `?q=`, for the search forms.
+    """
+    type = request.args.get("type", "airport")
+    if type not in COMPLETION_TYPES:
+        raise JsonError("Only airports and cities can be completed!")
+    try:
+        limit = int(request.args.get("limit", "10"))
+    except ValueError:
+        raise JsonError('The value of "limit" should be a number!')
+    if not 1 <= limit <= config.AUTOCOMPLETE_MAX_LIMIT:
+        raise JsonError(
+            'The value of "limit" should be between 1 and {}!'.format(
+                config.AUTOCOMPLETE_MAX_LIMIT
+            )
+        )
+    if not AIRPORTS.ensure_loaded(pool.connection):
+        raise JsonError("The airports are not available, please try again!")
     return jsonify(
         result="success",
-        data=result,
+        data=AIRPORTS.complete(request.args.get("q", ""), type, limit),
     )
 
 
@@ -147,17 +227,8 @@ def search_public(filter: str):
 @raise_error
 @require_session()
 def search(filter: str):
-    data = request.get_json()
-    result = json.dumps(
-        do_search(conn, data, session, filter, False),
-        indent=4,
-        sort_keys=True,
-        default=str,
-    )
-    return jsonify(
-        result="success",
-        data=result,
-    )
+    data = request.get_json(silent=True)
+    return search_response(do_search(pool.get_conn, data, session, filter, False))
 
 
 @app.route("/login/<login_type>", methods=["POST"])
@@ -171,12 +242,17 @@ def login(login_type: str):
             raise ValueError()
     except ValueError:
         raise JsonError("Invalid login method!")
+    if data is None:
+        raise JsonError("Empty data fields!")
     # If no error is thrown in check_login, our user is OK
-    user_data_raw = check_login(conn, user_type, **data)
+    user_data_raw = check_login(pool.get_conn, user_type, **data)
 
     user_data = handle_login_data(user_type, user_data_raw)
 
-    return jsonify(result="success", user_data=user_data)
+    version = get_version(user_data)
+    response = jsonify(result="success", version=version, user_data=user_data)
+    set_profile_cookie(response, version)
+    return response
 
 
 @app.route("/add_feedback", methods=["POST"])
@@ -198,6 +274,7 @@ def add_feedback():
         )
     except KeyError as err:
         raise MissingKeyError(err.args[0])
+    conn = pool.get_conn()
     result = query(
         conn,
         "SELECT * FROM Ticket WHERE (flight_number, dep_date, dep_time, email)=(%(flight_number)s, %(dep_date)s, %(dep_time)s, %(email)s) AND dep_date < UTC_DATE() OR (dep_date = UTC_DATE() AND dep_time < UTC_TIME())",
@@ -217,46 +294,25 @@ def add_feedback():
 @raise_error
 @require_session()
 def session_fetch():
+    """
+    Clients that send the version of the user data they have get `"unchanged": true`
+    instead of the user data when it is still up to date.
+    """
     data = request.get_json()
-    user_data_raw = None
     user_type = DataType(session["user_type"])
     try:
-        if user_type is DataType.CUST:
-            user_data_raw = query(
-                conn,
-                CHECK_CUST_LOGIN,
-                fetch_mode=FetchMode.ONE,
-                args=dict(email=session["email"]),
-            )
-        elif user_type is DataType.STAFF:
-            user_data_raw = query(
-                conn,
-                CHECK_STAFF_LOGIN,
-                fetch_mode=FetchMode.ONE,
-                args=dict(username=session["username"]),
-            )
-        elif user_type is DataType.AGENT:
-            user_data_raw = query(
-                conn,
-                CHECK_AGENT_LOGIN,
-                fetch_mode=FetchMode.ONE,
-                args=dict(
-                    email=session["agent_email"], booking_agent_id=session["agent_id"]
-                ),
-            )
+        profile = PROFILES.load(pool.get_conn(), user_type, session)
     except KeyError as err:
         raise JsonError("The user session is invalid! Please login.")
 
-    if user_data_raw is not None:
-        try:
-            return jsonify(
-                result="success",
-                user_data=handle_login_data(user_type, user_data_raw),
-            )
-        except IndexError as err:
-            raise JsonError("The user might have been removed!")
+    if data is not None and data.get("version") == profile.version:
+        response = jsonify(result="success", version=profile.version, unchanged=True)
     else:
-        raise JsonError("There is no session associated with this user!")
+        response = jsonify(
+            result="success", version=profile.version, user_data=profile.user_data
+        )
+    set_profile_cookie(response, profile.version)
+    return response
 
 
 @app.route("/logout", methods=["POST"])
@@ -265,28 +321,29 @@ def session_fetch():
 @require_session()
 def logout():
     session.clear()
-    return jsonify(result="success")
+    response = jsonify(result="success")
+    response.delete_cookie(PROFILE_COOKIE)
+    return response
 
 
 @app.route("/ticket_price", methods=["POST"])
 @raise_error
 def ticket_price():
     data = request.get_json()
-    result = get_ticket_price(conn, data)
+    result = get_ticket_price(pool.get_conn, data)
     if result is not None and len(result) > 0:
         return jsonify(result="success", data=dict(price=float(str(result[0]))))
     else:
         raise JsonError("No ticket data is found")
 
 
-convert = lambda date_str, time_str: datetime.fromisoformat(
-    "{}T{}".format(date_str, time_str)
-)
-
-
-time_value_err_pattern = re.compile(
-    r"Incorrect time value: '(.+)' for column '(.+)' at row 1"
-)
+@app.route("/ticket_prices", methods=["POST"])
+@raise_error
+def ticket_prices():
+    data = request.get_json()
+    return jsonify(
+        result="success", data=dict(prices=get_ticket_prices(pool.get_conn, data))
+    )
 
 
 @app.route("/create_flight", methods=["POST"])
@@ -298,61 +355,62 @@ def create_flight():
     flight_data: Dict[str, Any] = {}
     result = None
     try:
-        flight_data["flight_number"] = data["flight_number"]
-        flight_data["dep_date"] = data["dep_date"]
-        flight_data["dep_time"] = data["dep_time"]
-        flight_data["arr_date"] = data["arr_date"]
-        flight_data["arr_time"] = data["arr_time"]
-        flight_data["dep_airport"] = data["dep_airport"]
-        flight_data["arr_airport"] = data["arr_airport"]
-        flight_data["plane_ID"] = data["plane_ID"]
-        flight_data["status"] = data["status"]
-        flight_data["base_price"] = data["base_price"]
+        for key in FLIGHT_KEYS:
+            flight_data[key] = data[key]
     except KeyError as err:
         raise MissingKeyError(err.args[0])
-    try:
-        if convert(flight_data["dep_date"], flight_data["dep_time"]) >= convert(
-            flight_data["arr_date"], flight_data["arr_time"]
-        ):
-            raise JsonError("The arrival time needs to be after the arrival time!")
-    except ValueError as err:
-        raise JsonError("The date format is in valid: {}".format(err.args[0]))
-    try:
-        flight_data["airline_name"] = query(
-            conn, STAFF_AIRLINE, FetchMode.ONE, args=dict(username=session["username"])
-        )[0]
-    except QueryError:
-        raise JsonError("An unknown error occurs when finding your airline name.")
+    message = check_flight_times(flight_data)
+    if message is not None:
+        raise JsonError(message)
+    conn = pool.get_conn()
+    flight_data["airline_name"] = get_staff_airline(conn, session)
 
     try:
         result = insert_into(conn, "Flight", **flight_data)
-    except QueryDuplicateError as err:
-        raise JsonError(
-            "The flight with the same flight number and departure datetime already exists!"
-        )
     except QueryError as err:
-        if err.get_error_code() == 1452:
-            # Foreign key constraint
-            if "plane_ID" in err.get_error_message():
-                raise JsonError("The plane ID is invalid!")
-        if err.get_error_code() == 1292:
-            match = time_value_err_pattern.match(err.get_error_message())
-            if match is not None:
-                raise JsonError(
-                    "The time value {} for {} is invalid!".format(
-                        match.group(1), match.group(2)
-                    )
-                )
+        message = describe_flight_error(err)
+        if message is not None:
+            raise JsonError(message)
         print(err)
         raise JsonError(
             "Failed to create the new flight! Please contact the maintainer."
         )
     if result is not None:
+        FLIGHTS.refresh(
+            conn,
+            flight_data["flight_number"],
+            flight_data["dep_date"],
+            flight_data["dep_time"],
+        )
         return jsonify(result="success")
     else:
         raise JsonError("Failed due to an unknown error.")
 
 
+@app.route("/import_flights", methods=["POST"])
+@cross_origin(supports_credentials=True)
+@raise_error
+@require_session(DataType.STAFF)
+def import_flights():
+    if request.mimetype == "multipart/form-data":
+        if "file" not in request.files:
+            raise MissingKeyError("file")
+        upload = request.files["file"]
+        stream, filename, mimetype = upload.stream, upload.filename, upload.mimetype
+    else:
+        # The file can also be sent as the raw request body
+        stream, filename, mimetype = request.stream, None, request.mimetype
+    format = get_import_format(request.args.get("format"), filename, mimetype)
+    if format is None:
+        raise JsonError("The import format should be either csv or jsonl!")
+    conn = pool.get_conn()
+    airline_name = get_staff_airline(conn, session)
+    report = import_schedule(conn, stream, format, airline_name)
+    if report.inserted > 0:
+        FLIGHTS.invalidate()
+    return jsonify(result="success", data=report.to_dict())
+
+
 @app.route("/ticket_purchase", methods=["POST"])
 @cross_origin(supports_credentials=True)
 @raise_error
@@ -381,43 +439,30 @@ def ticket_purchase():
                 ticket_data["booking_agent_id"] = session["agent_id"]
             # ticket_data["purchase_date"] = now.strftime("%Y-%m-%d")
             # ticket_data["purchase_time"] = now.strftime("%H:%M:%S")
-            ticket_data["sold_price"] = get_ticket_price(conn, data)
         except KeyError as err:
             raise MissingKeyError(err.args[0])
         except ValueError as err:
             raise JsonError("The flight number should be a number!")
 
-        result = query(
-            conn,
-            "SELECT * FROM Flight WHERE (flight_number, dep_date, dep_time)=(%(flight_number)s, %(dep_date)s, %(dep_time)s) AND dep_date > UTC_DATE() OR (dep_date = UTC_DATE() AND dep_time > UTC_TIME())",
-            args=ticket_data,
-        )
-        if len(result) == 0:
-            raise JsonError("Cannot purchase a ticket for a flight in the past!")
-
-        result = insert_into(conn, "Ticket", **ticket_data)
-        if "booking_agent_id" in ticket_data:
-            insert_into(
-                conn,
-                "Book",
-                ticket_ID=result,
-                booking_agent_id=ticket_data["booking_agent_id"],
-                commission=float(
-                    query(
-                        conn,
-                        "SELECT sold_price FROM Ticket WHERE ticket_id={}".format(
-                            result
-                        ),
-                        FetchMode.ONE,
-                    )[0]
-                )
-                * 0.1,
-            )
+        purchase_ticket(pool.get_conn(), ticket_data)
         return jsonify(result="success")
     else:
         raise JsonError("Only customers or booking agents can purchase tickets.")
 
 
+@app.route("/ticket_purchase_bulk", methods=["POST"])
+@cross_origin(supports_credentials=True)
+@raise_error
+@require_session(DataType.AGENT)
+def ticket_purchase_bulk():
+    data = request.get_json()
+    purchase = parse_bulk_purchase(data)
+    tickets = purchase_tickets(
+        pool.get_conn(), purchase["flight"], purchase["passengers"], session["agent_id"]
+    )
+    return jsonify(result="success", data=dict(tickets=tickets))
+
+
 @app.route("/change_status", methods=["POST"])
 @cross_origin(supports_credentials=True)
 @raise_error
@@ -432,13 +477,15 @@ def change_status():
         flight_data["status"] = data["status"]
     except KeyError as err:
         raise MissingKeyError(err.args[0])
-    try:
-        flight_data["airline_name"] = query(
-            conn, STAFF_AIRLINE, FetchMode.ONE, args=dict(username=session["username"])
-        )[0]
-    except QueryError:
-        raise JsonError("An unknown error occurs when finding your airline name.")
+    conn = pool.get_conn()
+    flight_data["airline_name"] = get_staff_airline(conn, session)
     result = query(conn, UPDATE_STATUS, args=flight_data)
+    FLIGHTS.refresh(
+        conn,
+        flight_data["flight_number"],
+        flight_data["dep_date"],
+        flight_data["dep_time"],
+    )
     return jsonify(result="success")
 
 
@@ -455,9 +502,10 @@ def add_airport():
     except KeyError as err:
         raise MissingKeyError(err.args[0])
     try:
-        insert_into(conn, "Airport", **airport_data)
+        insert_into(pool.get_conn(), "Airport", **airport_data)
     except QueryDuplicateError as err:
         raise JsonError("The airport already exists!")
+    AIRPORTS.add(airport_data["airport_name"], airport_data["city"])
     return jsonify(result="success")
 
 
@@ -473,12 +521,8 @@ def add_airplane():
         airplane_data["seat_capacity"] = data["seat_capacity"]
     except KeyError as err:
         raise MissingKeyError(err.args[0])
-    try:
-        airplane_data["airline_name"] = query(
-            conn, STAFF_AIRLINE, FetchMode.ONE, args=dict(username=session["username"])
-        )[0]
-    except QueryError:
-        raise JsonError("An unknown error occurs when finding your airline name.")
+    conn = pool.get_conn()
+    airplane_data["airline_name"] = get_staff_airline(conn, session)
     try:
         insert_into(conn, "Airplane", **airplane_data)
     except QueryDuplicateError as err:
@@ -486,6 +530,27 @@ def add_airplane():
     return jsonify(result="success")
 
 
+@app.route("/metrics", methods=["GET"])
+def metrics():
+    """
+    The counters of this process, like the database reconnects, and the state of its
+    connection pool. Each worker process reports its own.
+    """
+    return jsonify(
+        result="success",
+        data=dict(counters=snapshot(), pool=dict(size=pool.size, idle=pool.idle)),
+    )
+
+
+@app.errorhandler(PoolTimeoutError)
+@app.errorhandler(ExecutorBusyError)
+def pool_timeout(error):
+    return jsonify(
+        result="error",
+        message="The server is busy right now. Please try again later.",
+    )
+
+
 @app.errorhandler(401)
 def forbidden(error):
     return jsonify(
@@ -0,0 +1,104 @@
+from os import cpu_count, environ
+
+"""
+Deployment settings for the backend. Every value can be overridden through an
+environment variable of the same name prefixed with `AIRBOOK_`.
+"""
+
+DB_HOST = environ.get("AIRBOOK_DB_HOST", "localhost")
+DB_PORT = int(environ.get("AIRBOOK_DB_PORT", "3306"))
+DB_USER = environ.get("AIRBOOK_DB_USER", "airbook_admin")
+DB_PASSWORD = environ.get("AIRBOOK_DB_PASSWORD", "Airbook_admin_x7fo1a")
+DB_NAME = environ.get("AIRBOOK_DB_NAME", "airbook")
+
+# The connection pool keeps at least POOL_MIN_SIZE connections open once it is used,
+# and never opens more than POOL_MAX_SIZE. A checkout waits at most POOL_TIMEOUT seconds.
+POOL_MIN_SIZE = int(environ.get("AIRBOOK_POOL_MIN_SIZE", "1"))
+POOL_MAX_SIZE = int(environ.get("AIRBOOK_POOL_MAX_SIZE", "10"))
+POOL_TIMEOUT = float(environ.get("AIRBOOK_POOL_TIMEOUT", "5"))
+# Connections idle for longer than this many seconds are pinged before being handed out.
+POOL_IDLE_CHECK = float(environ.get("AIRBOOK_POOL_IDLE_CHECK", "30"))
+
+# Query logging: QUERY_LOG_LEVEL is one of "off", "slow" and "all". Statements slower
+# than QUERY_LOG_SLOW_MS are always logged; the others are sampled at QUERY_LOG_SAMPLE_RATE.
+QUERY_LOG_LEVEL = environ.get("AIRBOOK_QUERY_LOG_LEVEL", "off")
+QUERY_LOG_SAMPLE_RATE = float(environ.get("AIRBOOK_QUERY_LOG_SAMPLE_RATE", "1"))
+QUERY_LOG_SLOW_MS = float(environ.get("AIRBOOK_QUERY_LOG_SLOW_MS", "200"))
+QUERY_LOG_REDACT = environ.get("AIRBOOK_QUERY_LOG_REDACT", "1") != "0"
+
+# Paginated searches return SEARCH_PAGE_SIZE rows by default, and never more than SEARCH_MAX_PAGE_SIZE.
+SEARCH_PAGE_SIZE = int(environ.get("AIRBOOK_SEARCH_PAGE_SIZE", "100"))
+SEARCH_MAX_PAGE_SIZE = int(environ.get("AIRBOOK_SEARCH_MAX_PAGE_SIZE", "1000"))
+
+# Seat occupancy is cached for up to OCCUPANCY_CACHE_SIZE flights. Entries older than
+# OCCUPANCY_CACHE_TTL seconds are reloaded, which picks up tickets sold by other processes.
+OCCUPANCY_CACHE_SIZE = int(environ.get("AIRBOOK_OCCUPANCY_CACHE_SIZE", "4096"))
+OCCUPANCY_CACHE_TTL = float(environ.get("AIRBOOK_OCCUPANCY_CACHE_TTL", "30"))
+# The most flights that a single /ticket_prices request can quote.
+TICKET_PRICES_MAX_BATCH = int(environ.get("AIRBOOK_TICKET_PRICES_MAX_BATCH", "100"))
+# The most passengers that a booking agent can book with one /ticket_purchase_bulk request.
+BULK_PURCHASE_MAX_SIZE = int(environ.get("AIRBOOK_BULK_PURCHASE_MAX_SIZE", "50"))
+# insert_many() sends at most this many rows with each multi-row INSERT.
+INSERT_CHUNK_SIZE = int(environ.get("AIRBOOK_INSERT_CHUNK_SIZE", "500"))
+# /import_flights inserts IMPORT_BATCH_SIZE flights per transaction, and reports at most
+# IMPORT_MAX_ERRORS of the rows that failed.
+IMPORT_BATCH_SIZE = int(environ.get("AIRBOOK_IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_ERRORS = int(environ.get("AIRBOOK_IMPORT_MAX_ERRORS", "1000"))
+# Password hashes are computed on HASH_WORKERS threads. Logins beyond the ones being hashed
+# and HASH_MAX_QUEUE waiting are turned away as busy, as are the ones that wait longer than
+# HASH_TIMEOUT seconds.
+HASH_WORKERS = int(environ.get("AIRBOOK_HASH_WORKERS", str(cpu_count() or 2)))
+HASH_MAX_QUEUE = int(environ.get("AIRBOOK_HASH_MAX_QUEUE", "32"))
+HASH_TIMEOUT = float(environ.get("AIRBOOK_HASH_TIMEOUT", "10"))
+# New password hashes use HASH_ALGORITHM, either "pbkdf2-sha256" or "scrypt", with the cost
+# below. Stored hashes with other parameters are upgraded when their users log in.
+# Run `python -m backend.tools.calibrate_hash` to pick a cost for the hardware.
+HASH_ALGORITHM = environ.get("AIRBOOK_HASH_ALGORITHM", "pbkdf2-sha256")
+HASH_PBKDF2_ITERATIONS = int(environ.get("AIRBOOK_HASH_PBKDF2_ITERATIONS", "10000"))
+HASH_SCRYPT_N = int(environ.get("AIRBOOK_HASH_SCRYPT_N", "16384"))
+HASH_SCRYPT_R = int(environ.get("AIRBOOK_HASH_SCRYPT_R", "8"))
+HASH_SCRYPT_P = int(environ.get("AIRBOOK_HASH_SCRYPT_P", "1"))
+# The airlines of up to STAFF_AIRLINE_CACHE_SIZE staff members are kept in memory.
+STAFF_AIRLINE_CACHE_SIZE = int(environ.get("AIRBOOK_STAFF_AIRLINE_CACHE_SIZE", "1024"))
+# /session-fetch serves the profiles of up to PROFILE_CACHE_SIZE users from memory, for at
+# most PROFILE_CACHE_TTL seconds after they were loaded.
+PROFILE_CACHE_SIZE = int(environ.get("AIRBOOK_PROFILE_CACHE_SIZE", "4096"))
+PROFILE_CACHE_TTL = float(environ.get("AIRBOOK_PROFILE_CACHE_TTL", "300"))
+# The key that signs the session cookies. Every worker process and node has to share it,
+# otherwise the sessions are lost whenever a request lands on another one. It is required
+# unless SESSION_BACKEND is "memory", which only lives as long as the process anyway.
+SECRET_KEY = environ.get("AIRBOOK_SECRET_KEY")
+# Sessions are kept in SESSION_BACKEND: "memory" (this process only), "sqlite" (the file
+# at SESSION_SQLITE_PATH) or "redis" (the server at SESSION_REDIS_URL). They expire
+# SESSION_TTL seconds after their last request.
+SESSION_BACKEND = environ.get("AIRBOOK_SESSION_BACKEND", "memory")
+SESSION_TTL = float(environ.get("AIRBOOK_SESSION_TTL", "86400"))
+SESSION_MEMORY_SIZE = int(environ.get("AIRBOOK_SESSION_MEMORY_SIZE", "10000"))
+SESSION_SQLITE_PATH = environ.get("AIRBOOK_SESSION_SQLITE_PATH", "airbook-sessions.db")
+SESSION_REDIS_URL = environ.get("AIRBOOK_SESSION_REDIS_URL", "redis://localhost:6379/0")
+# The results of the search filters listed in CACHED_FILTERS (filter.py) are cached in up
+# to about RESULT_CACHE_MAX_BYTES bytes.
+RESULT_CACHE_MAX_BYTES = int(
+    environ.get("AIRBOOK_RESULT_CACHE_MAX_BYTES", str(16 * 1024 * 1024))
+)
+# Public flight searches are answered from an in-process index of the flights that depart
+# at most FLIGHT_INDEX_PAST_DAYS days ago or later. The index is reloaded from the database
+# every FLIGHT_INDEX_TTL seconds, which picks up the flights changed by other processes.
+FLIGHT_INDEX_ENABLED = environ.get("AIRBOOK_FLIGHT_INDEX_ENABLED", "1") != "0"
+FLIGHT_INDEX_TTL = float(environ.get("AIRBOOK_FLIGHT_INDEX_TTL", "60"))
+FLIGHT_INDEX_PAST_DAYS = int(environ.get("AIRBOOK_FLIGHT_INDEX_PAST_DAYS", "1"))
+# /search_itineraries connects flights with at most ITINERARY_MAX_STOPS stops, waiting
+# between ITINERARY_MIN_LAYOVER and ITINERARY_MAX_LAYOVER minutes unless the request asks
+# otherwise. It returns ITINERARY_TOP_K itineraries by default and ITINERARY_MAX_TOP_K at
+# most, and gives up after extending ITINERARY_MAX_EXPANSIONS partial itineraries.
+ITINERARY_MAX_STOPS = int(environ.get("AIRBOOK_ITINERARY_MAX_STOPS", "2"))
+ITINERARY_MIN_LAYOVER = int(environ.get("AIRBOOK_ITINERARY_MIN_LAYOVER", "45"))
+ITINERARY_MAX_LAYOVER = int(environ.get("AIRBOOK_ITINERARY_MAX_LAYOVER", "360"))
+ITINERARY_TOP_K = int(environ.get("AIRBOOK_ITINERARY_TOP_K", "10"))
+ITINERARY_MAX_TOP_K = int(environ.get("AIRBOOK_ITINERARY_MAX_TOP_K", "50"))
+ITINERARY_MAX_EXPANSIONS = int(environ.get("AIRBOOK_ITINERARY_MAX_EXPANSIONS", "20000"))
+# /autocomplete reloads the airports from the database every AUTOCOMPLETE_TTL seconds, which
+# picks up the airports added by other processes, and returns AUTOCOMPLETE_MAX_LIMIT
+# suggestions at most.
+AUTOCOMPLETE_TTL = float(environ.get("AIRBOOK_AUTOCOMPLETE_TTL", "300"))
+AUTOCOMPLETE_MAX_LIMIT = int(environ.get("AIRBOOK_AUTOCOMPLETE_MAX_LIMIT", "20"))
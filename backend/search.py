@@ -1,19 +1,27 @@
-from typing import Dict, Any
+from typing import Callable, Dict, Any
 from backend.utils.filter import FilterType, FilterSet
-from backend.utils.query import DataType, query, FetchMode, STAFF_AIRLINE
+from backend.utils.query import DataType
 from backend.utils.error import JsonError, MissingKeyError, QueryKeyError
 from backend.utils.authentication import have_access_to_filter, PublicFilters
-from backend.utils.filter import query_by_filter
+from backend.utils.filter import query_by_filter, is_paginated_filter
+from backend.utils.pagination import get_page_size, split_page
+from backend.utils.staff import get_staff_airline
 from pymysql.connections import Connection
 
 
 def do_search(
-    conn: Connection,
+    connect: Callable[[], Connection],
     data: Dict[str, Any],
     session: Dict[str, Any],
     filter: str,
     use_public: bool,
 ):
+    """
+    Run the requested filter and return its rows along with `cursor.description`
+    and the continuation token of the next page (None if this is the last page).
+    `connect` returns the connection of the request, like `ConnectionPool.get_conn`, and
+    is only called once the request is validated.
+    """
     if data is None:
         data = {}
     try:
@@ -33,6 +41,12 @@ def do_search(
 
     filter_data = data.get("filter_data", {})
 
+    page_size = None
+    if is_paginated_filter(filter_type):
+        page_size = get_page_size(filter_data.get("page_size"))
+        # One more row tells us whether there is a next page
+        filter_data["limit"] = page_size + 1
+
     # Some users are not allowed to set these fields
     if user_type is not DataType.CUST:
         filter_data["is_customer"] = False
@@ -48,14 +62,14 @@ def do_search(
     elif user_type is DataType.AGENT:
         filter_data["emails"] = [session["agent_email"]]
     elif user_type is DataType.STAFF:
-        filter_data["airline_name"] = query(
-            conn, STAFF_AIRLINE, FetchMode.ONE, args=dict(username=session["username"])
-        )[0]
+        filter_data["airline_name"] = get_staff_airline(connect(), session)
         # The staff member needs to be able to filter by customer emails, and thus we add this to them
         filter_data["is_staff"] = True
 
     try:
-        result = query_by_filter(conn, filter_type, **filter_data, **session)
+        result = query_by_filter(
+            connect(), filter_type, describe=True, **filter_data, **session
+        )
     except QueryKeyError as err:
         raise MissingKeyError(key=err.get_key())
     except TypeError as err:
@@ -68,4 +82,8 @@ def do_search(
             )
         raise err
 
-    return result
+    rows, description = result
+    if page_size is not None:
+        rows, next_cursor = split_page(rows, description, page_size)
+        return rows, description, next_cursor
+    return rows, description, None
@@ -0,0 +1,85 @@
+import unittest
+
+from contextlib import nullcontext
+from backend.tests.utils import FakeClock, FakeConnection
+from backend.utils.airports import AirportIndex
+
+AIRPORTS = [
+    ("PVG", "Shanghai"),
+    ("SHA", "Shanghai"),
+    ("PEK", "Beijing"),
+    ("JFK", "New York"),
+    ("LGA", "New York"),
+    ("SJO", "San José"),
+    ("SHAN", None),
+]
+
+
+class TestAirportIndex(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.index = AirportIndex(ttl=300, clock=self.clock)
+        self.index.replace(AIRPORTS)
+
+    def names(self, prefix, **kwargs):
+        return [
+            suggestion["airport_name"]
+            for suggestion in self.index.complete(prefix, **kwargs)
+        ]
+
+    def test_ranking(self):
+        # The exact airport name, then the longer one, then the airports of the city
+        self.assertEqual(self.names("sha"), ["SHA", "SHAN", "PVG"])
+        self.assertEqual(self.index.complete("sha")[2]["match"], "city")
+        self.assertEqual(self.names("sha", limit=2), ["SHA", "SHAN"])
+
+    def test_words_and_accents(self):
+        self.assertEqual(self.names("york"), ["JFK", "LGA"])
+        self.assertEqual(self.names("JOSE"), ["SJO"])
+        self.assertEqual(self.names("  "), [])
+        self.assertEqual(self.names("xyz"), [])
+
+    def test_cities(self):
+        self.assertEqual(
+            self.index.complete("s", type="city"),
+            [
+                # As long as Shanghai, and first alphabetically
+                dict(city="San José", airports=["SJO"]),
+                dict(city="Shanghai", airports=["PVG", "SHA"]),
+            ],
+        )
+
+    def test_add(self):
+        self.assertEqual(self.names("sh"), ["SHA", "SHAN", "PVG"])
+        self.index.add("SHE", "Shenyang")
+        self.assertEqual(self.names("sh"), ["SHA", "SHE", "SHAN", "PVG"])
+        self.assertEqual(
+            self.index.complete("shenyang", type="city"),
+            [dict(city="Shenyang", airports=["SHE"])],
+        )
+
+    def test_reload(self):
+        index = AirportIndex(ttl=300, clock=self.clock)
+        conn = FakeConnection([(("PVG", "Shanghai"),), (("PEK", "Beijing"),)])
+        connects = []
+
+        def connect():
+            connects.append(conn)
+            return nullcontext(conn)
+
+        self.assertTrue(index.ensure_loaded(connect))
+        self.assertEqual(
+            [suggestion["airport_name"] for suggestion in index.complete("p")],
+            ["PVG"],
+        )
+        self.clock.now += 299
+        # No connection is taken while the index is fresh
+        self.assertTrue(index.ensure_loaded(connect))
+        self.assertEqual(len(connects), 1)
+        self.clock.now += 1
+        index.ensure_loaded(connect)
+        self.assertEqual(len(connects), 2)
+        self.assertEqual(
+            [suggestion["airport_name"] for suggestion in index.complete("p")],
+            ["PEK"],
+        )
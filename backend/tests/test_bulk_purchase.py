@@ -0,0 +1,113 @@
+import unittest
+
+from decimal import Decimal
+from flask import Flask
+from backend.tests.utils import CARD, FLIGHT, FakeConnection
+from backend.utils.error import JsonError
+from backend.utils.occupancy import OCCUPANCY
+from backend.utils.purchase import parse_bulk_purchase, purchase_tickets
+
+
+class TestBulkPurchase(unittest.TestCase):
+    def setUp(self):
+        self.app_context = Flask(__name__).app_context()
+        self.app_context.push()
+        OCCUPANCY.clear()
+
+    def tearDown(self):
+        self.app_context.pop()
+
+    def test_parse(self):
+        purchase = parse_bulk_purchase(
+            dict(
+                FLIGHT,
+                flight_number="1",
+                passengers=[dict(email="a@a.com"), dict(CARD, email="b@b.com")],
+                **CARD
+            )
+        )
+        self.assertEqual(purchase["flight"]["flight_number"], 1)
+        self.assertEqual(purchase["passengers"][0], dict(CARD, email="a@a.com"))
+
+    def test_parse_row_errors(self):
+        with self.assertRaises(JsonError) as context:
+            parse_bulk_purchase(
+                dict(
+                    FLIGHT,
+                    passengers=[dict(CARD, email="a@a.com"), dict(CARD), "b@b.com"],
+                )
+            )
+        errors = context.exception.get_json().json["errors"]
+        self.assertEqual([error["index"] for error in errors], [1, 2])
+        self.assertEqual(errors[0]["key"], "email")
+
+    def test_price_tiers(self):
+        passengers = [dict(CARD, email="a@a.com"), dict(CARD, email="b@b.com")] * 2
+        conn = FakeConnection(
+            [
+                (("a@a.com",), ("B@b.com",)),
+                (Decimal("100.00"), 6, 10, 1),
+                ((100,), (101,), (102,), (103,)),
+            ]
+        )
+        tickets = purchase_tickets(conn, FLIGHT, passengers, 7)
+        # The 7th seat is sold at 70% and the 8th one past it
+        self.assertEqual(
+            [ticket["price"] for ticket in tickets], [100.0, 100.0, 120.0, 120.0]
+        )
+        self.assertEqual(
+            [ticket["ticket_ID"] for ticket in tickets], [100, 101, 102, 103]
+        )
+        inserts = [
+            (sql, args) for sql, args in conn.executed if sql.startswith("INSERT")
+        ]
+        self.assertEqual(len(inserts), 4)
+        book_args = inserts[1][1]
+        self.assertEqual(book_args[-1], Decimal("12.00"))
+        # The agent is credited for all four tickets at once, once they are sold
+        committed = conn.statements.index("COMMIT")
+        sales = [
+            (index, args)
+            for index, (sql, args) in enumerate(conn.executed)
+            if "AgentDailySales" in sql
+        ]
+        self.assertEqual(len(sales), 1)
+        self.assertGreater(sales[0][0], committed)
+        self.assertEqual(sales[0][1], (7, Decimal("44.00"), 4, 100))
+        # The customers paid the prices and the commissions
+        airline_sales_args = next(
+            args for sql, args in inserts if "AirlineDailySales" in sql
+        )
+        self.assertEqual(airline_sales_args, (0, 4, Decimal("484.00"), 100))
+
+    def test_rounded_price(self):
+        conn = FakeConnection(
+            [(("a@a.com",),), (Decimal("45.01"), 8, 10, 1), ((100,),)]
+        )
+        tickets = purchase_tickets(conn, FLIGHT, [dict(CARD, email="a@a.com")], 7)
+        # 45.01 * 1.2 = 54.012 is stored as 54.01
+        self.assertEqual([ticket["price"] for ticket in tickets], [54.01])
+        inserts = [args for sql, args in conn.executed if sql.startswith("INSERT")]
+        self.assertEqual(inserts[0][-1], Decimal("54.01"))
+        self.assertEqual(inserts[1][-1], Decimal("5.40"))
+        sales = [args for sql, args in conn.executed if "AirlineDailySales" in sql]
+        self.assertEqual(sales, [(0, 1, Decimal("59.41"), 100)])
+
+    def test_unknown_customer(self):
+        conn = FakeConnection([(("a@a.com",),)])
+        with self.assertRaises(JsonError) as context:
+            purchase_tickets(
+                conn,
+                FLIGHT,
+                [dict(CARD, email="a@a.com"), dict(CARD, email="c@c.com")],
+                7,
+            )
+        errors = context.exception.get_json().json["errors"]
+        self.assertEqual([error["index"] for error in errors], [1])
+        self.assertEqual(len(conn.executed), 1)
+
+    def test_past_flight(self):
+        conn = FakeConnection([(("a@a.com",),), (Decimal("100.00"), 0, 10, 0)])
+        with self.assertRaises(JsonError):
+            purchase_tickets(conn, FLIGHT, [dict(CARD, email="a@a.com")], 7)
+        self.assertEqual(conn.executed[-1][0], "ROLLBACK")
@@ -1,8 +1,11 @@
 from unittest import TestCase, main
+from unittest.mock import patch
 from backend.utils.encryption import (
     generate_hash,
     check_hash,
+    needs_rehash,
 )
+from backend import config
 
 
 class TestEncryption(TestCase):
@@ -11,6 +14,45 @@ class TestEncryption(TestCase):
         hashed_password, salt = generate_hash("12345")
         self.assertTrue(check_hash(password, hashed_password, salt))
 
+    def test_wrong_password(self):
+        hashed_password, salt = generate_hash("12345")
+        self.assertFalse(check_hash("54321", hashed_password, salt))
+
+    def test_versioned_format(self):
+        hashed_password, salt = generate_hash("12345")
+        self.assertTrue(
+            hashed_password.startswith(
+                "$pbkdf2-sha256$i={},l=32${}$".format(
+                    config.HASH_PBKDF2_ITERATIONS, salt
+                )
+            )
+        )
+        self.assertFalse(needs_rehash(hashed_password))
+
+    def test_legacy_hash(self):
+        # The hash of "wendy" from data.sql
+        hashed_password = "d4bb84d0fcf9537a6e5f58039238f248584c8a2a05c0383bc364f129111f"
+        salt = "d365516baf21080b547f744cffb7b6dd"
+        self.assertTrue(check_hash("wendy", hashed_password, salt))
+        self.assertTrue(needs_rehash(hashed_password))
+
+    def test_rehash_on_new_parameters(self):
+        hashed_password, salt = generate_hash("12345")
+        with patch.object(config, "HASH_PBKDF2_ITERATIONS", 20000):
+            self.assertTrue(needs_rehash(hashed_password))
+            # Hashes with the old cost still check out
+            self.assertTrue(check_hash("12345", hashed_password, salt))
+
+    def test_scrypt(self):
+        with patch.object(config, "HASH_ALGORITHM", "scrypt"), patch.object(
+            config, "HASH_SCRYPT_N", 1024
+        ):
+            hashed_password, salt = generate_hash("12345")
+            self.assertTrue(hashed_password.startswith("$scrypt$n=1024,r=8,p=1,l=32$"))
+            self.assertTrue(check_hash("12345", hashed_password, salt))
+            self.assertFalse(needs_rehash(hashed_password))
+        self.assertTrue(needs_rehash(hashed_password))
+
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,36 @@
+import threading
+import unittest
+
+from backend.utils.executor import BoundedExecutor
+from backend.utils.error import ExecutorBusyError
+
+
+class TestExecutor(unittest.TestCase):
+    def test_run(self):
+        executor = BoundedExecutor("test_run", workers=2, max_queue=0, timeout=5)
+        self.assertEqual(executor.run(pow, 2, 10), 1024)
+        executor.shutdown()
+
+    def test_reject_when_full(self):
+        executor = BoundedExecutor("test_full", workers=1, max_queue=1, timeout=5)
+        release = threading.Event()
+        running = executor.submit(release.wait)
+        waiting = executor.submit(release.wait)
+        with self.assertRaises(ExecutorBusyError):
+            executor.submit(release.wait)
+        self.assertEqual(executor.rejected.value, 1)
+        release.set()
+        running.result()
+        waiting.result()
+        # The slots are given back once the tasks are done
+        self.assertEqual(executor.run(pow, 2, 3), 8)
+        executor.shutdown()
+
+    def test_timeout(self):
+        executor = BoundedExecutor("test_timeout", workers=1, max_queue=1, timeout=0.01)
+        release = threading.Event()
+        executor.submit(release.wait)
+        with self.assertRaises(ExecutorBusyError):
+            executor.run(pow, 2, 3)
+        release.set()
+        executor.shutdown()
@@ -5,10 +5,13 @@ from typing import Tuple, Any
 from backend.utils.filter import (
     get_filter_flight,
     get_filter_spendings,
+    get_filter_future_flights,
+    PLAN_CACHE,
     FilterRange,
     FilterSet,
     FilterRange,
 )
+from backend.utils.pagination import decode_cursor, split_page
 
 
 class TestFilter(unittest.TestCase):
@@ -151,3 +154,157 @@ class TestFilter(unittest.TestCase):
             ],
         )
         self.assertEqual(expected, result)
+
+    def test_filter_flight_page(self):
+        result = get_filter_flight(
+            FilterRange(),
+            FilterRange(),
+            FilterRange(),
+            FilterRange(),
+            dep_airport="JFK",
+            limit=11,
+        )
+        expected = (
+            "SELECT * FROM verbose_flights WHERE dep_airport=%s ORDER BY dep_date, dep_time, flight_number LIMIT %s",
+            ["JFK", 11],
+        )
+        self.assertEqual(expected, result)
+
+        result = get_filter_future_flights(
+            after=("2021-05-28", "15:31:14", 2323), limit=11
+        )
+        expected = (
+            "SELECT * FROM future_flights WHERE (dep_date, dep_time, flight_number) > (%s, %s, %s) ORDER BY dep_date, dep_time, flight_number LIMIT %s",
+            ["2021-05-28", "15:31:14", 2323, 11],
+        )
+        self.assertEqual(expected, result)
+
+    def test_cursor(self):
+        description = (("flight_number",), ("dep_date",), ("dep_time",))
+        rows = [
+            (2323, date(2021, 5, 28), "15:31:14"),
+            (7777, date(2021, 5, 28), "15:31:14"),
+            (7777, date(2022, 5, 28), "15:31:14"),
+        ]
+        page, token = split_page(rows, description, 2)
+        self.assertEqual(rows[:2], page)
+        self.assertEqual(("2021-05-28", "15:31:14", 7777), decode_cursor(token))
+
+        page, token = split_page(rows, description, 3)
+        self.assertEqual(rows, page)
+        self.assertIsNone(token)
+
+    def test_plan_cache(self):
+        PLAN_CACHE.clear()
+        hits = PLAN_CACHE.hits.value
+        first = get_filter_flight(
+            FilterRange("2020-11-22"),
+            FilterRange(),
+            FilterRange(),
+            FilterRange(),
+            dep_airport="JFK",
+            arr_city="",
+        )
+        second = get_filter_flight(
+            FilterRange("2021-01-01"),
+            FilterRange(),
+            FilterRange(),
+            FilterRange(),
+            dep_airport="PVG",
+        )
+        self.assertEqual(hits + 1, PLAN_CACHE.hits.value)
+        self.assertEqual(first[0], second[0])
+        self.assertEqual(["PVG", "2021-01-01", "2021-01-01"], second[1])
+
+        third = get_filter_flight(
+            FilterRange(), FilterRange(), FilterRange(), FilterRange(), dep_city="JFK"
+        )
+        self.assertEqual(hits + 1, PLAN_CACHE.hits.value)
+        self.assertEqual(
+            ("SELECT * FROM verbose_flights WHERE dep_city=%s", ["JFK"]), third
+        )
+
+    def test_filter_airline_sales(self):
+        sql, values = get_filter_spendings(
+            FilterSet({}),
+            None,
+            FilterRange("2021-01-01", "2021-03-01"),
+            FilterRange("12:00:00"),
+            airline_name="China Eastern",
+            group_by_month=True,
+            take_count=True,
+            is_staff=True,
+        )
+        # The days inside the range come from the daily totals
+        self.assertIn(
+            "FROM AirlineDailySales WHERE airline_name=%s AND sale_date > %s AND sale_date < %s",
+            sql,
+        )
+        self.assertIn(
+            "UNION ALL SELECT purchase_date, actual_price, 1 FROM spendings", sql
+        )
+        self.assertEqual(
+            ["China Eastern", "2021-01-01", "2021-03-01", "China Eastern"],
+            values[:4],
+        )
+
+        # A single customer is still read ticket by ticket
+        sql, values = get_filter_spendings(
+            FilterSet({"ny2311@nyu.edu"}),
+            None,
+            FilterRange("2021-01-01", "2021-03-01"),
+            FilterRange(),
+            airline_name="China Eastern",
+            group_by_month=True,
+            is_staff=True,
+        )
+        self.assertNotIn("AirlineDailySales", sql)
+
+    def test_filter_airline_sales_blank(self):
+        def spendings(**kwargs):
+            return get_filter_spendings(
+                FilterSet(),
+                kwargs.pop("agent_id", None),
+                FilterRange("2021-01-01", "2021-03-01"),
+                FilterRange(),
+                group_by_month=True,
+                is_staff=True,
+                **kwargs
+            )
+
+        # Blank values share the plan of None, so they must build the same query
+        for arguments in (
+            [dict(airline_name=None), dict(airline_name="")],
+            [dict(airline_name=""), dict(airline_name=None)],
+            [
+                dict(airline_name="A", agent_id=None),
+                dict(airline_name="A", agent_id=""),
+            ],
+            [
+                dict(airline_name="A", agent_id=""),
+                dict(airline_name="A", agent_id=None),
+            ],
+        ):
+            PLAN_CACHE.clear()
+            results = [spendings(**kwargs) for kwargs in arguments]
+            self.assertEqual(results[0], results[1], arguments)
+        PLAN_CACHE.clear()
+        sql, _ = spendings(airline_name="")
+        self.assertNotIn("AirlineDailySales", sql)
+        self.assertNotIn("airline_name", sql)
+
+    def test_filter_flight_blank_agent(self):
+        def flights(agent_id):
+            return get_filter_flight(
+                FilterRange(),
+                FilterRange(),
+                FilterRange(),
+                FilterRange(),
+                filter_by_agent_id=True,
+                agent_id=agent_id,
+            )
+
+        for agent_ids in ((None, ""), ("", None)):
+            PLAN_CACHE.clear()
+            self.assertEqual(*[flights(agent_id) for agent_id in agent_ids])
+        self.assertEqual(("SELECT * FROM verbose_flights ", []), flights(""))
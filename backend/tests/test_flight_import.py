@@ -0,0 +1,72 @@
+import unittest
+
+from io import BytesIO
+from pymysql.err import IntegrityError
+from backend.tests.utils import FakeConnection
+from backend.utils.flight_import import get_import_format, import_schedule
+
+
+def fail_on_7(sql, args):
+    if "7" in args:
+        return IntegrityError(
+            1062, "Duplicate entry '7-2030-01-01-09:00:00' for key 'flight.PRIMARY'"
+        )
+
+
+HEADER = "flight_number,dep_date,dep_time,arr_date,arr_time,dep_airport,arr_airport,plane_ID,status,base_price\n"
+
+
+def flight_line(flight_number, arr_time="11:00:00"):
+    return "{},2030-01-01,09:00:00,2030-01-01,{},PVG,PEK,1,ontime,100\n".format(
+        flight_number, arr_time
+    )
+
+
+class TestFlightImport(unittest.TestCase):
+    def test_format(self):
+        self.assertEqual(get_import_format(None, "spring.jsonl", None), "jsonl")
+        self.assertEqual(get_import_format(None, "spring.csv", "text/csv"), "csv")
+        self.assertIsNone(get_import_format("xlsx", "spring.csv", None))
+
+    def test_csv(self):
+        conn = FakeConnection(fail=fail_on_7)
+        stream = BytesIO(
+            (
+                HEADER + flight_line(2) + flight_line(3, "08:00:00") + flight_line(4)
+            ).encode("utf-8")
+        )
+        report = import_schedule(conn, stream, "csv", "China Eastern").to_dict()
+        self.assertEqual(report["rows"], 3)
+        self.assertEqual(report["inserted"], 2)
+        self.assertEqual(
+            report["errors"],
+            [
+                dict(
+                    line=3,
+                    message="The arrival time needs to be after the arrival time!",
+                )
+            ],
+        )
+        self.assertEqual(conn.statements[0], "BEGIN")
+        self.assertEqual(len(conn.executed), 3)
+
+    def test_jsonl(self):
+        conn = FakeConnection(fail=fail_on_7)
+        stream = BytesIO(
+            b'{"flight_number": 2, "dep_date": "2030-01-01"}\n\nnot json\n'
+        )
+        report = import_schedule(conn, stream, "jsonl", "China Eastern").to_dict()
+        self.assertEqual(report["rows"], 2)
+        self.assertEqual([error["line"] for error in report["errors"]], [1, 3])
+        self.assertEqual(
+            report["errors"][0]["message"], 'Missing required key "dep_time"!'
+        )
+
+    def test_failed_batch(self):
+        conn = FakeConnection(fail=fail_on_7)
+        stream = BytesIO((HEADER + flight_line(2) + flight_line(7)).encode("utf-8"))
+        report = import_schedule(conn, stream, "csv", "China Eastern").to_dict()
+        self.assertEqual(report["inserted"], 1)
+        self.assertEqual(report["failed"], 1)
+        self.assertEqual(report["errors"][0]["line"], 3)
+        self.assertIn("already exists", report["errors"][0]["message"])
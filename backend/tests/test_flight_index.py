@@ -0,0 +1,224 @@
+import random
+import sqlite3
+import time
+import unittest
+
+from datetime import date, timedelta
+from pymysql.err import OperationalError
+from backend.tests.utils import FakeConnection
+from backend.utils.filter import FilterRange, get_filter_flight
+from backend.utils.flight_index import FlightIndex, in_date_time_range
+
+COLUMNS = (
+    "flight_number",
+    "dep_date",
+    "dep_time",
+    "dep_airport",
+    "arr_date",
+    "arr_time",
+    "arr_airport",
+    "airline_name",
+    "dep_city",
+    "arr_city",
+    "status",
+)
+AIRPORTS = {"JFK": "New York", "PVG": "Shanghai", "LAX": "Los Angeles"}
+
+
+def create_flights(count):
+    generator = random.Random(208)
+    flights = {}
+    while len(flights) < count:
+        dep_airport, arr_airport = generator.sample(sorted(AIRPORTS), 2)
+        dep_date = date(2030, 1, 1) + timedelta(days=generator.randrange(10))
+        arr_date = dep_date + timedelta(days=generator.randrange(2))
+        flight = (
+            generator.randrange(1, 6),
+            dep_date.isoformat(),
+            "{:02d}:{:02d}:00".format(
+                generator.randrange(24), generator.choice((0, 30))
+            ),
+            dep_airport,
+            arr_date.isoformat(),
+            "{:02d}:00:00".format(generator.randrange(24)),
+            arr_airport,
+            generator.choice(("China Eastern", "Delta")),
+            AIRPORTS[dep_airport],
+            AIRPORTS[arr_airport],
+            "ontime",
+        )
+        flights[flight[:3]] = flight
+    return list(flights.values())
+
+
+def random_bounds(generator, values):
+    return FilterRange(
+        generator.choice((None, *values)), generator.choice((None, *values))
+    )
+
+
+class TestFlightIndex(unittest.TestCase):
+    def setUp(self):
+        self.flights = create_flights(300)
+        self.db = sqlite3.connect(":memory:")
+        self.db.execute("CREATE TABLE verbose_flights({})".format(",".join(COLUMNS)))
+        self.db.executemany(
+            "INSERT INTO verbose_flights VALUES ({})".format(",".join("?" * 11)),
+            self.flights,
+        )
+        self.index = FlightIndex(ttl=60, past_days=0, today=lambda: date(2030, 1, 1))
+        description = [(column,) for column in COLUMNS]
+        self.index.replace(self.flights, description, date(2030, 1, 1))
+
+    def run_sql(self, sql, values):
+        return self.db.execute(sql.replace("%s", "?"), values).fetchall()
+
+    def test_date_time_range(self):
+        day, noon = date(2030, 1, 2), timedelta(hours=12)
+        ranges = ((date(2030, 1, 2), date(2030, 1, 3)), (None, None))
+        times = (timedelta(hours=11), None)
+        self.assertTrue(in_date_time_range(day, noon, ranges[0], times))
+        self.assertFalse(in_date_time_range(day, timedelta(hours=10), ranges[0], times))
+        # A time range without a date range matches nothing, like the SQL does
+        self.assertFalse(in_date_time_range(day, noon, ranges[1], times))
+
+    def test_same_as_sql(self):
+        generator = random.Random(2021)
+        dates = ["2030-01-0{}".format(day) for day in range(1, 10)]
+        times = ["06:00:00", "12:00:00", "18:30:00"]
+        for i in range(500):
+            dep_date = FilterRange(
+                generator.choice(dates), generator.choice((None, *dates))
+            )
+            kwargs = dict(
+                dep_date_range=dep_date,
+                dep_time_range=random_bounds(generator, times),
+                arr_date_range=random_bounds(generator, dates),
+                arr_time_range=random_bounds(generator, times),
+                flight_number=generator.choice((None, 1, 2)),
+                dep_city=generator.choice((None, "Shanghai")),
+                arr_airport=generator.choice((None, "JFK")),
+                limit=generator.choice((None, 5)),
+            )
+            if kwargs["arr_date_range"].isEmpty():
+                kwargs["arr_time_range"] = FilterRange()
+            expected = self.run_sql(*get_filter_flight(**kwargs))
+            result, _ = self.index.search(
+                None,
+                (dep_date.lower, dep_date.upper),
+                (kwargs["dep_time_range"].lower, kwargs["dep_time_range"].upper),
+                (kwargs["arr_date_range"].lower, kwargs["arr_date_range"].upper),
+                (kwargs["arr_time_range"].lower, kwargs["arr_time_range"].upper),
+                dict(
+                    flight_number=kwargs["flight_number"],
+                    dep_city=kwargs["dep_city"],
+                    arr_airport=kwargs["arr_airport"],
+                ),
+                limit=kwargs["limit"],
+            )
+            if kwargs["limit"] is None:
+                self.assertCountEqual(expected, result, kwargs)
+            else:
+                self.assertEqual(expected, result, kwargs)
+
+    def test_pages(self):
+        sql, values = get_filter_flight(
+            FilterRange("2030-01-03"),
+            FilterRange(),
+            FilterRange(),
+            FilterRange(),
+            after=("2030-01-05", "12:00:00", 3),
+            limit=10,
+        )
+        result, _ = self.index.search(
+            None,
+            ("2030-01-03", None),
+            (None, None),
+            (None, None),
+            (None, None),
+            {},
+            after=("2030-01-05", "12:00:00", 3),
+            limit=10,
+        )
+        self.assertEqual(self.run_sql(sql, values), result)
+
+    def test_fallback(self):
+        search = lambda dep_date, **constraints: self.index.search(
+            None, dep_date, (None, None), (None, None), (None, None), constraints
+        )
+        # The flights before the window are not indexed
+        self.assertIsNone(search((None, "2030-01-05")))
+        self.assertIsNone(search(("2029-12-31", None)))
+        self.assertIsNone(search(("2030-1-x", None)))
+        self.assertIsNone(search(("2030-01-02", " ")))
+        # Strings are compared regardless of case, and blank ones are left out
+        result, _ = search(("2030-01-02", None), dep_airport="jfk", arr_city=" ")
+        self.assertTrue(all(row[3] == "JFK" for row in result))
+        self.assertGreater(len(result), 0)
+
+    def test_refresh(self):
+        flight = self.flights[0]
+        changed = flight[:-1] + ("delayed",)
+        cursor_rows = [changed]
+
+        class Cursor:
+            description = [(column,) for column in COLUMNS]
+
+            def __enter__(self):
+                return self
+
+            def __exit__(self, *args):
+                pass
+
+            def execute(self, sql, args=None):
+                pass
+
+            def fetchone(self):
+                return cursor_rows.pop(0)
+
+        class Connection:
+            server_status = 0
+
+            def cursor(self):
+                return Cursor()
+
+        self.index.refresh(Connection(), *flight[:3])
+        result, _ = self.index.search(
+            None,
+            (flight[1], None),
+            (None, None),
+            (None, None),
+            (None, None),
+            dict(flight_number=flight[0]),
+        )
+        self.assertIn(changed, result)
+        self.assertNotIn(flight, result)
+        self.assertEqual(len(self.index), len(self.flights))
+
+    def test_refresh_failure(self):
+        flight = self.flights[0]
+        conn = FakeConnection(
+            fail=lambda sql, args: OperationalError(1205, "Lock wait timeout exceeded")
+        )
+        with self.assertLogs("airbook.flight_index", "WARNING"):
+            self.index.refresh(conn, *flight[:3])
+        # The flight is read again with the rest of the index
+        self.assertFalse(self.index.loaded)
+
+    def test_preload_once(self):
+        index = FlightIndex(ttl=60, past_days=0)
+        connects = []
+
+        def connect():
+            connects.append(None)
+            raise ConnectionError("The database is down")
+
+        with self.assertLogs("airbook.flight_index", "ERROR") as logs:
+            index.preload(connect)
+            index.preload(connect)
+            for _ in range(100):
+                if len(logs.records) > 0:
+                    break
+                time.sleep(0.01)
+        self.assertEqual(len(connects), 1)
+        self.assertFalse(index.loaded)
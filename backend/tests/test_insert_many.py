@@ -0,0 +1,69 @@
+import unittest
+
+from pymysql.err import IntegrityError
+from backend.tests.utils import FakeConnection
+from backend.utils.query import insert_many, insert_rows
+from backend.utils.error import QueryDuplicateError, QueryKeyError
+
+
+def fail_on_abc(sql, args):
+    if "ABC" in args:
+        return IntegrityError(1062, "Duplicate entry 'ABC' for key 'airport.PRIMARY'")
+
+
+def airports(*names):
+    return [dict(airport_name=name, city="Shanghai") for name in names]
+
+
+class TestInsertMany(unittest.TestCase):
+    def test_chunks(self):
+        conn = FakeConnection(fail=fail_on_abc)
+        report = insert_many(
+            conn, "Airport", airports("PVG", "SHA", "PEK", "CAN", "SZX"), chunk_size=2
+        )
+        self.assertEqual(report.inserted, 5)
+        self.assertEqual(report.chunks, 3)
+        self.assertEqual(report.errors, [])
+        self.assertEqual(
+            conn.executed[0][0],
+            "INSERT INTO Airport (airport_name,city) VALUES (%s,%s),(%s,%s);",
+        )
+        self.assertEqual(conn.executed[2][1], ["SZX", "Shanghai"])
+
+    def test_duplicate_chunk(self):
+        conn = FakeConnection(fail=fail_on_abc)
+        report = insert_many(
+            conn, "Airport", airports("PVG", "SHA", "ABC", "CAN", "SZX"), chunk_size=2
+        )
+        self.assertEqual(report.inserted, 3)
+        self.assertEqual(len(report.get_duplicates()), 1)
+        chunk = report.errors[0]
+        self.assertEqual((chunk.start, chunk.end), (2, 4))
+        self.assertEqual(chunk.error.value, "ABC")
+
+    def test_fail_fast(self):
+        conn = FakeConnection(fail=fail_on_abc)
+        with self.assertRaises(QueryDuplicateError):
+            insert_many(
+                conn, "Airport", airports("ABC", "PVG"), chunk_size=1, fail_fast=True
+            )
+        self.assertEqual(len(conn.executed), 1)
+
+    def test_missing_key(self):
+        with self.assertRaises(QueryKeyError):
+            insert_many(
+                FakeConnection(fail=fail_on_abc),
+                "Airport",
+                airports("PVG") + [dict(city="Beijing")],
+            )
+
+    def test_upsert(self):
+        conn = FakeConnection(fail=fail_on_abc)
+        insert_rows(
+            conn, "Airport", ("airport_name", "city"), [("PVG", "Shanghai")], ["city"]
+        )
+        self.assertEqual(
+            conn.executed[0][0],
+            "INSERT INTO Airport (airport_name,city) VALUES (%s,%s) "
+            "ON DUPLICATE KEY UPDATE city=VALUES(city);",
+        )
@@ -0,0 +1,253 @@
+import random
+import unittest
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from flask import Flask
+from backend.utils.error import JsonError
+from backend.utils.flight_index import FlightIndex
+from backend.utils.itinerary import (
+    Itinerary,
+    ItinerarySearch,
+    Schedule,
+    find_itineraries,
+    parse_itinerary_search,
+)
+
+COLUMNS = (
+    "flight_number",
+    "dep_date",
+    "dep_time",
+    "dep_airport",
+    "arr_date",
+    "arr_time",
+    "arr_airport",
+    "base_price",
+    "airline_name",
+    "dep_city",
+    "arr_city",
+)
+CITIES = {
+    "PVG": "Shanghai",
+    "SHA": "Shanghai",
+    "PEK": "Beijing",
+    "JFK": "New York",
+    "LAX": "Los Angeles",
+}
+
+
+def flight(number, dep_airport, departure, arr_airport, hours, price=100):
+    arrival = departure + timedelta(hours=hours)
+    return (
+        number,
+        departure.date(),
+        timedelta(hours=departure.hour, minutes=departure.minute),
+        dep_airport,
+        arrival.date(),
+        timedelta(hours=arrival.hour, minutes=arrival.minute),
+        arr_airport,
+        Decimal(price),
+        "China Eastern",
+        CITIES[dep_airport],
+        CITIES[arr_airport],
+    )
+
+
+def create_schedule(flights):
+    return Schedule(flights, {column: i for i, column in enumerate(COLUMNS)})
+
+
+def brute_force(flights, origins, destinations, day, max_stops, layovers):
+    """
+    Every itinerary, by trying all the sequences of flights.
+    """
+    legs = [
+        leg for legs in create_schedule(flights).departures.values() for leg in legs
+    ]
+    found = []
+
+    def extend(path):
+        last = path[-1]
+        if last.destination in destinations:
+            found.append(tuple(path))
+            return
+        if len(path) > max_stops:
+            return
+        visited = origins | {leg.origin for leg in path}
+        for leg in legs:
+            layover = leg.departure - last.arrival
+            if (
+                leg.origin == last.destination
+                and layovers[0] <= layover <= layovers[1]
+                and leg.destination not in visited
+            ):
+                extend(path + [leg])
+
+    for leg in legs:
+        if (
+            leg.origin in origins
+            and leg.destination not in origins
+            and leg.departure.date() == day
+        ):
+            extend([leg])
+    return found
+
+
+class TestItinerary(unittest.TestCase):
+    def setUp(self):
+        self.day = datetime(2030, 5, 28, 8)
+        self.flights = [
+            flight(1, "PVG", self.day, "PEK", 2),
+            flight(2, "PEK", self.day + timedelta(hours=3), "JFK", 13, 500),
+            # Too short a layover after flight 1
+            flight(3, "PEK", self.day + timedelta(hours=2, minutes=20), "JFK", 12),
+            flight(4, "SHA", self.day + timedelta(hours=1), "JFK", 15, 900),
+            flight(5, "PVG", self.day + timedelta(hours=2), "LAX", 11, 300),
+            flight(6, "LAX", self.day + timedelta(hours=14), "JFK", 5, 200),
+            # The next day
+            flight(7, "PVG", self.day + timedelta(days=1), "JFK", 14),
+            flight(8, "JFK", self.day + timedelta(days=7), "PVG", 15),
+        ]
+        self.schedule = create_schedule(self.flights)
+        self.layovers = (timedelta(minutes=45), timedelta(hours=6))
+
+    def find(self, max_stops=1, sort_by="duration", top_k=10):
+        result, truncated = find_itineraries(
+            self.schedule,
+            self.schedule.resolve(None, "Shanghai"),
+            self.schedule.resolve("jfk", None),
+            self.day.date(),
+            max_stops,
+            *self.layovers,
+            top_k,
+            sort_by=sort_by,
+        )
+        self.assertFalse(truncated)
+        return result
+
+    def test_connections(self):
+        result = [[leg.flight_number for leg in it.legs] for it in self.find()]
+        self.assertEqual(result, [[4], [1, 2], [5, 6]])
+        self.assertEqual(
+            [[4]], [[leg.flight_number for leg in it.legs] for it in self.find(0)]
+        )
+
+    def test_sort_by_price(self):
+        result = self.find(sort_by="price")
+        self.assertEqual([it.price for it in result], [500, 600, 900])
+        self.assertEqual(len(self.find(sort_by="price", top_k=1)), 1)
+
+    def test_same_as_brute_force(self):
+        generator = random.Random(24)
+        airports = sorted(CITIES)
+        flights = []
+        for number in range(300):
+            dep_airport, arr_airport = generator.sample(airports, 2)
+            departure = datetime(2030, 5, 28) + timedelta(
+                minutes=generator.randrange(0, 3 * 24 * 60, 15)
+            )
+            flights.append(
+                flight(
+                    number,
+                    dep_airport,
+                    departure,
+                    arr_airport,
+                    generator.randrange(1, 8),
+                    generator.randrange(50, 500),
+                )
+            )
+        schedule = create_schedule(flights)
+        for sort_by in ("duration", "price", "arrival"):
+            for max_stops in range(3):
+                origins, destinations = {"pvg", "sha"}, {"jfk"}
+                expected = brute_force(
+                    flights,
+                    origins,
+                    destinations,
+                    date(2030, 5, 28),
+                    max_stops,
+                    self.layovers,
+                )
+                result, truncated = find_itineraries(
+                    schedule,
+                    origins,
+                    destinations,
+                    date(2030, 5, 28),
+                    max_stops,
+                    *self.layovers,
+                    top_k=5,
+                    sort_by=sort_by,
+                    max_expansions=10 ** 6,
+                )
+                cost = {
+                    "duration": lambda it: it.duration,
+                    "price": lambda it: it.price,
+                    "arrival": lambda it: it.legs[-1].arrival,
+                }[sort_by]
+                self.assertFalse(truncated)
+                self.assertGreater(len(expected), 5)
+                # The costs of the top 5 match, whichever tie came first
+                self.assertEqual(
+                    sorted(cost(it) for it in result),
+                    sorted(cost(Itinerary(legs)) for legs in expected)[:5],
+                )
+
+    def test_round_trip(self):
+        index = FlightIndex(ttl=60, past_days=0, today=lambda: date(2030, 5, 28))
+        index.replace(
+            self.flights, [(column,) for column in COLUMNS], date(2030, 5, 28)
+        )
+        search = parse_itinerary_search(
+            dict(
+                dep_city="shanghai",
+                arr_airport="JFK",
+                dep_date="2030-05-28",
+                return_date="2030-06-04",
+                max_stops="0",
+            )
+        )
+        result = ItinerarySearch(index).search(None, search, now=self.day)
+        self.assertEqual(
+            [it["legs"][0]["flight_number"] for it in result["outbound"]], [4]
+        )
+        self.assertEqual(
+            [it["legs"][0]["flight_number"] for it in result["return"]], [8]
+        )
+        self.assertEqual(result["outbound"][0]["duration"], 15 * 60)
+        self.assertFalse(result["truncated"])
+
+    def test_truncated(self):
+        result, truncated = find_itineraries(
+            self.schedule,
+            self.schedule.resolve(None, "Shanghai"),
+            self.schedule.resolve("jfk", None),
+            self.day.date(),
+            1,
+            *self.layovers,
+            10,
+            max_expansions=1,
+        )
+        self.assertTrue(truncated)
+        # The itineraries that were not reached are missing
+        self.assertLess(len(result), len(self.find()))
+
+    def test_invalid_search(self):
+        with Flask(__name__).app_context():
+            for data in (
+                dict(arr_airport="JFK", dep_date="2030-05-28"),
+                dict(dep_airport="PVG", arr_airport="JFK", dep_date="soon"),
+                dict(
+                    dep_airport="PVG",
+                    arr_airport="JFK",
+                    dep_date="2030-05-28",
+                    max_stops=3,
+                ),
+                dict(
+                    dep_airport="PVG",
+                    arr_airport="JFK",
+                    dep_date="2030-05-28",
+                    sort_by="name",
+                ),
+            ):
+                with self.assertRaises(JsonError):
+                    parse_itinerary_search(data)
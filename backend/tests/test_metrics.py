@@ -0,0 +1,14 @@
+import flask_unittest  # type: ignore
+from backend.app import app
+from backend.utils.metrics import counter
+
+
+class TestMetrics(flask_unittest.ClientTestCase):
+    app = app
+
+    def test_metrics(self, client):
+        counter("db_reconnects").increment()
+        response = client.get("/metrics")
+        self.assertEqual("success", response.json["result"])
+        self.assertGreaterEqual(response.json["data"]["counters"]["db_reconnects"], 1)
+        self.assertEqual(set(response.json["data"]["pool"]), {"size", "idle"})
@@ -0,0 +1,88 @@
+import unittest
+
+from datetime import date, timedelta
+from decimal import Decimal
+from backend.tests.utils import FakeClock
+from backend.utils.occupancy import OccupancyCache, flight_key
+from backend.utils.flight import compute_price
+
+KEY = flight_key("1", "2022-05-01", "09:00:00")
+
+
+class TestOccupancy(unittest.TestCase):
+    def setUp(self):
+        self.rows = {KEY: [Decimal("100.00"), 6, 10]}
+        self.loads = 0
+        self.clock = FakeClock()
+        self.cache = OccupancyCache(
+            self.load, self.load_many, max_size=2, ttl=30, clock=self.clock
+        )
+
+    def load(self, conn, key):
+        self.loads += 1
+        row = self.rows.get(key)
+        return None if row is None else tuple(row)
+
+    def load_many(self, conn, keys):
+        self.loads += 1
+        # Rows come back from MySQL with date and timedelta key columns
+        return [
+            (
+                key[0],
+                date.fromisoformat(key[1]),
+                timedelta(hours=int(key[2][:2])),
+                *self.rows[key],
+            )
+            for key in keys
+            if key in self.rows
+        ]
+
+    def test_cached_until_ttl(self):
+        self.assertEqual(self.cache.get(None, KEY).sold, 6)
+        self.rows[KEY][1] = 7
+        self.assertEqual(self.cache.get(None, KEY).sold, 6)
+        self.assertEqual(self.loads, 1)
+        self.clock.now = 30
+        self.assertEqual(self.cache.get(None, KEY).sold, 7)
+        self.assertEqual(self.loads, 2)
+
+    def test_refresh(self):
+        self.cache.get(None, KEY)
+        drift = self.cache.drift.value
+        self.cache.refresh(KEY, Decimal("100.00"), 8, 10)
+        occupancy = self.cache.get(None, KEY)
+        self.assertEqual(occupancy.sold, 8)
+        self.assertEqual(self.loads, 1)
+        # The purchase read the count under lock, so it is not a drift
+        self.assertEqual(self.cache.drift.value, drift)
+
+    def test_missing_flight(self):
+        self.assertIsNone(self.cache.get(None, flight_key(2, "2022-05-01", "09:00:00")))
+
+    def test_get_many(self):
+        self.cache.get(None, KEY)
+        other = flight_key(2, "2022-5-1", "9:00")
+        self.assertEqual(other, (2, "2022-05-01", "09:00:00"))
+        self.rows[other] = [Decimal("50.00"), 0, 10]
+        missing = flight_key(3, "2022-05-01", "09:00:00")
+        result = self.cache.get_many(None, [KEY, other, missing])
+        self.assertEqual(result[KEY].sold, 6)
+        self.assertEqual(result[other].base_price, Decimal("50.00"))
+        self.assertIsNone(result[missing])
+        # One load for KEY, and a single batch for the rest
+        self.assertEqual(self.loads, 2)
+
+    def test_eviction(self):
+        for number in range(2, 4):
+            key = flight_key(number, "2022-05-01", "09:00:00")
+            self.rows[key] = [Decimal("100.00"), 0, 10]
+        self.cache.get(None, KEY)
+        self.cache.get(None, flight_key(2, "2022-05-01", "09:00:00"))
+        self.cache.get(None, flight_key(3, "2022-05-01", "09:00:00"))
+        self.cache.get(None, KEY)
+        self.assertEqual(self.loads, 4)
+
+    def test_compute_price(self):
+        # 7 of 10 seats is exactly 70% and not yet above it
+        self.assertEqual(compute_price(Decimal("100"), 7, 10), Decimal("100"))
+        self.assertEqual(compute_price(Decimal("100"), 8, 10), Decimal("120"))
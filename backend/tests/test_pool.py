@@ -0,0 +1,75 @@
+import threading
+import unittest
+
+from pymysql.err import OperationalError
+from pymysql.constants.SERVER_STATUS import SERVER_STATUS_IN_TRANS
+from backend.utils.pool import ConnectionPool
+from backend.utils.error import PoolTimeoutError
+
+
+class FakeConnection:
+    def __init__(self):
+        self.open = True
+        self.server_status = 0
+        self.rollbacks = 0
+        self.pings = 0
+        self.alive = True
+
+    def ping(self, reconnect=True):
+        self.pings += 1
+        if not self.alive:
+            raise OperationalError(2006, "MySQL server has gone away")
+
+    def close(self):
+        self.open = False
+
+    def rollback(self):
+        self.rollbacks += 1
+        self.server_status = 0
+
+
+class TestPool(unittest.TestCase):
+    def test_reuse(self):
+        pool = ConnectionPool(FakeConnection, min_size=2, max_size=2)
+        conn = pool.acquire()
+        self.assertEqual(pool.size, 2)
+        pool.release(conn)
+        self.assertIs(pool.acquire(), conn)
+
+    def test_timeout(self):
+        pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, timeout=0.01)
+        pool.acquire()
+        with self.assertRaises(PoolTimeoutError):
+            pool.acquire()
+
+    def test_wait_for_release(self):
+        pool = ConnectionPool(FakeConnection, min_size=0, max_size=1, timeout=5)
+        conn = pool.acquire()
+        threading.Timer(0.05, pool.release, (conn,)).start()
+        self.assertIs(pool.acquire(), conn)
+
+    def test_health_check(self):
+        pool = ConnectionPool(FakeConnection, min_size=1, max_size=1)
+        conn = pool.acquire()
+        conn.server_status = SERVER_STATUS_IN_TRANS
+        pool.release(conn)
+        self.assertEqual(conn.rollbacks, 1)
+
+        conn = pool.acquire()
+        conn.close()
+        pool.release(conn)
+        self.assertEqual(pool.size, 0)
+        self.assertIsNot(pool.acquire(), conn)
+
+    def test_idle_validation(self):
+        pool = ConnectionPool(FakeConnection, min_size=1, max_size=1, idle_check=60)
+        conn = pool.acquire()
+        pool.release(conn)
+        pool.acquire()
+        self.assertEqual(conn.pings, 0)
+        pool.release(conn)
+
+        pool.idle_check = 0
+        conn.alive = False
+        self.assertIsNot(pool.acquire(), conn)
+        self.assertEqual(conn.pings, 1)
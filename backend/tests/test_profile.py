@@ -0,0 +1,62 @@
+import unittest
+
+from datetime import date
+from backend.tests.utils import FakeClock, FakeConnection
+from backend.utils.authentication import DataType
+from backend.utils.profile import ProfileCache, get_profile_key, get_version
+
+SESSION = dict(user_type="staff", username="staffnumberone")
+ROW = ("staffnumberone", "Jessie", "Chen", date(1992, 2, 4), "China Eastern")
+
+
+class TestProfile(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ProfileCache(max_size=4, ttl=300, clock=self.clock)
+        self.conn = FakeConnection(result=ROW)
+
+    def test_load_and_expire(self):
+        profile = self.cache.load(self.conn, DataType.STAFF, SESSION)
+        self.assertEqual(profile.user_data["airline_name"], "China Eastern")
+        self.assertNotIn("password", profile.user_data)
+        self.assertNotIn("salt", profile.user_data)
+        self.assertEqual(len(self.conn.executed), 1)
+        self.assertIn("first_name", self.conn.statements[0])
+
+        self.assertEqual(self.cache.load(self.conn, DataType.STAFF, SESSION), profile)
+        self.assertEqual(len(self.conn.executed), 1)
+        self.clock.now = 300
+        self.cache.load(self.conn, DataType.STAFF, SESSION)
+        self.assertEqual(len(self.conn.executed), 2)
+
+    def test_stored_at_login(self):
+        key = get_profile_key(DataType.STAFF, SESSION)
+        user_data = dict(
+            user_type="staff",
+            username="staffnumberone",
+            first_name="Jessie",
+            last_name="Chen",
+            date_of_birth=date(1992, 2, 4),
+            airline_name="China Eastern",
+        )
+        stored = self.cache.put(key, user_data)
+        loaded = self.cache.load(self.conn, DataType.STAFF, SESSION)
+        self.assertEqual(loaded, stored)
+        self.assertEqual(self.conn.executed, [])
+
+        self.cache.invalidate(key)
+        reloaded = self.cache.load(self.conn, DataType.STAFF, SESSION)
+        # Loading the same data gives the same version
+        self.assertEqual(reloaded.version, stored.version)
+        self.assertEqual(len(self.conn.executed), 1)
+
+    def test_version(self):
+        user_data = dict(user_type="agent", agent_id=1, email="agent@nyu.edu")
+        self.assertEqual(get_version(user_data), get_version(dict(user_data)))
+        self.assertNotEqual(
+            get_version(user_data), get_version(dict(user_data, email="b@nyu.edu"))
+        )
+
+    def test_invalid_session(self):
+        with self.assertRaises(KeyError):
+            self.cache.load(self.conn, DataType.CUST, SESSION)
@@ -1,6 +1,16 @@
 import flask_unittest  # type: ignore
 from flask import request, Flask
-from backend.app import app
+from backend.app import app, pool
+from backend.utils.query import query, FetchMode, TICKET_PRICE
+
+# The pricing query before it was parameterized, kept to check that prices do not change
+LEGACY_TICKET_PRICE = "SELECT base_price * \
+    (SELECT IF((SELECT COUNT(*)/\
+        (SELECT seat_capacity \
+            FROM Flight JOIN Airplane USING(plane_ID)\
+            where (flight_number, dep_date, dep_time)=({flight_number},%(dep_date)s,%(dep_time)s))\
+        FROM Ticket where (flight_number, dep_date, dep_time)=({flight_number},%(dep_date)s,%(dep_time)s))>0.7,1.2,1)) \
+    FROM Flight WHERE (flight_number, dep_date, dep_time)=({flight_number},%(dep_date)s,%(dep_time)s)"
 
 
 class TestSession(flask_unittest.ClientTestCase):
@@ -14,6 +24,46 @@ class TestSession(flask_unittest.ClientTestCase):
         self.assertEqual(response.json["result"], "success")
         self.assertEqual(response.json["data"], dict(price=45))
 
+    def test_get_ticket_prices(self, client):
+        response = client.post(
+            "/ticket_prices",
+            json=dict(
+                flights=[
+                    dict(flight_number=2323, dep_date="2021-5-28", dep_time="15:31:14"),
+                    dict(flight_number=1, dep_date="1970-01-01", dep_time="00:00:00"),
+                ]
+            ),
+        )
+        self.assertEqual(response.json["result"], "success")
+        self.assertEqual(
+            response.json["data"],
+            dict(prices={"2323,2021-5-28,15:31:14": 45, "1,1970-01-01,00:00:00": None}),
+        )
+
+    def test_ticket_prices_batch_size(self, client):
+        flight = dict(flight_number=2323, dep_date="2021-5-28", dep_time="15:31:14")
+        response = client.post("/ticket_prices", json=dict(flights=[flight] * 1000))
+        self.assertEqual(response.json["result"], "error")
+
+    def test_ticket_price_regression(self, client):
+        with pool.connection() as conn:
+            flights = query(
+                conn, "SELECT flight_number, dep_date, dep_time FROM Flight"
+            )
+            for flight_number, dep_date, dep_time in flights:
+                args = dict(
+                    flight_number=flight_number, dep_date=dep_date, dep_time=dep_time
+                )
+                self.assertEqual(
+                    query(
+                        conn,
+                        LEGACY_TICKET_PRICE.format(flight_number=flight_number),
+                        FetchMode.ONE,
+                        args=args,
+                    ),
+                    query(conn, TICKET_PRICE, FetchMode.ONE, args=args),
+                )
+
     def test_purchase_ticket(self, client):
         response = client.post(
             "/login/cust", json=dict(email="speiaz123@nyu.edu", password="wendy")
@@ -0,0 +1,73 @@
+import logging
+import threading
+import time
+import unittest
+
+from backend.utils.query_log import QueryLog, redact, REDACTED
+
+
+class ListHandler(logging.Handler):
+    def __init__(self):
+        super().__init__()
+        self.lines = []
+
+    def emit(self, record):
+        self.lines.append(self.format(record))
+
+
+class TestQueryLog(unittest.TestCase):
+    def test_redact(self):
+        self.assertEqual(
+            redact(dict(email="a@b.com", flight_number=1, emails=["a@b.com"])),
+            dict(email=REDACTED, flight_number=1, emails=REDACTED),
+        )
+        self.assertEqual(redact(["JFK", "ny2311@nyu.edu"]), ["JFK", REDACTED])
+
+    def test_levels(self):
+        handler = ListHandler()
+        log = QueryLog("slow", slow_ms=100, handler=handler)
+        log.record("SELECT 1", None, 0.01)
+        log.record("SELECT  *\n FROM Flight", dict(email="a@b.com"), 0.5)
+        log.stop()
+        self.assertEqual(
+            handler.lines,
+            [
+                '{"level":"warning","event":"slow_query","duration_ms":500.0,"sql":"SELECT * FROM Flight","args":{"email":"***"}}'
+            ],
+        )
+
+        handler = ListHandler()
+        log = QueryLog("all", sample_rate=0, handler=handler)
+        log.record("SELECT 1", None, 0.01)
+        log.stop()
+        self.assertEqual(handler.lines, [])
+
+    def test_off(self):
+        log = QueryLog("off")
+        self.assertFalse(log.enabled)
+        with self.assertRaises(ValueError):
+            log.configure("verbose")
+
+    def test_error_starts_once(self):
+        class SlowHandler(ListHandler):
+            def setFormatter(self, fmt):
+                # Widens the window in which the other threads reach _start
+                time.sleep(0.05)
+                super().setFormatter(fmt)
+
+        handler = SlowHandler()
+        log = QueryLog("off", handler=handler)
+        barrier = threading.Barrier(8)
+
+        def run():
+            barrier.wait()
+            log.error("SELECT 1", ValueError("failed"))
+
+        threads = [threading.Thread(target=run) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        log.stop()
+        # Each error is logged once, by a single listener
+        self.assertEqual(len(handler.lines), 8)
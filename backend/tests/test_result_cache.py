@@ -0,0 +1,111 @@
+import unittest
+
+from backend.tests.utils import FakeClock, FakeConnection
+from backend.utils.filter import FilterType, query_by_filter
+from backend.utils.query import insert_into, query, transaction, UPDATE_STATUS
+from backend.utils.result_cache import RESULTS, ResultCache
+
+
+class TestResultCache(unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock()
+        self.cache = ResultCache(max_bytes=4096, clock=self.clock)
+        self.loads = 0
+
+    def load(self, value="rows"):
+        def load():
+            self.loads += 1
+            return value
+
+        return load
+
+    def test_ttl(self):
+        self.cache.get_or_load("ttl", "key", ("Flight",), 30, self.load())
+        self.cache.get_or_load("ttl", "key", ("Flight",), 30, self.load())
+        self.assertEqual(self.loads, 1)
+        self.clock.now += 30
+        self.cache.get_or_load("ttl", "key", ("Flight",), 30, self.load())
+        self.assertEqual(self.loads, 2)
+        stats = self.cache.stats()
+        self.assertEqual(stats["filters"]["ttl"], dict(hits=1, misses=2))
+
+    def test_invalidate_by_table(self):
+        self.cache.get_or_load("f", "flights", ("Flight",), 30, self.load())
+        self.cache.get_or_load("f", "planes", ("Airplane",), 30, self.load())
+        self.cache.invalidate(("Flight",))
+        self.cache.get_or_load("f", "flights", ("Flight",), 30, self.load())
+        self.cache.get_or_load("f", "planes", ("Airplane",), 30, self.load())
+        self.assertEqual(self.loads, 3)
+
+    def test_write_during_load(self):
+        # The result was read before the write, so it must not be kept
+        def load():
+            self.cache.invalidate(("Flight",))
+            return "stale"
+
+        self.cache.get_or_load("f", "key", ("Flight",), 30, load)
+        self.assertEqual(len(self.cache), 0)
+
+    def test_byte_bound(self):
+        for key in range(20):
+            self.cache.get_or_load("f", key, (), 30, self.load("x" * 200))
+        self.assertLessEqual(self.cache.stats()["bytes"], 4096)
+        self.assertLess(len(self.cache), 20)
+        # The most recent results are kept
+        self.cache.get_or_load("f", 19, (), 30, self.load())
+        self.assertEqual(self.loads, 20)
+
+
+class TestQueryByFilter(unittest.TestCase):
+    def setUp(self):
+        RESULTS.clear()
+
+    def test_key_ignores_the_session(self):
+        conn = FakeConnection([(("plane",),)])
+        first = query_by_filter(
+            conn, FilterType.AIRLINE_PLANES, airline_name="China Eastern", email="a"
+        )
+        second = query_by_filter(
+            conn, FilterType.AIRLINE_PLANES, airline_name="China Eastern", email="b"
+        )
+        self.assertEqual(first, second)
+        self.assertEqual(len(conn.executed), 1)
+
+    def test_insert_invalidates(self):
+        conn = FakeConnection([(("plane",),), (("plane",), ("new plane",))])
+        query_by_filter(conn, FilterType.AIRLINE_PLANES, airline_name="China Eastern")
+        insert_into(conn, "Airplane", airline_name="China Eastern", seat_capacity=10)
+        result = query_by_filter(
+            conn, FilterType.AIRLINE_PLANES, airline_name="China Eastern"
+        )
+        self.assertEqual(len(result), 2)
+
+    def test_update_invalidates_dependent_filters(self):
+        conn = FakeConnection([(("plane",),), (("flight",),), (), (("flight",),)])
+        query_by_filter(conn, FilterType.AIRLINE_PLANES, airline_name="China Eastern")
+        query_by_filter(conn, FilterType.ALL_FUTURE_FLIGHTS, limit=10)
+        status = dict(
+            status="delayed",
+            flight_number=1,
+            dep_date="2021-05-28",
+            dep_time="15:31:14",
+            airline_name="China Eastern",
+        )
+        query(conn, UPDATE_STATUS, args=status)
+        query_by_filter(conn, FilterType.AIRLINE_PLANES, airline_name="China Eastern")
+        query_by_filter(conn, FilterType.ALL_FUTURE_FLIGHTS, limit=10)
+        # Only the flights were read again
+        self.assertEqual(len(conn.executed), 4)
+
+    def test_transaction_end_invalidates(self):
+        conn = FakeConnection([(("plane",),), (("plane",),)])
+        with transaction(conn):
+            insert_into(conn, "Airplane", airline_name="China Eastern")
+            # Another request reads the table before the commit
+            query_by_filter(
+                conn, FilterType.AIRLINE_PLANES, airline_name="China Eastern"
+            )
+        query_by_filter(conn, FilterType.AIRLINE_PLANES, airline_name="China Eastern")
+        # The planes were read again after the commit
+        selects = [sql for sql in conn.statements if sql.startswith("SELECT")]
+        self.assertEqual(len(selects), 2)
@@ -0,0 +1,71 @@
+import unittest
+
+from decimal import Decimal
+from pymysql.err import OperationalError
+from backend.tests.utils import CARD, FLIGHT, FakeConnection
+from backend.utils.occupancy import OCCUPANCY
+from backend.utils.purchase import get_commission, purchase_ticket
+
+
+class TestSales(unittest.TestCase):
+    def setUp(self):
+        OCCUPANCY.clear()
+
+    def test_commission_rounding(self):
+        # Rounded half up, like MySQL does when it stores the commission
+        self.assertEqual(get_commission(Decimal("45.25")), Decimal("4.53"))
+        self.assertEqual(get_commission(Decimal("120.00")), Decimal("12.00"))
+
+    def test_agent_purchase(self):
+        conn = FakeConnection([(Decimal("45.25"), 0, 10, 1)])
+        ticket_data = dict(FLIGHT, email="a@a.com", booking_agent_id=7, **CARD)
+        self.assertEqual(purchase_ticket(conn, ticket_data), 100)
+        sales = [args for sql, args in conn.executed if "AgentDailySales" in sql]
+        self.assertEqual(sales, [(7, Decimal("4.53"), 1, 100)])
+
+    def test_customer_purchase(self):
+        conn = FakeConnection([(Decimal("45.25"), 0, 10, 1)])
+        purchase_ticket(conn, dict(FLIGHT, email="a@a.com", **CARD))
+        self.assertFalse(any("AgentDailySales" in sql for sql, _ in conn.executed))
+        sales = [args for sql, args in conn.executed if "AirlineDailySales" in sql]
+        self.assertEqual(sales, [(1, 0, Decimal("45.25"), 100)])
+
+    def test_agent_airline_sales(self):
+        conn = FakeConnection([(Decimal("45.25"), 0, 10, 1)])
+        ticket_data = dict(FLIGHT, email="a@a.com", booking_agent_id=7, **CARD)
+        purchase_ticket(conn, ticket_data)
+        # The customer paid the price and the commission
+        sales = [args for sql, args in conn.executed if "AirlineDailySales" in sql]
+        self.assertEqual(sales, [(0, 1, Decimal("49.78"), 100)])
+
+    def test_commission_of_stored_price(self):
+        # 45.04 * 1.2 = 54.048 is stored as 54.05, which earns 5.41 and not 5.40
+        conn = FakeConnection([(Decimal("45.04"), 8, 10, 1)])
+        ticket_data = dict(FLIGHT, email="a@a.com", booking_agent_id=7, **CARD)
+        purchase_ticket(conn, ticket_data)
+        sales = [args for sql, args in conn.executed if "AgentDailySales" in sql]
+        self.assertEqual(sales, [(7, Decimal("5.41"), 1, 100)])
+
+    def test_agent_sales_after_commit(self):
+        def fail(sql, args):
+            if "AgentDailySales" in sql:
+                return OperationalError(1205, "Lock wait timeout exceeded")
+
+        conn = FakeConnection([(Decimal("45.25"), 0, 10, 1)], fail=fail)
+        ticket_data = dict(FLIGHT, email="a@a.com", booking_agent_id=7, **CARD)
+        # The ticket is sold even though its commission could not be added up
+        with self.assertLogs("airbook.sales", "WARNING"):
+            self.assertEqual(purchase_ticket(conn, ticket_data), 100)
+        self.assertEqual(conn.statements[-3], "COMMIT")
+        self.assertIn("AgentDailySales", conn.statements[-1])
+
+    def test_airline_sales_after_commit(self):
+        def fail(sql, args):
+            if "AirlineDailySales" in sql:
+                return OperationalError(1205, "Lock wait timeout exceeded")
+
+        conn = FakeConnection([(Decimal("45.25"), 0, 10, 1)], fail=fail)
+        with self.assertLogs("airbook.sales", "WARNING"):
+            purchase_ticket(conn, dict(FLIGHT, email="a@a.com", **CARD))
+        self.assertEqual(conn.statements[-2], "COMMIT")
+        self.assertIn("AirlineDailySales", conn.statements[-1])
@@ -64,6 +64,13 @@ class TestSearch(flask_unittest.ClientTestCase):
     def test_public_search(self, client):
         response = client.post("/search-public/all_future")
         self.assertEqual("success", response.json["result"])
+        self.assertEqual(self.future_flights, response.json["data"])
+        self.assertEqual(
+            dict(name="dep_date", type="date"), response.json["columns"][5]
+        )
+
+        response = client.post("/search-public/all_future?format=legacy")
+        self.assertEqual("success", response.json["result"])
         self.assertEqual(self.future_flights, json.loads(response.json["data"]))
 
     def test_search(self, client):
@@ -93,7 +100,7 @@ class TestSearch(flask_unittest.ClientTestCase):
             "13:33:44",
             None,
         ]
-        self.assertEqual(expected, json.loads(response.json["data"])[0])
+        self.assertEqual(expected, response.json["data"][0])
 
     def test_search_errors(self, client):
         response = client.post("/search-public/asd")
@@ -184,7 +191,7 @@ class TestSearch(flask_unittest.ClientTestCase):
             ),
         )
         self.assertEqual("success", response.json["result"])
-        self.assertEqual(self.future_flights, json.loads(response.json["data"]))
+        self.assertEqual(self.future_flights, response.json["data"])
 
         filter_data: Dict[str, Any] = dict(
             dep_date_lower="2022-01-01",
@@ -223,7 +230,7 @@ class TestSearch(flask_unittest.ClientTestCase):
             "/search/advanced_flight", json=dict(filter_data=filter_data)
         )
         self.assertEqual("success", response.json["result"])
-        self.assertEqual(expected, json.loads(response.json["data"]))
+        self.assertEqual(expected, response.json["data"])
 
         # Test flight filter for customer
 
@@ -238,7 +245,7 @@ class TestSearch(flask_unittest.ClientTestCase):
             "/search/advanced_flight", json=dict(filter_data=filter_data)
         )
         self.assertEqual("success", response.json["result"])
-        self.assertEqual([], json.loads(response.json["data"]))
+        self.assertEqual([], response.json["data"])
 
         expected = [
             [
@@ -280,7 +287,7 @@ class TestSearch(flask_unittest.ClientTestCase):
             json=dict(filter_data=dict(filter_by_emails=True)),
         )
         self.assertEqual("success", response.json["result"])
-        self.assertEqual(expected, json.loads(response.json["data"]))
+        self.assertEqual(expected, response.json["data"])
 
         # Test flight filter for booking agent
 
@@ -316,7 +323,7 @@ class TestSearch(flask_unittest.ClientTestCase):
             json=dict(filter_data=dict(filter_by_emails=True)),
         )
         self.assertEqual("success", response.json["result"])
-        self.assertEqual(expected, json.loads(response.json["data"]))
+        self.assertEqual(expected, response.json["data"])
 
     def test_search_advanced_spendings(self, client):
         response = client.post(
@@ -359,7 +366,7 @@ class TestSearch(flask_unittest.ClientTestCase):
             ],
         ]
         self.assertEqual("success", response.json["result"])
-        self.assertEqual(expected, json.loads(response.json["data"]))
+        self.assertEqual(expected, response.json["data"])
 
         response = client.post(
             "/search/advanced_spendings",
@@ -367,4 +374,4 @@ class TestSearch(flask_unittest.ClientTestCase):
         )
         expected = [["2021-3", "40.00"], ["2021-4", "104.50"], ["2021-12", "2025.00"]]
         self.assertEqual("success", response.json["result"])
-        self.assertEqual(expected, json.loads(response.json["data"]))
+        self.assertEqual(expected, response.json["data"])
@@ -0,0 +1,66 @@
+import json
+import unittest
+
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from pymysql.constants import FIELD_TYPE
+from backend.utils.serialize import dumps_rows, dumps_legacy, encode_timedelta
+
+
+class TestSerialize(unittest.TestCase):
+    def test_dumps_rows(self):
+        description = (
+            ("flight_number", FIELD_TYPE.LONG),
+            ("dep_date", FIELD_TYPE.DATE),
+            ("dep_time", FIELD_TYPE.TIME),
+            ("base_price", FIELD_TYPE.NEWDECIMAL),
+            ("created_at", FIELD_TYPE.DATETIME),
+        )
+        rows = (
+            (
+                2323,
+                date(2021, 5, 28),
+                timedelta(hours=5, seconds=15),
+                Decimal("45.00"),
+                datetime(2021, 5, 1, 8),
+            ),
+            (7777, None, None, None, None),
+        )
+        result = dumps_rows(rows, description)
+        self.assertEqual(
+            json.loads(result),
+            dict(
+                result="success",
+                columns=[
+                    dict(name="flight_number", type="int"),
+                    dict(name="dep_date", type="date"),
+                    dict(name="dep_time", type="time"),
+                    dict(name="base_price", type="decimal"),
+                    dict(name="created_at", type="datetime"),
+                ],
+                data=[
+                    [2323, "2021-05-28", "5:00:15", "45.00", "2021-05-01 08:00:00"],
+                    [7777, None, None, None, None],
+                ],
+            ),
+        )
+
+    def test_mixed_column(self):
+        # The "divide" rows in the UNION queries put strings into numeric columns
+        rows = ((1, Decimal("4.50")), ("divide", ""))
+        result = json.loads(
+            dumps_rows(rows, (("id", FIELD_TYPE.LONG), ("c", FIELD_TYPE.NEWDECIMAL)))
+        )
+        self.assertEqual(result["data"], [[1, "4.50"], ["divide", ""]])
+
+    def test_encode_timedelta(self):
+        self.assertEqual(encode_timedelta(timedelta(hours=30)), "30:00:00")
+        self.assertEqual(encode_timedelta(timedelta(seconds=-61)), "-0:01:01")
+        self.assertEqual(
+            encode_timedelta(timedelta(hours=5, minutes=20, seconds=15)),
+            str(timedelta(hours=5, minutes=20, seconds=15)),
+        )
+
+    def test_legacy(self):
+        rows = ((1, Decimal("4.50"), date(2021, 3, 24)),)
+        self.assertEqual(json.loads(dumps_legacy(rows)), [[1, "4.50", "2021-03-24"]])
@@ -0,0 +1,153 @@
+import os
+import tempfile
+import unittest
+
+from unittest.mock import patch
+from flask import Flask, jsonify, session
+from backend.tests.utils import FakeClock
+from backend.tools.fake_redis import FakeRedisServer
+from backend.utils.resp import RespClient
+from backend import config
+from backend.utils.session import (
+    get_secret_key,
+    MemorySessionStore,
+    RespSessionStore,
+    ServerSessionInterface,
+    SQLiteSessionStore,
+)
+
+
+def create_app(store):
+    app = Flask(__name__)
+    app.secret_key = "shared-secret"
+    app.session_interface = ServerSessionInterface(store, ttl=60)
+
+    @app.route("/login/<email>", methods=["POST"])
+    def login(email):
+        session.clear()
+        session["user_type"] = "cust"
+        session["email"] = email
+        return jsonify(result="success")
+
+    @app.route("/whoami")
+    def whoami():
+        return jsonify(email=session.get("email"))
+
+    @app.route("/logout", methods=["POST"])
+    def logout():
+        session.clear()
+        return jsonify(result="success")
+
+    return app
+
+
+class StoreTests:
+    def test_sliding_expiry(self):
+        self.store.set("sid", b'{"email":"a@nyu.edu"}', 60)
+        self.clock.now += 50
+        self.assertEqual(self.store.get("sid"), b'{"email":"a@nyu.edu"}')
+        self.store.touch("sid", 60)
+        self.clock.now += 50
+        self.assertIsNotNone(self.store.get("sid"))
+        self.clock.now += 10
+        self.assertIsNone(self.store.get("sid"))
+
+    def test_delete(self):
+        self.store.set("sid", b"{}", 60)
+        self.store.delete("sid")
+        self.assertIsNone(self.store.get("sid"))
+
+
+class TestMemorySessionStore(StoreTests, unittest.TestCase):
+    def setUp(self):
+        self.clock = FakeClock(1000.0)
+        self.store = MemorySessionStore(max_size=8, clock=self.clock)
+
+
+class TestSQLiteSessionStore(StoreTests, unittest.TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.clock = FakeClock(1000.0)
+        self.path = os.path.join(self.directory.name, "sessions.db")
+        self.store = SQLiteSessionStore(self.path, clock=self.clock)
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def test_shared_between_workers(self):
+        # Two processes with the same secret serve the same sessions
+        first = create_app(SQLiteSessionStore(self.path)).test_client()
+        second = create_app(SQLiteSessionStore(self.path)).test_client()
+        first.post("/login/speiaz123@nyu.edu")
+        cookie = first.get_cookie("session")
+        second.set_cookie(cookie.key, cookie.value)
+        self.assertEqual(second.get("/whoami").json["email"], "speiaz123@nyu.edu")
+
+
+class TestRespSessionStore(unittest.TestCase):
+    def setUp(self):
+        self.server = FakeRedisServer().start()
+        self.client = RespClient(port=self.server.port)
+        self.store = RespSessionStore(self.client)
+
+    def tearDown(self):
+        self.client.close()
+        self.server.shutdown()
+        self.server.server_close()
+
+    def test_set_get_delete(self):
+        self.store.set("sid", b'{"email":"a@nyu.edu"}', 60)
+        self.assertEqual(self.store.get("sid"), b'{"email":"a@nyu.edu"}')
+        self.store.touch("sid", 30)
+        self.assertLessEqual(self.client.execute("PTTL", "airbook:session:sid"), 30000)
+        self.store.delete("sid")
+        self.assertIsNone(self.store.get("sid"))
+
+    def test_reconnect(self):
+        self.store.set("sid", b"{}", 60)
+        # The connection broke, like when the server restarts
+        self.client._sock.close()
+        self.assertEqual(self.store.get("sid"), b"{}")
+
+
+class TestServerSession(unittest.TestCase):
+    def setUp(self):
+        self.store = MemorySessionStore(max_size=8)
+        self.client = create_app(self.store).test_client()
+
+    def test_cookie_holds_only_the_id(self):
+        self.client.post("/login/speiaz123@nyu.edu")
+        cookie = self.client.get_cookie("session")
+        self.assertNotIn("speiaz123", cookie.value)
+        self.assertEqual(self.client.get("/whoami").json["email"], "speiaz123@nyu.edu")
+
+    def test_login_changes_the_id(self):
+        self.client.post("/login/speiaz123@nyu.edu")
+        before = self.client.get_cookie("session").value
+        self.client.post("/login/other@nyu.edu")
+        after = self.client.get_cookie("session").value
+        self.assertNotEqual(before, after)
+        self.assertEqual(len(self.store._sessions), 1)
+
+    def test_logout(self):
+        self.client.post("/login/speiaz123@nyu.edu")
+        self.client.post("/logout")
+        self.assertIsNone(self.client.get_cookie("session"))
+        self.assertEqual(len(self.store._sessions), 0)
+
+    def test_forged_cookie(self):
+        self.client.post("/login/speiaz123@nyu.edu")
+        cookie = self.client.get_cookie("session")
+        sid = cookie.value.rsplit(".", 1)[0]
+        self.client.set_cookie("session", sid + ".forged")
+        self.assertIsNone(self.client.get("/whoami").json["email"])
+
+
+class TestSecretKey(unittest.TestCase):
+    def test_shared_backends_require_a_key(self):
+        with patch.object(config, "SECRET_KEY", None):
+            self.assertEqual(len(get_secret_key("memory")), 32)
+            with self.assertRaises(ValueError):
+                get_secret_key("sqlite")
+        with patch.object(config, "SECRET_KEY", "shared"):
+            self.assertEqual(get_secret_key("redis"), "shared")
@@ -0,0 +1,22 @@
+import unittest
+
+from backend.tests.utils import FakeConnection
+from backend.utils import staff
+from backend.utils.staff import get_staff_airline
+
+
+class TestStaffAirline(unittest.TestCase):
+    def setUp(self):
+        staff.AIRLINES.clear()
+
+    def test_cached_in_session(self):
+        conn = FakeConnection(result=("China Eastern",))
+        session = dict(username="staffnumberone")
+        self.assertEqual(get_staff_airline(conn, session), "China Eastern")
+        self.assertEqual(get_staff_airline(conn, session), "China Eastern")
+        self.assertEqual(len(conn.executed), 1)
+        # Another session of the same staff member uses the in-process map
+        self.assertEqual(
+            get_staff_airline(conn, dict(username="staffnumberone")), "China Eastern"
+        )
+        self.assertEqual(len(conn.executed), 1)
@@ -0,0 +1,30 @@
+import unittest
+
+from backend.utils.statements import PreparedStatement, STATEMENTS
+from backend.utils.query import CHECK_AGENT_LOGIN
+from backend.utils.filter import FILTER_TO_QUERY_MAP
+
+
+class TestStatements(unittest.TestCase):
+    def test_bind(self):
+        statement = STATEMENTS[CHECK_AGENT_LOGIN]
+        self.assertEqual(("booking_agent_id", "email"), statement.params)
+        self.assertIn("(%s, %s)", statement.sql)
+        self.assertEqual(
+            (1, "book3083@booking.com"),
+            statement.bind(
+                dict(email="book3083@booking.com", booking_agent_id=1, password="x")
+            ),
+        )
+        with self.assertRaises(KeyError):
+            statement.bind(dict(email="book3083@booking.com"))
+
+    def test_repeated_param(self):
+        statement = PreparedStatement("SELECT %(a)s, %(b)s, %(a)s")
+        self.assertEqual("SELECT %s, %s, %s", statement.sql)
+        self.assertEqual((1, 2, 1), statement.bind(dict(a=1, b=2)))
+
+    def test_registered_filters(self):
+        for sql in FILTER_TO_QUERY_MAP.values():
+            # Any "%" left over would break positional formatting
+            self.assertNotIn("%", STATEMENTS[sql].sql.replace("%s", ""))
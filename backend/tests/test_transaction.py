@@ -0,0 +1,57 @@
+import unittest
+
+from pymysql.err import OperationalError
+from backend.tests.utils import FakeConnection
+from backend.utils.query import insert_into, query, transaction
+
+
+def drop_once(conn):
+    def fail(sql, args):
+        if conn.connects == 0:
+            conn.server_status = 0
+            return OperationalError(
+                2013, "Lost connection to MySQL server during query"
+            )
+
+    conn.fail = fail
+
+
+class TestTransaction(unittest.TestCase):
+    def test_commit(self):
+        conn = FakeConnection(result=((1,),))
+        with transaction(conn):
+            query(conn, "SELECT 1")
+        self.assertEqual(conn.statements, ["BEGIN", "SELECT 1", "COMMIT"])
+
+    def test_rollback(self):
+        conn = FakeConnection(result=((1,),))
+        with self.assertRaises(ValueError):
+            with transaction(conn):
+                query(conn, "SELECT 1")
+                raise ValueError()
+        self.assertEqual(conn.statements, ["BEGIN", "SELECT 1", "ROLLBACK"])
+
+    def test_no_retry_in_transaction(self):
+        conn = FakeConnection(result=((1,),))
+        drop_once(conn)
+        with self.assertRaises(OperationalError):
+            with transaction(conn):
+                query(conn, "SELECT 1")
+        self.assertEqual(conn.connects, 1)
+        self.assertEqual(conn.statements.count("SELECT 1"), 1)
+
+    def test_retry_outside_transaction(self):
+        conn = FakeConnection(result=((1,),))
+        drop_once(conn)
+        self.assertEqual(query(conn, "SELECT 1"), ((1,),))
+        self.assertEqual(conn.statements.count("SELECT 1"), 2)
+
+    def test_insert_commits_with_the_transaction(self):
+        conn = FakeConnection(autocommit=False)
+        with transaction(conn):
+            insert_into(conn, "Airport", airport_name="PVG", city="Shanghai")
+            insert_into(conn, "Airport", airport_name="SHA", city="Shanghai")
+        self.assertEqual(conn.statements.count("COMMIT"), 1)
+        self.assertEqual(conn.statements[-1], "COMMIT")
+        insert_into(conn, "Airport", airport_name="PEK", city="Beijing")
+        self.assertEqual(conn.statements[-1], "COMMIT")
@@ -1,5 +1,18 @@
 import flask_unittest  # type: ignore
 
+from pymysql.constants.SERVER_STATUS import SERVER_STATUS_IN_TRANS
+
+# A flight and a payment card for the purchase tests
+FLIGHT = dict(
+    airline_name="China Eastern",
+    flight_number=1,
+    dep_date="2030-01-01",
+    dep_time="09:00:00",
+)
+CARD = dict(
+    card_type="credit", card_number="1234", name_on_card="A", exp_date="2031-01-01"
+)
+
 
 class AirbookTestCase(flask_unittest.ClientTestCase):
     def staff_login(self, client):
@@ -7,3 +20,89 @@ class AirbookTestCase(flask_unittest.ClientTestCase):
             "/login/staff", json=dict(username="staffnumberone", password="wendy")
         )
         assert response.json["result"] == "success"
+
+
+class FakeClock:
+    def __init__(self, now=0.0):
+        self.now = now
+
+    def __call__(self):
+        return self.now
+
+
+class FakeCursor:
+    def __init__(self, conn):
+        self.conn = conn
+        self.description = None
+        self.lastrowid = None
+        self.result = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        pass
+
+    def execute(self, sql, args=None):
+        self.conn.executed.append((sql, args))
+        error = self.conn.fail(sql, args)
+        if error is not None:
+            raise error
+        if sql.startswith("INSERT"):
+            self.lastrowid = self.conn.lastrowid
+            # The rows of a multi-row insert
+            return sql.count("(%s")
+        self.result = (
+            self.conn.results.pop(0) if len(self.conn.results) > 0 else self.conn.result
+        )
+
+    def fetchone(self):
+        return self.result
+
+    def fetchall(self):
+        return self.result
+
+
+class FakeConnection:
+    """
+    A stand-in for a pymysql connection, which records the statements run on it in
+    `executed` as (sql, args). The statements other than INSERT return the `results` in
+    order, then `result`. `fail(sql, args)` may return an error for a statement to raise.
+    """
+
+    def __init__(
+        self, results=(), result=None, fail=None, lastrowid=100, autocommit=True
+    ):
+        self.results = list(results)
+        self.autocommit = autocommit
+        self.result = result
+        self.fail = fail or (lambda sql, args: None)
+        self.lastrowid = lastrowid
+        self.executed = []
+        self.server_status = 0
+        self.connects = 0
+
+    @property
+    def statements(self):
+        return [sql for sql, _ in self.executed]
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def begin(self):
+        self.executed.append(("BEGIN", None))
+        self.server_status |= SERVER_STATUS_IN_TRANS
+
+    def commit(self):
+        self.executed.append(("COMMIT", None))
+        self.server_status = 0
+
+    def rollback(self):
+        self.executed.append(("ROLLBACK", None))
+        self.server_status = 0
+
+    def get_autocommit(self):
+        return self.autocommit
+
+    def connect(self):
+        self.connects += 1
@@ -0,0 +1,112 @@
+import argparse
+import threading
+import time
+
+from os import urandom
+from typing import List, Tuple
+from backend.utils.encryption import derive, get_parameters
+from backend.utils.error import ExecutorBusyError
+from backend.utils.executor import BoundedExecutor
+from backend import config
+
+"""
+Measure how many password checks per second the hashing executor sustains for a range
+of pool sizes, with a fixed number of request threads hammering it like a login storm.
+"inline" hashes on the request threads themselves, which is what /login used to do.
+
+    python -m backend.tools.bench_hashing --clients 32 --logins 2000 --workers 1 2 4 8
+"""
+
+PASSWORD = "exampleasd12345"
+SALT = urandom(16)
+
+
+def derive_hash(password: str, salt: bytes) -> str:
+    # Hash with the parameters that new hashes use
+    return derive(
+        config.HASH_ALGORITHM, get_parameters(config.HASH_ALGORITHM), password, salt
+    )
+
+
+def storm(clients: int, logins: int, check) -> Tuple[float, List[float], int]:
+    """
+    Run `logins` checks from `clients` threads. Returns the elapsed time, the latencies
+    of the checks that went through and how many were rejected.
+    """
+    remaining = [logins]
+    latencies: List[float] = []
+    rejected = [0]
+    lock = threading.Lock()
+
+    def client():
+        while True:
+            with lock:
+                if remaining[0] == 0:
+                    return
+                remaining[0] -= 1
+            start = time.perf_counter()
+            try:
+                check()
+            except ExecutorBusyError:
+                with lock:
+                    rejected[0] += 1
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=client) for i in range(clients)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return time.perf_counter() - start, latencies, rejected[0]
+
+
+def report(name: str, elapsed: float, latencies: List[float], rejected: int):
+    latencies.sort()
+    percentile = lambda p: latencies[min(len(latencies) - 1, int(len(latencies) * p))]
+    print(
+        "{:<10} {:8.0f} logins/s, p50 {:7.2f} ms, p99 {:7.2f} ms, {:5d} rejected".format(
+            name,
+            len(latencies) / elapsed,
+            percentile(0.5) * 1e3,
+            percentile(0.99) * 1e3,
+            rejected,
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--clients", type=int, default=32)
+    parser.add_argument("--logins", type=int, default=2000)
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4, 8])
+    parser.add_argument(
+        "--max-queue",
+        type=int,
+        default=None,
+        help="Defaults to the number of clients, so that nothing is rejected",
+    )
+    options = parser.parse_args()
+    max_queue = options.clients if options.max_queue is None else options.max_queue
+
+    # Warm up OpenSSL before timing anything
+    derive_hash(PASSWORD, SALT)
+    report(
+        "inline",
+        *storm(options.clients, options.logins, lambda: derive_hash(PASSWORD, SALT))
+    )
+    for workers in options.workers:
+        executor = BoundedExecutor("bench", workers, max_queue, timeout=60)
+        result = storm(
+            options.clients,
+            options.logins,
+            lambda: executor.run(derive_hash, PASSWORD, SALT),
+        )
+        executor.shutdown()
+        report("{} workers".format(workers), *result)
+
+
+if __name__ == "__main__":
+    main()
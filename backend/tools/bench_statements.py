@@ -0,0 +1,115 @@
+import argparse
+import time
+
+import pymysql
+
+from backend import config
+from backend.utils.query import CHECK_CUST_LOGIN, CHECK_STAFF_LOGIN, STAFF_AIRLINE
+from backend.utils.filter import SELECT_FLIGHT_CUSTOMERS
+from backend.utils.statements import STATEMENTS
+
+"""
+Compare the plain text path (`cursor.execute(sql, dict)`) with the registered
+statements (`cursor.execute(statement.sql, statement.bind(dict))`).
+
+The argument dicts mimic what the endpoints pass: the statement parameters plus
+the unrelated session and filter values that ride along.
+
+    python -m backend.tools.bench_statements --iterations 5000
+"""
+
+EXTRA_ARGS = dict(
+    user_type="staff",
+    is_customer=False,
+    is_staff=True,
+    agent_id=None,
+    emails=["speiaz123@nyu.edu", "ny2311@nyu.edu"],
+    filter_by_emails=False,
+    dep_date_lower="2021-01-01",
+    dep_date_upper="2022-01-01",
+)
+
+CASES = [
+    (CHECK_CUST_LOGIN, dict(email="speiaz123@nyu.edu", password="wendy")),
+    (CHECK_STAFF_LOGIN, dict(username="staffnumberone", password="wendy")),
+    (STAFF_AIRLINE, dict(username="staffnumberone", **EXTRA_ARGS)),
+    (
+        SELECT_FLIGHT_CUSTOMERS,
+        dict(
+            flight_number=2323,
+            dep_date="2021-05-28",
+            dep_time="15:31:14",
+            airline_name="China Eastern",
+            username="staffnumberone",
+            **EXTRA_ARGS
+        ),
+    ),
+]
+
+
+def run(cursor, iterations: int, execute) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        for sql, args in CASES:
+            execute(cursor, sql, args)
+            cursor.fetchall()
+    return time.perf_counter() - start
+
+
+def text_protocol(cursor, sql, args):
+    cursor.execute(sql, args)
+
+
+def registered(cursor, sql, args):
+    statement = STATEMENTS[sql]
+    cursor.execute(statement.sql, statement.bind(args))
+
+
+def mogrify_only(cursor, iterations: int, use_registry: bool) -> float:
+    start = time.perf_counter()
+    for i in range(iterations):
+        for sql, args in CASES:
+            if use_registry:
+                statement = STATEMENTS[sql]
+                cursor.mogrify(statement.sql, statement.bind(args))
+            else:
+                cursor.mogrify(sql, args)
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--iterations", type=int, default=2000)
+    options = parser.parse_args()
+
+    conn = pymysql.connect(
+        host=config.DB_HOST,
+        port=config.DB_PORT,
+        user=config.DB_USER,
+        password=config.DB_PASSWORD,
+        database=config.DB_NAME,
+        autocommit=True,
+    )
+    statements = options.iterations * len(CASES)
+    with conn.cursor() as cursor:
+        # Warm up the server caches before timing anything
+        run(cursor, 100, text_protocol)
+        for name, use_registry in (("text", False), ("registered", True)):
+            elapsed = mogrify_only(cursor, options.iterations, use_registry)
+            print(
+                "{:<12} client-side: {:8.2f} us/statement".format(
+                    name, elapsed / statements * 1e6
+                )
+            )
+        for name, execute in (("text", text_protocol), ("registered", registered)):
+            elapsed = run(cursor, options.iterations, execute)
+            print(
+                "{:<12} end-to-end:  {:8.2f} us/statement, {:8.0f} statements/s".format(
+                    name, elapsed / statements * 1e6, statements / elapsed
+                )
+            )
+    conn.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+import argparse
+import time
+
+from os import urandom
+from typing import Dict
+from backend.utils.encryption import derive, KEY_LENGTH
+
+"""
+Pick the cost of the password hash that takes about `--target-ms` per hash on this machine,
+and print the settings to deploy it with.
+
+PBKDF2 scales linearly with its iterations, so they are extrapolated from a measurement and
+checked once. scrypt takes a power of two for n, which is doubled until the target is met.
+
+    python -m backend.tools.calibrate_hash --algorithm pbkdf2-sha256 --target-ms 100
+"""
+
+PASSWORD = "exampleasd12345"
+
+
+def measure(algorithm: str, parameters: Dict[str, int], repeat: int) -> float:
+    salt = urandom(16)
+    # Take the fastest run, the others were disturbed by something else
+    best = float("inf")
+    for i in range(repeat):
+        start = time.perf_counter()
+        derive(algorithm, parameters, PASSWORD, salt)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def calibrate_pbkdf2(target: float, repeat: int) -> Dict[str, int]:
+    parameters = dict(i=10000, l=KEY_LENGTH)
+    elapsed = measure("pbkdf2-sha256", parameters, repeat)
+    # Round to a thousand iterations, it is plenty precise
+    iterations = max(1000, round(parameters["i"] * target / elapsed, -3))
+    return dict(i=int(iterations), l=KEY_LENGTH)
+
+
+def calibrate_scrypt(target: float, repeat: int, r: int, p: int) -> Dict[str, int]:
+    parameters = dict(n=1024, r=r, p=p, l=KEY_LENGTH)
+    while measure("scrypt", parameters, repeat) < target:
+        parameters["n"] *= 2
+    return parameters
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument(
+        "--algorithm", choices=("pbkdf2-sha256", "scrypt"), default="pbkdf2-sha256"
+    )
+    parser.add_argument("--target-ms", type=float, default=100)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--scrypt-r", type=int, default=8)
+    parser.add_argument("--scrypt-p", type=int, default=1)
+    options = parser.parse_args()
+
+    target = options.target_ms / 1000
+    if options.algorithm == "pbkdf2-sha256":
+        parameters = calibrate_pbkdf2(target, options.repeat)
+        settings = dict(AIRBOOK_HASH_PBKDF2_ITERATIONS=parameters["i"])
+    else:
+        parameters = calibrate_scrypt(
+            target, options.repeat, options.scrypt_r, options.scrypt_p
+        )
+        settings = dict(
+            AIRBOOK_HASH_SCRYPT_N=parameters["n"],
+            AIRBOOK_HASH_SCRYPT_R=parameters["r"],
+            AIRBOOK_HASH_SCRYPT_P=parameters["p"],
+        )
+    elapsed = measure(options.algorithm, parameters, options.repeat)
+    print("# {:.1f} ms per hash on this machine".format(elapsed * 1000))
+    print("AIRBOOK_HASH_ALGORITHM={}".format(options.algorithm))
+    for name, value in settings.items():
+        print("{}={}".format(name, value))
+
+
+if __name__ == "__main__":
+    main()
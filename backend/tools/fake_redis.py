@@ -0,0 +1,158 @@
+import argparse
+import socketserver
+import threading
+import time
+
+from typing import Any, Dict, List, Optional, Tuple
+from backend.utils.resp import read_reply, RespError
+
+"""
+A small in-memory server that speaks the Redis protocol, with just the commands that the
+session store uses. It stands in for Redis in the tests and on development machines:
+
+    python -m backend.tools.fake_redis --port 6379
+    AIRBOOK_SESSION_BACKEND=redis python -m flask --app backend.app run
+"""
+
+
+def encode_reply(reply: Any) -> bytes:
+    if reply is None:
+        return b"$-1\r\n"
+    if isinstance(reply, RespError):
+        return b"-%s\r\n" % str(reply).encode("utf-8")
+    if isinstance(reply, int):
+        return b":%d\r\n" % reply
+    if isinstance(reply, str):
+        return b"+%s\r\n" % reply.encode("utf-8")
+    if isinstance(reply, bytes):
+        return b"$%d\r\n%s\r\n" % (len(reply), reply)
+    return b"*%d\r\n" % len(reply) + b"".join(encode_reply(item) for item in reply)
+
+
+class FakeRedis:
+    """
+    The keyspace, which expires keys lazily when they are read.
+    """
+
+    def __init__(self):
+        self._data: Dict[bytes, Tuple[bytes, Optional[float]]] = {}
+        self._lock = threading.Lock()
+
+    def _get(self, key: bytes) -> Optional[bytes]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at is not None and time.monotonic() >= expires_at:
+            del self._data[key]
+            return None
+        return value
+
+    def execute(self, args: List[bytes]) -> Any:
+        if len(args) == 0:
+            return RespError("ERR empty command")
+        command = args[0].upper()
+        with self._lock:
+            try:
+                return self._execute(command, args[1:])
+            except (IndexError, ValueError):
+                return RespError(
+                    "ERR wrong arguments for '{}' command".format(
+                        command.decode().lower()
+                    )
+                )
+
+    def _execute(self, command: bytes, args: List[bytes]) -> Any:
+        if command == b"PING":
+            return "PONG"
+        if command in (b"AUTH", b"SELECT"):
+            return "OK"
+        if command == b"GET":
+            return self._get(args[0])
+        if command == b"SET":
+            expires_at = None
+            options = [arg.upper() for arg in args[2:]]
+            if b"PX" in options:
+                expires_at = (
+                    time.monotonic() + int(args[options.index(b"PX") + 3]) / 1000
+                )
+            elif b"EX" in options:
+                expires_at = time.monotonic() + int(args[options.index(b"EX") + 3])
+            self._data[args[0]] = (args[1], expires_at)
+            return "OK"
+        if command == b"DEL":
+            deleted = 0
+            for key in args:
+                if self._get(key) is not None:
+                    del self._data[key]
+                    deleted += 1
+            return deleted
+        if command in (b"PEXPIRE", b"EXPIRE"):
+            value = self._get(args[0])
+            if value is None:
+                return 0
+            ttl = int(args[1]) / (1000 if command == b"PEXPIRE" else 1)
+            self._data[args[0]] = (value, time.monotonic() + ttl)
+            return 1
+        if command == b"PTTL":
+            value = self._get(args[0])
+            if value is None:
+                return -2
+            expires_at = self._data[args[0]][1]
+            if expires_at is None:
+                return -1
+            return int((expires_at - time.monotonic()) * 1000)
+        if command == b"FLUSHDB":
+            self._data.clear()
+            return "OK"
+        return RespError("ERR unknown command '{}'".format(command.decode().lower()))
+
+
+class FakeRedisServer(socketserver.ThreadingTCPServer):
+    daemon_threads = True
+    allow_reuse_address = True
+
+    def __init__(self, host: str = "localhost", port: int = 0):
+        self.redis = FakeRedis()
+        super().__init__((host, port), FakeRedisHandler)
+
+    @property
+    def port(self) -> int:
+        return self.server_address[1]
+
+    def start(self) -> "FakeRedisServer":
+        """
+        Serve on a background thread.
+        """
+        threading.Thread(target=self.serve_forever, daemon=True).start()
+        return self
+
+
+class FakeRedisHandler(socketserver.StreamRequestHandler):
+    server: FakeRedisServer
+
+    def handle(self):
+        while True:
+            try:
+                command = read_reply(self.rfile)
+            except (ConnectionError, ValueError):
+                return
+            if not isinstance(command, list):
+                reply: Any = RespError("ERR expected a command")
+            else:
+                reply = self.server.redis.execute(command)
+            self.wfile.write(encode_reply(reply))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--host", default="localhost")
+    parser.add_argument("--port", type=int, default=6379)
+    options = parser.parse_args()
+    with FakeRedisServer(options.host, options.port) as server:
+        print("Listening on {}:{}".format(options.host, server.port))
+        server.serve_forever()
+
+
+if __name__ == "__main__":
+    main()
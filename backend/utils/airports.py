@@ -0,0 +1,236 @@
+import logging
+import threading
+import time
+
+from bisect import bisect_left, insort
+from typing import (
+    Any,
+    Callable,
+    ContextManager,
+    Dict,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+)
+from pymysql.connections import Connection
+from pymysql.err import MySQLError
+from backend.utils.error import QueryError
+from backend.utils.flight_index import fold
+from backend.utils.lru import LRUCache
+from backend.utils.query import query, ALL_AIRPORTS
+from backend import config
+
+"""
+Autocompletion of the airport and city names typed in the flight search forms, from an
+in-process index of the Airport table.
+
+The index is a sorted array of the folded names (case and accents ignored, like the
+searches compare them): each airport name, each city, and each later word of them, so
+that "york" finds "New York". A completion is the range of the array that starts with
+the prefix, found with a binary search. The matches are ranked by
+- an exact match first,
+- then a match of the airport name before a match of its city,
+- then a match from the start of the name before a match of a later word,
+- then the shorter names first, and alphabetically.
+Completions are also kept in an LRU cache, since the same prefixes are typed again and
+again, which is cleared whenever the index changes.
+
+The index is loaded on the first completion and reloaded every AUTOCOMPLETE_TTL seconds.
+The airports added by this process are added to it right away.
+"""
+
+LOG = logging.getLogger("airbook.airports")
+
+COMPLETION_TYPES = ("airport", "city")
+
+# The kinds of matches, in the order they are ranked
+AIRPORT_NAME, CITY_NAME, AIRPORT_WORD, CITY_WORD = range(4)
+
+
+class Term(NamedTuple):
+    term: str
+    kind: int
+    airport_name: str
+    city: Optional[str]
+
+
+def get_terms(airport_name: str, city: Optional[str]) -> List[Term]:
+    terms = [Term(fold(airport_name), AIRPORT_NAME, airport_name, city)]
+    if city is not None and len(city.strip()) > 0:
+        terms.append(Term(fold(city).strip(), CITY_NAME, airport_name, city))
+    for name, kind in ((airport_name, AIRPORT_WORD), (city or "", CITY_WORD)):
+        for word in fold(name).split()[1:]:
+            terms.append(Term(word, kind, airport_name, city))
+    return terms
+
+
+def get_rank(term: Term, prefix: str) -> Tuple[Any, ...]:
+    return (
+        term.term != prefix,
+        term.kind,
+        len(term.term),
+        term.term,
+        term.airport_name,
+    )
+
+
+class AirportIndex:
+    def __init__(self, ttl: float, clock: Callable[[], float] = time.monotonic):
+        self.ttl = ttl
+        self.clock = clock
+        # Sorted by the term, then by the rank of the match
+        self._terms: List[Term] = []
+        self._airports: Dict[str, Optional[str]] = {}
+        # The airports of each folded city
+        self._cities: Dict[str, List[str]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.Lock()
+        self._load_lock = threading.Lock()
+        self._completions: LRUCache[
+            Tuple[int, str, str, int], List[Dict[str, Any]]
+        ] = LRUCache("airport_completions", max_size=1024)
+        # Changes whenever an airport is added, so that a completion computed before
+        # that is not served from the cache
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._airports)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    def load(self, conn: Connection):
+        """
+        Load all the airports, replacing the current ones.
+        """
+        self.replace(query(conn, ALL_AIRPORTS))
+
+    def replace(self, rows: Sequence[Sequence[Any]]):
+        airports = {row[0]: row[1] for row in rows}
+        cities: Dict[str, List[str]] = {}
+        for airport_name, city in sorted(airports.items()):
+            if city is not None:
+                cities.setdefault(fold(city), []).append(airport_name)
+        terms = sorted(
+            term
+            for airport_name, city in airports.items()
+            for term in get_terms(airport_name, city)
+        )
+        with self._lock:
+            self._airports = airports
+            self._cities = cities
+            self._terms = terms
+            self._loaded_at = self.clock()
+            self.version += 1
+            self._completions.clear()
+
+    def ensure_loaded(self, connect: Callable[[], ContextManager[Connection]]) -> bool:
+        """
+        Load the index if it has not been loaded yet or has expired. `connect` returns a
+        context manager that checks out a connection, like `ConnectionPool.connection`,
+        so that a connection is only taken when the index is loaded. While another
+        request reloads it, the current one keeps being served. Returns whether the
+        index can be used.
+        """
+        if self.loaded and self.clock() - self._loaded_at < self.ttl:  # type: ignore
+            return True
+        if not self._load_lock.acquire(blocking=not self.loaded):
+            return True
+        try:
+            if not self.loaded or self.clock() - self._loaded_at >= self.ttl:  # type: ignore
+                with connect() as conn:
+                    self.load(conn)
+        except (QueryError, MySQLError) as err:
+            LOG.warning("Failed to load the airport index: %s", err)
+            # Stale completions are still better than none
+            return self.loaded
+        finally:
+            self._load_lock.release()
+        return True
+
+    def add(self, airport_name: str, city: Optional[str]):
+        """
+        Add an airport that was just inserted.
+        """
+        if not self.loaded:
+            return
+        with self._lock:
+            if airport_name in self._airports:
+                return
+            self._airports[airport_name] = city
+            if city is not None:
+                airports = list(self._cities.get(fold(city), []))
+                insort(airports, airport_name)
+                self._cities[fold(city)] = airports
+            # Completions in progress keep reading the array they started with
+            terms = list(self._terms)
+            for term in get_terms(airport_name, city):
+                insort(terms, term)
+            self._terms = terms
+            self.version += 1
+            self._completions.clear()
+
+    def complete(
+        self, prefix: str, type: str = "airport", limit: int = 10
+    ) -> List[Dict[str, Any]]:
+        """
+        The best `limit` airports (or cities, depending on `type`) with a name or a word
+        that starts with `prefix`.
+        """
+        prefix = fold(prefix).strip()
+        if len(prefix) == 0:
+            return []
+        with self._lock:
+            version, terms = self.version, self._terms
+        return self._completions.get_or_put(
+            (version, type, prefix, limit),
+            lambda: self._complete(terms, prefix, type, limit),
+        )
+
+    def _complete(
+        self, terms: List[Term], prefix: str, type: str, limit: int
+    ) -> List[Dict[str, Any]]:
+        start = bisect_left(terms, (prefix,))
+        # The first term that sorts after every term starting with the prefix
+        end = bisect_left(terms, (prefix + "\U0010ffff",), start)
+        matches = sorted(terms[start:end], key=lambda term: get_rank(term, prefix))
+        result: List[Dict[str, Any]] = []
+        seen = set()
+        for term in matches:
+            if type == "city":
+                if term.city is None or term.kind in (AIRPORT_NAME, AIRPORT_WORD):
+                    continue
+                key = fold(term.city)
+                if key in seen:
+                    continue
+                result.append(
+                    dict(
+                        city=term.city,
+                        airports=self._cities.get(key, []),
+                    )
+                )
+            else:
+                key = term.airport_name
+                if key in seen:
+                    continue
+                result.append(
+                    dict(
+                        airport_name=term.airport_name,
+                        city=term.city,
+                        match=(
+                            "airport"
+                            if term.kind in (AIRPORT_NAME, AIRPORT_WORD)
+                            else "city"
+                        ),
+                    )
+                )
+            seen.add(key)
+            if len(result) >= limit:
+                break
+        return result
+
+
+AIRPORTS = AirportIndex(config.AUTOCOMPLETE_TTL)
@@ -1,14 +1,23 @@
 from pymysql.connections import Connection
 from functools import wraps
-from typing import Optional, Tuple, Set
-from backend.utils.error import JsonError, MissingKeyError, QueryKeyError
-from backend.utils.encryption import check_hash
+from typing import Callable, Dict, Optional, Tuple, Set
+from backend.utils.error import (
+    JsonError,
+    MissingKeyError,
+    QueryError,
+    QueryKeyError,
+    ExecutorBusyError,
+)
+from backend.utils.encryption import check_hash, generate_hash, needs_rehash
 from backend.utils.query import (
     DataType,
     query,
     CHECK_AGENT_LOGIN,
     CHECK_CUST_LOGIN,
     CHECK_STAFF_LOGIN,
+    UPDATE_AGENT_PASSWORD,
+    UPDATE_CUST_PASSWORD,
+    UPDATE_STAFF_PASSWORD,
     FetchMode,
 )
 from backend.utils.filter import FilterType
@@ -70,7 +79,11 @@ def have_access_to_filter(data_type: Optional[DataType], filter: FilterType):
         return filter in PublicFilters
 
 
-def check_login(conn: Connection, login_type: DataType, **kwargs: str):
+def check_login(connect: Callable[[], Connection], login_type: DataType, **kwargs: str):
+    """
+    Check the credentials in `kwargs`. `connect` returns the connection of the request,
+    like `ConnectionPool.get_conn`, and is only called once the credentials are complete.
+    """
     try:
         data = {}
         try:
@@ -84,6 +97,7 @@ def check_login(conn: Connection, login_type: DataType, **kwargs: str):
         except KeyError as err:
             raise MissingKeyError(key=err.args[0])
 
+        conn = connect()
         if login_type is DataType.CUST:
             result = query(conn, CHECK_CUST_LOGIN, FetchMode.ONE, 1, data)
         elif login_type is DataType.STAFF:
@@ -106,9 +120,31 @@ def check_login(conn: Connection, login_type: DataType, **kwargs: str):
     if not check_hash(kwargs["password"], hashed_password, salt):
         raise JsonError("The input information or the password does not match!")
 
+    if needs_rehash(hashed_password):
+        rehash_password(conn, login_type, data)
+
     return result
 
 
+LOGIN_TYPE_TO_PASSWORD_UPDATE = {
+    DataType.CUST: UPDATE_CUST_PASSWORD,
+    DataType.AGENT: UPDATE_AGENT_PASSWORD,
+    DataType.STAFF: UPDATE_STAFF_PASSWORD,
+}
+
+
+def rehash_password(conn: Connection, login_type: DataType, data: Dict[str, str]):
+    """
+    Store the password again with the current hash parameters. This is only an
+    upgrade, so the login goes on if it fails.
+    """
+    try:
+        data["password"], data["salt"] = generate_hash(data["password"])
+        query(conn, LOGIN_TYPE_TO_PASSWORD_UPDATE[login_type], args=data)
+    except (ExecutorBusyError, QueryError):
+        pass
+
+
 def require_session(user_type: Optional[DataType] = None):
     def decorator(func):
         """
@@ -1,34 +1,158 @@
 from os import urandom
-from hashlib import pbkdf2_hmac
+from hashlib import pbkdf2_hmac, scrypt
+from hmac import compare_digest
+from typing import Dict, Tuple
+from backend.utils.executor import BoundedExecutor
+from backend import config
 
+"""
+Password hashing.
+
+Hashes are stored in a versioned format that records the algorithm, its cost and the salt:
+
+    $pbkdf2-sha256$i=10000,l=32$<salt>$<hash>
+    $scrypt$n=16384,r=8,p=1,l=32$<salt>$<hash>
+
+with the salt and the hash in hex. New hashes use the algorithm and cost from the config.
+`needs_rehash()` tells when a stored hash uses other parameters, so that it can be
+replaced right after a successful login, while the plain password is at hand.
+
+Hashes stored before the versioned format are bare hex, with the salt in its own column.
+They were all computed with the legacy parameters below and are still accepted.
+"""
+
+# The parameters of the unversioned hashes
 HASH_NAME = "sha256"
 ITERATIONS = 10000
 DKLEN = 30
 
+# The length of the new hashes
+KEY_LENGTH = 32
 
-def generate_hash(plain_text: str):
-    salt = urandom(16)
-    return (
-        pbkdf2_hmac(
-            hash_name=HASH_NAME,
-            password=plain_text.encode("utf-8"),
+# pbkdf2_hmac and scrypt release the GIL, so the hashes run in parallel on these threads
+HASHER = BoundedExecutor(
+    "hasher", config.HASH_WORKERS, config.HASH_MAX_QUEUE, config.HASH_TIMEOUT
+)
+
+
+def get_parameters(algorithm: str) -> Dict[str, int]:
+    """
+    The cost parameters that new hashes of the algorithm are computed with.
+    """
+    if algorithm == "pbkdf2-sha256":
+        return dict(i=config.HASH_PBKDF2_ITERATIONS, l=KEY_LENGTH)
+    if algorithm == "scrypt":
+        return dict(
+            n=config.HASH_SCRYPT_N,
+            r=config.HASH_SCRYPT_R,
+            p=config.HASH_SCRYPT_P,
+            l=KEY_LENGTH,
+        )
+    raise ValueError("The hash algorithm {} is not supported.".format(algorithm))
+
+
+def derive(algorithm: str, parameters: Dict[str, int], plain_text: str, salt: bytes):
+    password = plain_text.encode("utf-8")
+    if algorithm == "pbkdf2-sha256":
+        return pbkdf2_hmac(
+            hash_name="sha256",
+            password=password,
             salt=salt,
-            iterations=ITERATIONS,
-            dklen=DKLEN,
-        ).hex(),
-        salt.hex(),
+            iterations=parameters["i"],
+            dklen=parameters["l"],
+        ).hex()
+    if algorithm == "scrypt":
+        n, r, p = parameters["n"], parameters["r"], parameters["p"]
+        return scrypt(
+            password,
+            salt=salt,
+            n=n,
+            r=r,
+            p=p,
+            # OpenSSL refuses to use more than 32MB unless it is told otherwise
+            maxmem=129 * n * r * p + 1024 * 1024,
+            dklen=parameters["l"],
+        ).hex()
+    raise ValueError("The hash algorithm {} is not supported.".format(algorithm))
+
+
+def derive_hash(plain_text: str, salt: bytes) -> str:
+    """
+    Compute an unversioned hash.
+    """
+    return pbkdf2_hmac(
+        hash_name=HASH_NAME,
+        password=plain_text.encode("utf-8"),
+        salt=salt,
+        iterations=ITERATIONS,
+        dklen=DKLEN,
+    ).hex()
+
+
+def encode_hash(
+    algorithm: str, parameters: Dict[str, int], salt: str, hashed: str
+) -> str:
+    return "${}${}${}${}".format(
+        algorithm,
+        ",".join("{}={}".format(key, value) for key, value in parameters.items()),
+        salt,
+        hashed,
     )
 
 
+def decode_hash(hashed_text: str) -> Tuple[str, Dict[str, int], str, str]:
+    """
+    Split a versioned hash into its algorithm, parameters, salt and hash.
+    Raises ValueError if the hash is not in the versioned format.
+    """
+    _, algorithm, encoded_parameters, salt, hashed = hashed_text.split("$")
+    parameters = {}
+    for pair in encoded_parameters.split(","):
+        key, value = pair.split("=")
+        parameters[key] = int(value)
+    return algorithm, parameters, salt, hashed
+
+
+def is_versioned(hashed_text: str) -> bool:
+    return hashed_text.startswith("$")
+
+
+def generate_hash(plain_text: str):
+    """
+    Returns the versioned hash and its salt, which is also kept in the hash.
+    Raises ExecutorBusyError when too many hashes are being computed already.
+    """
+    algorithm = config.HASH_ALGORITHM
+    parameters = get_parameters(algorithm)
+    salt = urandom(16)
+    hashed = HASHER.run(derive, algorithm, parameters, plain_text, salt)
+    return encode_hash(algorithm, parameters, salt.hex(), hashed), salt.hex()
+
+
 def check_hash(plain_text: str, hashed_text: str, salt: str):
-    salt_bytes = bytes.fromhex(salt)
-    return (
-        pbkdf2_hmac(
-            hash_name=HASH_NAME,
-            password=plain_text.encode("utf-8"),
-            salt=salt_bytes,
-            iterations=ITERATIONS,
-            dklen=DKLEN,
-        ).hex()
-        == hashed_text
-    )
+    """
+    The salt is only used for unversioned hashes.
+    Raises ExecutorBusyError when too many hashes are being computed already.
+    """
+    if not is_versioned(hashed_text):
+        return compare_digest(
+            HASHER.run(derive_hash, plain_text, bytes.fromhex(salt)), hashed_text
+        )
+    try:
+        algorithm, parameters, salt, hashed = decode_hash(hashed_text)
+        expected = HASHER.run(
+            derive, algorithm, parameters, plain_text, bytes.fromhex(salt)
+        )
+    except (KeyError, ValueError):
+        return False
+    return compare_digest(expected, hashed)
+
+
+def needs_rehash(hashed_text: str) -> bool:
+    if not is_versioned(hashed_text):
+        return True
+    try:
+        algorithm, parameters, _, _ = decode_hash(hashed_text)
+    except ValueError:
+        return True
+    return algorithm != config.HASH_ALGORITHM or parameters != get_parameters(algorithm)
@@ -50,6 +50,15 @@ class QueryKeyError(QueryError):
         return self.key
 
 
+class PoolTimeoutError(AirbookError):
+    def __init__(self, max_size: int, timeout: float):
+        super().__init__(
+            "All {} database connections are in use after waiting {}s".format(
+                max_size, timeout
+            )
+        )
+
+
 def raise_error(func):
     @wraps(func)
     def wrapper(*args, **kwargs):
@@ -59,3 +68,12 @@ def raise_error(func):
             return err.get_json()
 
     return wrapper
+
+
+class ExecutorBusyError(AirbookError):
+    def __init__(self, name: str, capacity: int):
+        super().__init__(
+            "The {} executor already has {} tasks running or waiting".format(
+                name, capacity
+            )
+        )
@@ -0,0 +1,59 @@
+import threading
+
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError
+from typing import Any, Callable, TypeVar
+from backend.utils.error import ExecutorBusyError
+from backend.utils.metrics import counter
+
+"""
+A thread pool that takes at most a fixed number of tasks at once, for CPU-heavy work
+that releases the GIL (like `hashlib.pbkdf2_hmac`).
+
+A task that arrives when `workers + max_queue` tasks are already running or waiting is
+rejected right away with ExecutorBusyError instead of queueing behind them. The request
+threads that would have waited are then free to serve cheap requests, and the client is
+told to retry.
+"""
+
+T = TypeVar("T")
+
+
+class BoundedExecutor:
+    def __init__(self, name: str, workers: int, max_queue: int, timeout: float):
+        assert workers > 0 and max_queue >= 0
+        self.name = name
+        self.workers = workers
+        self.max_queue = max_queue
+        self.timeout = timeout
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix="airbook-{}".format(name)
+        )
+        self._slots = threading.BoundedSemaphore(workers + max_queue)
+        self.rejected = counter("{}_rejected".format(name))
+
+    def submit(self, fn: Callable[..., T], *args: Any) -> "Future[T]":
+        if not self._slots.acquire(blocking=False):
+            self.rejected.increment()
+            raise ExecutorBusyError(self.name, self.workers + self.max_queue)
+        try:
+            future = self._executor.submit(fn, *args)
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+        return future
+
+    def run(self, fn: Callable[..., T], *args: Any) -> T:
+        """
+        Run the task on the pool and wait for its result.
+        """
+        future = self.submit(fn, *args)
+        try:
+            return future.result(timeout=self.timeout)
+        except TimeoutError:
+            future.cancel()
+            self.rejected.increment()
+            raise ExecutorBusyError(self.name, self.workers + self.max_queue)
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True)
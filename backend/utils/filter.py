@@ -1,3 +1,5 @@
+import inspect
+
 from typing import (
     Any,
     Optional,
@@ -9,13 +11,21 @@ from typing import (
     List,
     Set,
     Callable,
+    Hashable,
+    NamedTuple,
 )
 from enum import Enum, auto
-from functools import partial
+from functools import partial, wraps
 from datetime import date, time, datetime
 from pymysql.connections import Connection
 from backend.utils.error import QueryKeyError
+from backend.utils.flight_index import FLIGHTS
 from backend.utils.query import query
+from backend.utils.lru import LRUCache
+from backend.utils.result_cache import RESULTS
+from backend.utils.statements import prepare, STATEMENTS
+from backend.utils.pagination import KEYSET_COLUMNS, decode_cursor
+from backend import config
 
 """
 Generate SQL queries for certain filters.
@@ -23,7 +33,7 @@ Support specifying date/time range for dep/arr date/time;
 specifying  dep airport/city and arr airport/city;
 The range can be one bounded. All conditions are optional.
 A miss match between airport and city will result in an empty query.
-Returns multiple query results if round_trip is set to True.
+Round trips and connecting flights are searched by itinerary.py instead.
 """
 T = TypeVar("T", int, str)
 V = TypeVar("V", int, str)
@@ -94,7 +104,7 @@ SELECT_FLIGHT_COMMENTS = "SELECT flight_number, dep_date, dep_time, created_at,
     FROM Feedback NATURAL JOIN Flight NATURAL JOIN AirlineStaff \
         WHERE username=%(username)s AND (flight_number, dep_date, dep_time)=(%(flight_number)s, %(dep_date)s, %(dep_time)s);"
 SELECT_FLIGHT_CUSTOMERS = "SELECT email, name, COUNT(*) as tickets FROM Ticket NATURAL JOIN Customer WHERE (flight_number, dep_date, dep_time, airline_name)=(%(flight_number)s, %(dep_date)s, %(dep_time)s, %(airline_name)s) GROUP BY email"
-SELECT_ALL_FUTURE_FLIGHTS = "SELECT * FROM future_flights;"
+SELECT_ALL_FUTURE_FLIGHTS = "SELECT * FROM future_flights {where}"
 SELECT_CUSTOMER_TICKETS = (
     "call customer_tickets(%(email)s);"  # "email" must matches the key name for session
 )
@@ -109,6 +119,7 @@ SELECT_TOP_CUSTOMERS = 'SELECT * FROM \
 SELECT_CUSTOMER_FLIGHTS = "call customer_flights(%(email)s);"
 SELECT_AIRLINE_PLANES = "SELECT * FROM Airplane WHERE airline_name = %(airline_name)s"
 # Note, do not pass user provided values to this query
+# The agent_stats views add up the daily totals of AgentDailySales, see sales.py
 SELECT_TOP_AGENTS = 'SELECT * FROM (SELECT * FROM agent_stats_last_year ORDER BY total_commission DESC LIMIT 5) as temp1 \
 UNION ALL SELECT * FROM (SELECT "divide" as Booking_agent_ID, "" as total_commission, "" as tickets_total, "" as email) as temp2 \
 UNION ALL SELECT * FROM (SELECT * FROM agent_stats_last_month ORDER BY total_commission DESC LIMIT 5) as temp3 \
@@ -117,11 +128,14 @@ UNION ALL SELECT * FROM (SELECT * FROM agent_stats_last_year ORDER BY total_tick
 UNION ALL SELECT * FROM (SELECT "divide" as booking_agent_id, "" as total_commission, "" as tickets_total, "" as email) as temp6 \
 UNION ALL SELECT * FROM (SELECT * FROM agent_stats_last_month ORDER BY total_tickets DESC LIMIT 5) as temp7'
 SELECT_MOST_FREQUENT_CUST = "SELECT temp.*, name FROM (SELECT email, COUNT(*) as total_visits FROM Ticket WHERE purchase_date > UTC_TIMESTAMP() - INTERVAL 1 YEAR AND dep_date < NOW() GROUP BY email ORDER BY total_visits DESC) AS temp NATURAL JOIN Customer;"
-SELECT_REVENUE_COMPARE = "SELECT * FROM (SELECT * FROM (SELECT COUNT(*) as direct FROM Ticket WHERE airline_name=%(airline_name)s AND booking_agent_id IS NULL AND purchase_date > UTC_DATE() - INTERVAL 1 MONTH) as t1 \
-    NATURAL JOIN (SELECT COUNT(*) as in_direct FROM Ticket WHERE airline_name=%(airline_name)s  AND booking_agent_id IS NOT NULL AND purchase_date > UTC_DATE() - INTERVAL 1 MONTH) as t2) as t3 \
-         UNION ALL \
-             SELECT * FROM (SELECT * FROM (SELECT COUNT(*) as direct FROM Ticket WHERE airline_name=%(airline_name)s AND booking_agent_id IS NULL AND purchase_date > UTC_DATE() - INTERVAL 1 YEAR) as t1 \
-             NATURAL JOIN (SELECT COUNT(*) as in_direct FROM Ticket WHERE airline_name=%(airline_name)s  AND booking_agent_id IS NOT NULL AND purchase_date > UTC_DATE() - INTERVAL 1 YEAR) as t2) as t4"
+# Added up from the daily totals of AirlineDailySales, see sales.py
+SELECT_REVENUE_COMPARE = "SELECT CAST(IFNULL(SUM(direct_tickets), 0) AS SIGNED) as direct, \
+    CAST(IFNULL(SUM(indirect_tickets), 0) AS SIGNED) as in_direct FROM AirlineDailySales \
+    WHERE airline_name=%(airline_name)s AND sale_date > UTC_DATE() - INTERVAL 1 MONTH \
+        UNION ALL \
+            SELECT CAST(IFNULL(SUM(direct_tickets), 0) AS SIGNED) as direct, \
+            CAST(IFNULL(SUM(indirect_tickets), 0) AS SIGNED) as in_direct FROM AirlineDailySales \
+            WHERE airline_name=%(airline_name)s AND sale_date > UTC_DATE() - INTERVAL 1 YEAR"
 SELECT_POPULAR_DESTINATIONS = 'SELECT * FROM (SELECT arr_city, count(*) as visits FROM (SELECT arr_city, Ticket.airline_name FROM Ticket INNER JOIN verbose_flights USING (flight_number, dep_date, dep_time) WHERE Ticket.airline_name=%(airline_name)s AND dep_date > UTC_DATE() - INTERVAL 3 MONTH) AS t GROUP BY arr_city ORDER BY visits DESC LIMIT 3) as t1 \
 UNION ALL SELECT "", "divide" \
 UNION ALL SELECT * FROM (SELECT arr_city, count(*) as visits FROM (SELECT arr_city, Ticket.airline_name FROM Ticket INNER JOIN verbose_flights USING (flight_number, dep_date, dep_time) WHERE Ticket.airline_name=%(airline_name)s AND dep_date > UTC_DATE() - INTERVAL 1 YEAR) AS t GROUP BY arr_city ORDER BY visits DESC LIMIT 3) as t2;'
@@ -129,7 +143,6 @@ GET_CUST_COMMENT = "SELECT * FROM Feedback WHERE (flight_number, dep_date, dep_t
 
 
 FILTER_TO_QUERY_MAP = {
-    FilterType.ALL_FUTURE_FLIGHTS: SELECT_ALL_FUTURE_FLIGHTS,
     FilterType.CUST_FUTURE_FLIGHTS: SELECT_CUSTOMER_FLIGHTS,
     FilterType.CUST_TICKETS: SELECT_CUSTOMER_TICKETS,
     FilterType.FLIGHT_COMMENTS: SELECT_FLIGHT_COMMENTS,
@@ -142,23 +155,62 @@ FILTER_TO_QUERY_MAP = {
     FilterType.FLIGHT_CUSTOMERS: SELECT_FLIGHT_CUSTOMERS,
     FilterType.CUST_COMMENT: GET_CUST_COMMENT,
 }
+for sql in FILTER_TO_QUERY_MAP.values():
+    prepare(sql)
 
 ADVANCED_FILTERS = {
+    FilterType.ALL_FUTURE_FLIGHTS,
     FilterType.ADVANCED_FLIGHT,
     FilterType.ADVANCED_SPENDINGS,
 }
 
+# The filters that return their rows page by page, see pagination.py
+PAGINATED_FILTERS = {
+    FilterType.ALL_FUTURE_FLIGHTS,
+    FilterType.ADVANCED_FLIGHT,
+}
+
+
+class CachePolicy(NamedTuple):
+    # Seconds that a result is served for, which bounds how stale the results that depend
+    # on the clock (like the flights that are still in the future) can get, and how long
+    # the other worker processes keep serving a result after a write
+    ttl: float
+    # The tables that the query reads from, through the views
+    tables: Tuple[str, ...]
+
+
+# The filters whose results are cached, see result_cache.py. Writes to any of the tables
+# drop the cached results of this process right away, but not the ones of the other
+# worker processes, which only expire. The TTLs are kept short for that reason: 10
+# seconds for the planes, which staff members add and expect to see, and a minute for the
+# reports, which every ticket sold changes anyway.
+CACHED_FILTERS = {
+    FilterType.ALL_FUTURE_FLIGHTS: CachePolicy(30, ("Flight", "Airplane", "Airport")),
+    FilterType.AIRLINE_PLANES: CachePolicy(10, ("Airplane",)),
+    FilterType.TOP_AGENTS: CachePolicy(60, ("AgentDailySales", "BookingAgent")),
+    FilterType.FREQ_CUST: CachePolicy(60, ("Ticket", "Customer")),
+    FilterType.REVENUE: CachePolicy(60, ("AirlineDailySales",)),
+    FilterType.TOP_DEST: CachePolicy(60, ("Ticket", "Flight", "Airplane", "Airport")),
+}
+
 
 def is_advanced_filter(filter: FilterType):
     return filter in ADVANCED_FILTERS
 
 
+def is_paginated_filter(filter: FilterType):
+    return filter in PAGINATED_FILTERS
+
+
 class Filter:
     def __init__(self, base_query: str, is_predicate: bool = False):
         self.base_query = base_query
         self.is_predicate = is_predicate
         self.where_clause: List[str] = []
         self.string_values: List[str] = []
+        self.order_by: List[str] = []
+        self.limit: Optional[int] = None
 
     def add_filter_range(self, column_name: str, range: Optional[FilterRange[T]]):
         """
@@ -239,8 +291,6 @@ class Filter:
         if sub_filter is None:
             return self
         assert isinstance(sub_filter, Filter)
-        if sub_filter.get_formatted()[0] == "":
-            return self
         sql, values = sub_filter.get_formatted()
         if sql.strip() != "":
             self.where_clause.append("({})".format(sql))
@@ -254,6 +304,56 @@ class Filter:
             self.string_values.append(value)
         return self
 
+    def add_keyset_after(self, column_names: Iterable[str], key: Optional[Iterable]):
+        """
+        Only keep the rows that come strictly after `key` in the order of `column_names`.
+        This is the predicate that continues a keyset-paginated query.
+        """
+        if key is None:
+            return self
+        key = list(key)
+        return self.add_static_filter(
+            "({}) > ({})".format(
+                ", ".join(column_names), ", ".join(["%s" for i in range(len(key))])
+            ),
+            *key
+        )
+
+    def add_edge_days(
+        self,
+        date_range: FilterRange,
+        time_range: FilterRange,
+        date_column_name: str,
+        time_column_name: str,
+    ):
+        """
+        Only keep the rows on the first or the last day of the date range, within the
+        time range on that day. See `add_date_time_range`.
+        """
+        sub_lower, sub_upper, sub_same_day = get_edge_day_filters(
+            date_range, time_range, date_column_name, time_column_name
+        )
+        return self.add_or(
+            self.add_sub_filter,
+            self.add_or,
+            (sub_lower,),
+            (
+                self.add_sub_filter,
+                self.add_sub_filter,
+                (sub_upper,),
+                (sub_same_day,),
+            ),
+        )
+
+    def add_order_by(self, *column_names: str):
+        for column_name in column_names:
+            self.order_by.append(column_name)
+        return self
+
+    def add_limit(self, limit: Optional[int]):
+        self.limit = limit
+        return self
+
     def conditonally_add(self, condition: bool, func: Callable, *args: Any):
         # We use this to avoid calling functions from instances of filter.
         try:
@@ -296,16 +396,203 @@ class Filter:
                 self.string_values,
             )
         else:
-            return (
-                self.base_query.format(
-                    where="WHERE " + " AND ".join(self.where_clause)
-                    if len(self.where_clause) > 0
-                    else ""
-                ),
-                self.string_values,
+            sql = self.base_query.format(
+                where="WHERE " + " AND ".join(self.where_clause)
+                if len(self.where_clause) > 0
+                else ""
             )
+            values = self.string_values
+            if len(self.order_by) > 0:
+                sql += " ORDER BY " + ", ".join(self.order_by)
+            if self.limit is not None:
+                sql += " LIMIT %s"
+                values = values + [self.limit]
+            return sql, values
+
+
+class _Slot(str):
+    """
+    A placeholder passed to the filter builders in place of an argument value.
+    It ends up in the values of the built query, which tells us where each argument goes.
+    """
+
+    def __new__(cls, name: str):
+        slot = super().__new__(cls, "{" + name + "}")
+        slot.name = name
+        return slot
+
+    def __str__(self):
+        # FilterRange converts its bounds with str(), which must keep the slot
+        return self
+
+
+class FilterPlan:
+    def __init__(self, sql: str, template: Tuple[str, ...]):
+        self.sql = sql
+        self.template = template
+
+    @staticmethod
+    def compile(sql: str, values: list) -> Optional["FilterPlan"]:
+        if not all(isinstance(value, _Slot) for value in values):
+            return None
+        return FilterPlan(sql, tuple(value.name for value in values))
+
+    def bind(self, values: dict) -> Tuple[str, list]:
+        return self.sql, [values[name] for name in self.template]
+
 
+def _is_blank(value: Any) -> bool:
+    """
+    Whether `add_optional_constraint` skips the value.
+    """
+    return value is None or (isinstance(value, str) and len(value.strip()) == 0)
 
+
+class _Binder:
+    """
+    Swaps the arguments of a filter builder for slots while recording the shape of the
+    arguments, i.e. which of them produce a constraint. The SQL text depends only on the
+    shape, so it is built once per shape and cached as a FilterPlan.
+    """
+
+    def __init__(self):
+        self.shape: List[Any] = []
+        self.values: dict = {}
+        self.cacheable = True
+
+    def _slot(self, name: str, value: Any) -> _Slot:
+        self.values[name] = value
+        return _Slot(name)
+
+    def flag(self, name: str, value: Any) -> bool:
+        self.shape.append(bool(value))
+        return bool(value)
+
+    def optional(self, name: str, value: Any) -> Any:
+        """
+        An argument for `add_optional_constraint`, which skips None and blank strings.
+        """
+        if _is_blank(value):
+            self.shape.append(None)
+            return value
+        if not isinstance(value, (str, int)):
+            self.cacheable = False
+            return value
+        self.shape.append(name)
+        return self._slot(name, value)
+
+    def value(self, name: str, value: Any) -> Any:
+        self.shape.append(value is not None)
+        return None if value is None else self._slot(name, value)
+
+    def range(self, name: str, filter_range: FilterRange) -> FilterRange:
+        bounds = []
+        ends = (("lower", filter_range.lower), ("upper", filter_range.upper))
+        for bound, value in ends:
+            if value is not None and len(value.strip()) == 0:
+                # Blank bounds are kept by add_filter_range but dropped by
+                # add_optional_constraint
+                self.cacheable = False
+            bounds.append(self.value("{}.{}".format(name, bound), value))
+        return FilterRange(*bounds)
+
+    def set(self, name: str, filter_set: Optional[FilterSet]) -> Optional[FilterSet]:
+        if filter_set is None or filter_set.filter_set is None:
+            self.shape.append(None)
+            return filter_set
+        items = list(filter_set.filter_set)
+        self.shape.append(len(items))
+        if len(items) == 1:
+            # A single value is added with add_optional_constraint
+            return FilterSet([self.optional("{}.0".format(name), items[0])])
+        return FilterSet(
+            [self._slot("{}.{}".format(name, i), item) for i, item in enumerate(items)]
+        )
+
+    def key(self, name: str, key: Optional[Iterable]) -> Optional[tuple]:
+        if key is None:
+            self.shape.append(None)
+            return None
+        key = list(key)
+        self.shape.append(len(key))
+        return tuple(
+            self._slot("{}.{}".format(name, i), value) for i, value in enumerate(key)
+        )
+
+    def bind(
+        self, kind: str, build: Callable[[], Tuple[str, list]]
+    ) -> Optional[Tuple[str, list]]:
+        """
+        Look up the plan for the recorded shape, calling `build` with the slotted
+        arguments on a miss. Returns None if the arguments cannot go through a plan.
+        """
+        if not self.cacheable:
+            return None
+        plan = PLAN_CACHE.get_or_put(
+            (kind, tuple(self.shape)), lambda: FilterPlan.compile(*build())
+        )
+        if plan is None:
+            return None
+        return plan.bind(self.values)
+
+
+PLAN_CACHE: LRUCache[tuple, Optional[FilterPlan]] = LRUCache(
+    "filter_plan_cache", max_size=512
+)
+
+
+def _planned(kind: str, **slots: Callable[[_Binder, str, Any], Any]):
+    """
+    Serve a filter builder from PLAN_CACHE. `slots` gives, for each argument of the
+    builder, the _Binder method that swaps it for slots. The builder is called as is
+    for the arguments that cannot go through a plan.
+    """
+
+    def decorate(build: Callable[..., Tuple[str, list]]):
+        signature = inspect.signature(build)
+        assert set(slots) == set(signature.parameters), kind
+
+        @wraps(build)
+        def get_filter(*args, **kwargs) -> Tuple[str, list]:
+            arguments = signature.bind(*args, **kwargs)
+            arguments.apply_defaults()
+            binder = _Binder()
+            slotted = {
+                name: slots[name](binder, name, value)
+                for name, value in arguments.arguments.items()
+            }
+            result = binder.bind(kind, lambda: build(**slotted))
+            if result is not None:
+                return result
+            return build(*args, **kwargs)
+
+        return get_filter
+
+    return decorate
+
+
+@_planned(
+    "flight",
+    dep_date_range=_Binder.range,
+    dep_time_range=_Binder.range,
+    arr_date_range=_Binder.range,
+    arr_time_range=_Binder.range,
+    flight_number=_Binder.optional,
+    dep_airport=_Binder.optional,
+    dep_city=_Binder.optional,
+    arr_airport=_Binder.optional,
+    arr_city=_Binder.optional,
+    emails=_Binder.set,
+    airline_name=_Binder.optional,
+    filter_by_emails=_Binder.flag,
+    filter_by_agent_id=_Binder.flag,
+    agent_id=_Binder.optional,
+    is_customer=_Binder.flag,
+    is_staff=_Binder.flag,
+    round_trip=_Binder.flag,
+    after=_Binder.key,
+    limit=_Binder.value,
+)
 def get_filter_flight(
     dep_date_range: FilterRange[str],
     dep_time_range: FilterRange[str],
@@ -324,7 +611,12 @@ def get_filter_flight(
     is_customer: bool = False,
     is_staff: bool = False,
     round_trip: Optional[bool] = False,
+    after: Optional[Tuple[str, str, int]] = None,
+    limit: Optional[int] = None,
 ) -> Tuple[str, list]:
+    """
+    With `limit`, the flights are ordered by their primary key and start strictly after `after`.
+    """
     base_query = "SELECT * FROM verbose_flights {where}"
     flight_table = "verbose_flights"
     filter = Filter(base_query)
@@ -337,7 +629,7 @@ def get_filter_flight(
         sec_filter = Filter("EXISTS (SELECT * FROM Ticket {where})").add_filter_set(
             "email", emails
         )
-    elif filter_by_agent_id and agent_id is not None:
+    elif filter_by_agent_id and not _is_blank(agent_id):
         sec_filter = Filter(
             "EXISTS (SELECT * FROM Ticket JOIN BookingAgent ON(Ticket.booking_agent_ID=BookingAgent.booking_agent_ID) {where})"
         ).add_optional_constraint(
@@ -368,18 +660,40 @@ def get_filter_flight(
     )
     add_date_time_range(filter, dep_date_range, dep_time_range, "dep_date", "dep_time")
     add_date_time_range(filter, arr_date_range, arr_time_range, "arr_date", "arr_time")
+    if limit is not None:
+        add_keyset_page(filter, after, limit)
     return filter.get_formatted()
 
 
-def add_date_time_range(
-    filter: Filter,
+def get_filter_future_flights(
+    after: Optional[Tuple[str, str, int]] = None, limit: Optional[int] = None
+) -> Tuple[str, list]:
+    filter = Filter(SELECT_ALL_FUTURE_FLIGHTS)
+    if limit is not None:
+        add_keyset_page(filter, after, limit)
+    return filter.get_formatted()
+
+
+def add_keyset_page(
+    filter: Filter, after: Optional[Tuple[str, str, int]], limit: Optional[int]
+):
+    return (
+        filter.add_keyset_after(KEYSET_COLUMNS, after)
+        .add_order_by(*KEYSET_COLUMNS)
+        .add_limit(limit)
+    )
+
+
+def get_edge_day_filters(
     date_range: FilterRange,
     time_range: FilterRange,
     date_column_name: str,
     time_column_name: str,
-):
-    if date_range.isEmpty() and time_range.isEmpty():
-        return
+) -> Tuple[Filter, Filter, Filter]:
+    """
+    The predicates of `add_date_time_range` for the rows on the first day, on the last day
+    and on the only day of the range, which are the days that the time range cuts.
+    """
     sub_lower = (
         Filter("", True)
         .add_optional_constraint(date_column_name, date_range.lower)
@@ -406,25 +720,39 @@ def add_date_time_range(
         if date_range.upper is not None and date_range.lower is not None
         else Filter("", True).add_static_filter("FALSE")
     )
+    return sub_lower, sub_upper, sub_same_day
+
+
+def add_date_time_range(
+    filter: Filter,
+    date_range: FilterRange,
+    time_range: FilterRange,
+    date_column_name: str,
+    time_column_name: str,
+):
+    if date_range.isEmpty() and time_range.isEmpty():
+        return
     filter.add_or(
         filter.add_filter_range,
-        filter.add_or,
+        filter.add_edge_days,
         (date_column_name, date_range),
-        (
-            filter.add_sub_filter,
-            filter.add_or,
-            (sub_lower,),
-            (
-                filter.add_sub_filter,
-                filter.add_sub_filter,
-                (sub_upper,),
-                (sub_same_day,),
-            ),
-        ),
+        (date_range, time_range, date_column_name, time_column_name),
     )
     return filter
 
 
+@_planned(
+    "spendings",
+    emails=_Binder.set,
+    agent_id=_Binder.optional,
+    purchase_date_range=_Binder.range,
+    purchase_time_range=_Binder.range,
+    airline_name=_Binder.optional,
+    group_by_month=_Binder.flag,
+    take_count=_Binder.flag,
+    is_customer=_Binder.flag,
+    is_staff=_Binder.flag,
+)
 def get_filter_spendings(
     emails: FilterSet[str],
     agent_id: Optional[int],
@@ -437,6 +765,17 @@ def get_filter_spendings(
     is_staff: bool = False,
 ) -> Tuple[str, list]:
     assert isinstance(emails, FilterSet)
+    if (
+        is_staff
+        and (group_by_month or take_count)
+        and not _is_blank(airline_name)
+        and _is_blank(agent_id)
+        and (emails.filter_set is None or len(emails.filter_set) == 0)
+        and not (purchase_date_range.isEmpty() and not purchase_time_range.isEmpty())
+    ):
+        return _build_filter_airline_sales(
+            airline_name, purchase_date_range, purchase_time_range, take_count
+        )
     if group_by_month or (take_count and is_staff):
         filter = Filter(
             "SELECT concat(year(purchase_date),'-', month(purchase_date)) as spendings_year_month, sum(actual_price){} from spendings {{where}} GROUP BY spendings_year_month ORDER BY purchase_date".format(
@@ -463,6 +802,46 @@ def get_filter_spendings(
     return filter.get_formatted()
 
 
+def _build_filter_airline_sales(
+    airline_name: str,
+    purchase_date_range: FilterRange[str],
+    purchase_time_range: FilterRange[str],
+    take_count: Optional[bool] = False,
+) -> Tuple[str, list]:
+    """
+    The monthly sales of an airline, like the grouped `spendings` of a staff member.
+    The days strictly inside the date range are added up from AirlineDailySales. Only the
+    first and the last day, which the time range cuts, are read ticket by ticket.
+    """
+    daily = Filter(
+        "SELECT sale_date AS sales_date, total_sales AS sales, \
+direct_tickets + indirect_tickets AS tickets FROM AirlineDailySales {where}"
+    )
+    daily.add_optional_constraint("airline_name", airline_name).add_filter_range(
+        "sale_date", purchase_date_range
+    )
+    sql, values = daily.get_formatted()
+    if not purchase_date_range.isEmpty():
+        edges = Filter("SELECT purchase_date, actual_price, 1 FROM spendings {where}")
+        edges.add_optional_constraint("airline_name", airline_name).add_edge_days(
+            purchase_date_range,
+            purchase_time_range,
+            "purchase_date",
+            "purchase_time",
+        )
+        edges_sql, edges_values = edges.get_formatted()
+        sql = "{} UNION ALL {}".format(sql, edges_sql)
+        values = values + edges_values
+    return (
+        "SELECT concat(year(sales_date),'-', month(sales_date)) as spendings_year_month, \
+sum(sales) as `sum(actual_price)`{} FROM ({}) AS daily_sales \
+GROUP BY spendings_year_month ORDER BY MIN(sales_date)".format(
+            ", CAST(sum(tickets) AS SIGNED) as `count(*)`" if take_count else "", sql
+        ),
+        values,
+    )
+
+
 def get_filter_query(filter: FilterType, **kwargs) -> Tuple[str, Union[list, dict]]:
     if not is_advanced_filter(filter):
         if filter not in FILTER_TO_QUERY_MAP:
@@ -475,7 +854,12 @@ def get_filter_query(filter: FilterType, **kwargs) -> Tuple[str, Union[list, dic
             return FILTER_TO_QUERY_MAP[filter], kwargs
 
     try:
-        if filter is FilterType.ADVANCED_SPENDINGS:
+        if filter is FilterType.ALL_FUTURE_FLIGHTS:
+            return get_filter_future_flights(
+                after=decode_cursor(kwargs.get("cursor")),
+                limit=kwargs.get("limit"),
+            )
+        elif filter is FilterType.ADVANCED_SPENDINGS:
             return get_filter_spendings(
                 emails=FilterSet(kwargs.get("emails")),
                 agent_id=kwargs.get("agent_id"),
@@ -517,6 +901,8 @@ def get_filter_query(filter: FilterType, **kwargs) -> Tuple[str, Union[list, dic
                 agent_id=kwargs.get("agent_id"),
                 is_customer=kwargs["is_customer"],
                 is_staff=kwargs["is_staff"],
+                after=decode_cursor(kwargs.get("cursor")),
+                limit=kwargs.get("limit"),
             )
         else:
             raise ValueError("The filter {filter} is invalid.".format(filter=filter))
@@ -524,6 +910,93 @@ def get_filter_query(filter: FilterType, **kwargs) -> Tuple[str, Union[list, dic
         raise QueryKeyError(err.args[0])
 
 
-def query_by_filter(conn: Connection, filter: FilterType, **kwargs):
+def get_result_key(
+    filter: FilterType, sql: str, values: Union[list, dict], describe: bool
+) -> Optional[Hashable]:
+    """
+    The key of a cached result: the statement and only the values that it binds, since
+    the arguments of the filters also carry the whole session. None if it cannot be cached.
+    """
+    if isinstance(values, dict):
+        statement = STATEMENTS.get(sql)
+        if statement is None:
+            return None
+        try:
+            bound = statement.bind(values)
+        except KeyError:
+            # query() reports the missing key
+            return None
+    else:
+        bound = tuple(values)
+    key = (filter, describe, sql, bound)
+    try:
+        hash(key)
+    except TypeError:
+        return None
+    return key
+
+
+def search_flight_index(conn: Connection, **kwargs):
+    """
+    Answer an ADVANCED_FLIGHT search from the flight index, see flight_index.py.
+    Returns None if it has to go to the database, like the searches of the flights
+    that some customers or agents bought tickets for.
+    """
+    emails = FilterSet(kwargs.get("emails"))
+    if (
+        emails.filter_set is not None
+        and (kwargs["is_customer"] or kwargs["is_staff"])
+        and kwargs.get("filter_by_emails")
+    ):
+        return None
+    if kwargs.get("filter_by_agent_id") and kwargs.get("agent_id") is not None:
+        return None
+    ranges = {}
+    for column in ("dep_date", "dep_time", "arr_date", "arr_time"):
+        filter_range = FilterRange(
+            kwargs.get(column + "_lower"), kwargs.get(column + "_upper")
+        )
+        ranges[column] = (filter_range.lower, filter_range.upper)
+    return FLIGHTS.search(
+        conn,
+        ranges["dep_date"],
+        ranges["dep_time"],
+        ranges["arr_date"],
+        ranges["arr_time"],
+        constraints={
+            column: kwargs.get(column)
+            for column in (
+                "flight_number",
+                "dep_airport",
+                "dep_city",
+                "arr_airport",
+                "arr_city",
+                "airline_name",
+            )
+        },
+        after=decode_cursor(kwargs.get("cursor")),
+        limit=kwargs.get("limit"),
+    )
+
+
+def query_by_filter(
+    conn: Connection, filter: FilterType, describe: bool = False, **kwargs
+):
     sql, values = get_filter_query(filter, **kwargs)
-    return query(conn, sql, args=values)
+    if filter is FilterType.ADVANCED_FLIGHT and config.FLIGHT_INDEX_ENABLED:
+        result = search_flight_index(conn, **kwargs)
+        if result is not None:
+            return result if describe else result[0]
+    policy = CACHED_FILTERS.get(filter)
+    key = None
+    if policy is not None:
+        key = get_result_key(filter, sql, values, describe)
+    if key is None:
+        return query(conn, sql, args=values, describe=describe)
+    return RESULTS.get_or_load(
+        filter.value,
+        key,
+        policy.tables,
+        policy.ttl,
+        lambda: query(conn, sql, args=values, describe=describe),
+    )
@@ -1,27 +1,151 @@
-from typing import Dict, Any
+import re
+
+from datetime import datetime
+from decimal import Decimal
+from typing import Callable, Dict, Any, Optional
 from pymysql.connections import Connection
 from pymysql.err import IntegrityError
-from backend.utils.error import MissingKeyError, JsonError
-from backend.utils.query import query, FetchMode, TICKET_PRICE
+from backend.utils.error import (
+    MissingKeyError,
+    JsonError,
+    QueryError,
+    QueryDuplicateError,
+)
+from backend.utils.occupancy import OCCUPANCY, flight_key
+from backend import config
+
+# Matches TICKET_PRICE: a flight that is more than 70% full sells at 1.2 times its base price
+SURGE_MULTIPLIER = Decimal("1.2")
+
+# The columns of a new flight, except for the airline that comes from the staff's session
+FLIGHT_KEYS = (
+    "flight_number",
+    "dep_date",
+    "dep_time",
+    "arr_date",
+    "arr_time",
+    "dep_airport",
+    "arr_airport",
+    "plane_ID",
+    "status",
+    "base_price",
+)
+
+convert = lambda date_str, time_str: datetime.fromisoformat(
+    "{}T{}".format(date_str, time_str)
+)
+
+
+time_value_err_pattern = re.compile(
+    r"Incorrect time value: '(.+)' for column '(.+)' at row 1"
+)
+
 
+def compute_price(base_price: Decimal, sold: int, capacity: int) -> Decimal:
+    if sold * 10 > capacity * 7:
+        return base_price * SURGE_MULTIPLIER
+    return base_price
 
-def get_ticket_price(conn: Connection, data: Dict[str, Any]):
-    ticket_data = {}
+
+def get_ticket_price(connect: Callable[[], Connection], data: Dict[str, Any]):
+    """
+    Quote one flight. `connect` returns the connection of the request, like
+    `ConnectionPool.get_conn`, and is only called once the flight is validated.
+    """
     try:
-        ticket_data["flight_number"] = int(data["flight_number"])
-        ticket_data["dep_date"] = data["dep_date"]
-        ticket_data["dep_time"] = data["dep_time"]
+        key = flight_key(data["flight_number"], data["dep_date"], data["dep_time"])
     except KeyError as err:
         raise MissingKeyError(err.args[0])
     except ValueError as err:
         raise JsonError("The flight number should be a number!")
     try:
-        result = query(
-            conn,
-            TICKET_PRICE.format(flight_number=ticket_data["flight_number"]),
-            FetchMode.ONE,
-            args=ticket_data,
+        occupancy = OCCUPANCY.get(connect(), key)
+    except IntegrityError:
+        raise JsonError("The flight is invalid!")
+    if occupancy is None:
+        return None
+    return (compute_price(occupancy.base_price, occupancy.sold, occupancy.capacity),)
+
+
+def get_ticket_prices(
+    connect: Callable[[], Connection], data: Dict[str, Any]
+) -> Dict[str, Optional[float]]:
+    """
+    Quote a batch of flights. The prices are keyed by "flight_number,dep_date,dep_time"
+    as the values were sent, and flights that do not exist are priced at None. Like
+    `get_ticket_price`, `connect` is only called once the flights are validated.
+    """
+    try:
+        flights = data["flights"]
+    except KeyError as err:
+        raise MissingKeyError(err.args[0])
+    if not isinstance(flights, list):
+        raise JsonError("The flights should be a list!")
+    if len(flights) > config.TICKET_PRICES_MAX_BATCH:
+        raise JsonError(
+            "At most {} flights can be quoted at once!".format(
+                config.TICKET_PRICES_MAX_BATCH
+            )
         )
+    names = {}
+    try:
+        for flight in flights:
+            name = "{},{},{}".format(
+                flight["flight_number"], flight["dep_date"], flight["dep_time"]
+            )
+            names[name] = flight_key(
+                flight["flight_number"], flight["dep_date"], flight["dep_time"]
+            )
+    except KeyError as err:
+        raise MissingKeyError(err.args[0])
+    except (TypeError, ValueError) as err:
+        raise JsonError("The flight number should be a number!")
+    if len(names) == 0:
+        return {}
+    try:
+        occupancies = OCCUPANCY.get_many(connect(), list(set(names.values())))
     except IntegrityError:
         raise JsonError("The flight is invalid!")
-    return result
+    prices: Dict[str, Optional[float]] = {}
+    for name, key in names.items():
+        occupancy = occupancies[key]
+        if occupancy is None:
+            prices[name] = None
+            continue
+        price = compute_price(occupancy.base_price, occupancy.sold, occupancy.capacity)
+        prices[name] = float(str(price))
+    return prices
+
+
+def check_flight_times(flight_data: Dict[str, Any]) -> Optional[str]:
+    """
+    Return why the departure and arrival of a new flight are invalid, if they are.
+    """
+    try:
+        if convert(flight_data["dep_date"], flight_data["dep_time"]) >= convert(
+            flight_data["arr_date"], flight_data["arr_time"]
+        ):
+            return "The arrival time needs to be after the arrival time!"
+    except (TypeError, ValueError) as err:
+        return "The date format is in valid: {}".format(err.args[0])
+    return None
+
+
+def describe_flight_error(err: QueryError) -> Optional[str]:
+    """
+    Explain why inserting a flight failed, or return None for errors that are not
+    caused by the flight data.
+    """
+    if isinstance(err, QueryDuplicateError):
+        return "The flight with the same flight number and departure datetime already exists!"
+    if err.get_error_code() == 1452:
+        # Foreign key constraint
+        if "plane_ID" in err.get_error_message():
+            return "The plane ID is invalid!"
+    if err.get_error_code() == 1292:
+        match = time_value_err_pattern.match(err.get_error_message())
+        if match is not None:
+            return "The time value {} for {} is invalid!".format(
+                match.group(1), match.group(2)
+            )
+    return None
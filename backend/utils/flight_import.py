@@ -0,0 +1,138 @@
+import codecs
+import csv
+import json
+
+from typing import Any, Dict, IO, Iterator, List, Optional, Tuple
+from pymysql.connections import Connection
+from backend.utils.error import QueryError
+from backend.utils.flight import check_flight_times, describe_flight_error, FLIGHT_KEYS
+from backend.utils.query import insert_into, insert_many, transaction
+from backend import config
+
+"""
+Import a schedule of flights for an airline from an uploaded CSV or JSONL file.
+
+The file is read a line at a time and its rows are inserted in batches of
+IMPORT_BATCH_SIZE, so the memory used does not grow with the size of the file. Each batch
+is one transaction with a single multi-row INSERT. When a batch fails, it is retried row
+by row to tell which rows are at fault; the others are still inserted.
+
+Rows are validated like in `/create_flight`, and the errors are reported by line number.
+"""
+
+FORMATS = ("csv", "jsonl")
+
+Row = Tuple[int, Dict[str, Any]]
+
+
+class ImportReport:
+    def __init__(self):
+        self.rows = 0
+        self.inserted = 0
+        self.failed = 0
+        self.errors: List[Dict[str, Any]] = []
+
+    def add_error(self, line: int, message: str):
+        self.failed += 1
+        # Only the first errors are kept, a broken file could have one on every line
+        if len(self.errors) < config.IMPORT_MAX_ERRORS:
+            self.errors.append(dict(line=line, message=message))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            rows=self.rows,
+            inserted=self.inserted,
+            failed=self.failed,
+            errors=self.errors,
+        )
+
+
+def get_import_format(
+    format: Optional[str], filename: Optional[str], mimetype: Optional[str]
+) -> Optional[str]:
+    if format is not None:
+        return format if format in FORMATS else None
+    if filename is not None and filename.lower().endswith((".jsonl", ".ndjson")):
+        return "jsonl"
+    if mimetype in ("application/jsonl", "application/x-ndjson"):
+        return "jsonl"
+    return "csv"
+
+
+def read_csv(lines: Iterator[str]) -> Iterator[Tuple[int, Any]]:
+    reader = csv.DictReader(lines)
+    for record in reader:
+        yield reader.line_num, record
+
+
+def read_jsonl(lines: Iterator[str]) -> Iterator[Tuple[int, Any]]:
+    for line_num, line in enumerate(lines, 1):
+        if line.strip() == "":
+            continue
+        try:
+            yield line_num, json.loads(line)
+        except ValueError:
+            yield line_num, None
+
+
+def read_rows(stream: IO[bytes], format: str) -> Iterator[Tuple[int, Any]]:
+    lines = codecs.iterdecode(stream, "utf-8-sig")
+    return read_csv(lines) if format == "csv" else read_jsonl(lines)
+
+
+def import_schedule(
+    conn: Connection, stream: IO[bytes], format: str, airline_name: str
+) -> ImportReport:
+    report = ImportReport()
+    batch: List[Row] = []
+    for line, record in read_rows(stream, format):
+        report.rows += 1
+        if not isinstance(record, dict):
+            report.add_error(line, "The row is not a valid {} record!".format(format))
+            continue
+        missing = [key for key in FLIGHT_KEYS if record.get(key) in (None, "")]
+        if len(missing) > 0:
+            report.add_error(line, 'Missing required key "{}"!'.format(missing[0]))
+            continue
+        flight_data = {key: record[key] for key in FLIGHT_KEYS}
+        message = check_flight_times(flight_data)
+        if message is not None:
+            report.add_error(line, message)
+            continue
+        flight_data["airline_name"] = airline_name
+        batch.append((line, flight_data))
+        if len(batch) >= config.IMPORT_BATCH_SIZE:
+            _insert_batch(conn, batch, report)
+            batch = []
+    if len(batch) > 0:
+        _insert_batch(conn, batch, report)
+    return report
+
+
+def _insert_batch(conn: Connection, batch: List[Row], report: ImportReport):
+    try:
+        with transaction(conn):
+            insert_many(
+                conn,
+                "Flight",
+                (flight_data for _, flight_data in batch),
+                chunk_size=len(batch),
+                fail_fast=True,
+            )
+        report.inserted += len(batch)
+        return
+    except QueryError:
+        pass
+    # A failed statement only rolls itself back, so the rows can share one transaction
+    with transaction(conn):
+        for line, flight_data in batch:
+            try:
+                insert_into(conn, "Flight", **flight_data)
+                report.inserted += 1
+            except QueryError as err:
+                message = describe_flight_error(err)
+                if message is None:
+                    message = "Failed to create the new flight: {}".format(
+                        err.get_error_message()
+                    )
+                report.add_error(line, message)
@@ -0,0 +1,478 @@
+import logging
+import re
+import threading
+import time
+import unicodedata
+
+from bisect import bisect_left, bisect_right
+from datetime import date, timedelta
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+)
+from pymysql.connections import Connection
+from pymysql.err import MySQLError
+from backend.utils.error import QueryError
+from backend.utils.query import query, FetchMode, INDEXED_FLIGHT, INDEXED_FLIGHTS
+from backend import config
+
+"""
+An in-process index of the flight schedule, which answers the flight searches that
+`get_filter_flight` would otherwise send to `verbose_flights`.
+
+The index holds the flights that depart on `window_start` or later, sorted by
+(dep_date, dep_time, flight_number), which is also the keyset order of the paginated
+searches, along with hash maps from the airports, the cities, the airline and the flight
+number to the flights. A search is answered in memory only if its departure date range
+starts on `window_start` or later; other searches return None and go to the database.
+
+The predicates follow the SQL that the filters build, including the date/time ranges of
+`add_date_time_range` and the case-insensitive comparison of strings. Values that MySQL
+would read in a way we do not mirror (like blank or malformed dates) are left to the
+database as well.
+
+The index is loaded in the background at startup and reloaded every FLIGHT_INDEX_TTL
+seconds. The flights created or updated by this process are refreshed right away.
+"""
+
+LOG = logging.getLogger("airbook.flight_index")
+
+FlightKey = Tuple[date, timedelta, int]
+Bounds = Tuple[Optional[str], Optional[str]]
+
+# The columns with a hash map, which the searches compare with "="
+INDEXED_COLUMNS = (
+    "flight_number",
+    "dep_airport",
+    "arr_airport",
+    "dep_city",
+    "arr_city",
+    "airline_name",
+)
+
+DATE_PATTERN = re.compile(r"(\d{4})-(\d{1,2})-(\d{1,2})")
+TIME_PATTERN = re.compile(r"(\d{1,3}):(\d{1,2})(?::(\d{1,2}))?")
+NUMBER_PATTERN = re.compile(r"\s*\d+")
+
+
+class Unsupported(Exception):
+    """
+    The search uses a value that the index cannot compare like MySQL does.
+    """
+
+
+def fold(value: str) -> str:
+    # Like the default collation of MySQL, which ignores case and accents
+    return "".join(
+        char
+        for char in unicodedata.normalize("NFKD", value)
+        if not unicodedata.combining(char)
+    ).casefold()
+
+
+def parse_date(value: Any) -> date:
+    if isinstance(value, date):
+        return value
+    matches = DATE_PATTERN.fullmatch(str(value))
+    if matches is None:
+        raise Unsupported(value)
+    try:
+        return date(*(int(part) for part in matches.groups()))
+    except ValueError:
+        raise Unsupported(value)
+
+
+def parse_time(value: Any) -> timedelta:
+    if isinstance(value, timedelta):
+        return value
+    matches = TIME_PATTERN.fullmatch(str(value))
+    if matches is None:
+        raise Unsupported(value)
+    hours, minutes, seconds = (int(part or 0) for part in matches.groups())
+    if minutes >= 60 or seconds >= 60:
+        raise Unsupported(value)
+    return timedelta(hours=hours, minutes=minutes, seconds=seconds)
+
+
+def parse_bounds(bounds: Bounds, parse: Callable[[Any], Any]) -> Tuple[Any, Any]:
+    lower, upper = bounds
+    return (
+        None if lower is None else parse(lower),
+        None if upper is None else parse(upper),
+    )
+
+
+def parse_constraint(column: str, value: Any) -> Any:
+    """
+    The value that the column is compared to, or None if the filter leaves it out,
+    like `Filter.add_optional_constraint`.
+    """
+    if value is None:
+        return None
+    if isinstance(value, bool) or not isinstance(value, (str, int)):
+        raise Unsupported(value)
+    if isinstance(value, str) and len(value.strip()) == 0:
+        return None
+    if column == "flight_number":
+        if isinstance(value, str):
+            if NUMBER_PATTERN.fullmatch(value) is None:
+                raise Unsupported(value)
+            return int(value)
+        return value
+    if not isinstance(value, str):
+        raise Unsupported(value)
+    return fold(value)
+
+
+def _bucket_key(column: str, value: Any) -> Any:
+    if value is None:
+        return None
+    if column == "flight_number":
+        return int(value)
+    return fold(value)
+
+
+def in_date_time_range(
+    day: Optional[date],
+    moment: Optional[timedelta],
+    date_bounds: Tuple[Optional[date], Optional[date]],
+    time_bounds: Tuple[Optional[timedelta], Optional[timedelta]],
+) -> bool:
+    """
+    The predicate of `add_date_time_range`: the days strictly inside the date range, and
+    the first and last day of the range within the time range.
+    """
+    date_lower, date_upper = date_bounds
+    time_lower, time_upper = time_bounds
+    if (
+        date_lower is None
+        and date_upper is None
+        and time_lower is None
+        and time_upper is None
+    ):
+        return True
+    # Comparisons with NULL are never true, as in SQL
+    if day is None:
+        return False
+    after_lower = time_lower is None or (moment is not None and moment > time_lower)
+    before_upper = time_upper is None or (moment is not None and moment < time_upper)
+    if date_lower is not None or date_upper is not None:
+        if (date_lower is None or day > date_lower) and (
+            date_upper is None or day < date_upper
+        ):
+            return True
+    if date_lower is not None and day == date_lower:
+        if (date_upper is None or day < date_upper) and after_lower:
+            return True
+    if date_upper is not None and day == date_upper:
+        if (date_lower is None or day > date_lower) and before_upper:
+            return True
+    if date_lower is not None and date_upper is not None:
+        if day == date_lower == date_upper and after_lower and before_upper:
+            return True
+    return False
+
+
+class FlightIndex:
+    def __init__(
+        self,
+        ttl: float,
+        past_days: int,
+        clock: Callable[[], float] = time.monotonic,
+        today: Callable[[], date] = date.today,
+    ):
+        self.ttl = ttl
+        self.past_days = past_days
+        self.clock = clock
+        self.today = today
+        self.window_start: Optional[date] = None
+        self.description: Optional[Sequence[Sequence[Any]]] = None
+        self._columns: Dict[str, int] = {}
+        self._keys: List[FlightKey] = []
+        self._rows: Dict[FlightKey, Sequence[Any]] = {}
+        self._buckets: Dict[str, Dict[Any, Set[FlightKey]]] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock = threading.RLock()
+        self._load_lock = threading.Lock()
+        self._preloading = False
+        # Changes whenever a flight is added, changed or removed
+        self.version = 0
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    @property
+    def loaded(self) -> bool:
+        return self._loaded_at is not None
+
+    @staticmethod
+    def _key(row: Sequence[Any], columns: Dict[str, int]) -> FlightKey:
+        return (
+            parse_date(row[columns["dep_date"]]),
+            parse_time(row[columns["dep_time"]]),
+            int(row[columns["flight_number"]]),
+        )
+
+    def load(self, conn: Connection):
+        """
+        Load the whole schedule from `window_start` on, replacing the current one.
+        """
+        window_start = self.today() - timedelta(days=self.past_days)
+        rows, description = query(
+            conn,
+            INDEXED_FLIGHTS,
+            args=dict(window_start=window_start.isoformat()),
+            describe=True,
+        )
+        self.replace(rows, description, window_start)
+
+    def replace(
+        self,
+        rows: Iterable[Sequence[Any]],
+        description: Sequence[Sequence[Any]],
+        window_start: date,
+    ):
+        columns = {column[0]: index for index, column in enumerate(description)}
+        by_key = {}
+        buckets: Dict[str, Dict[Any, Set[FlightKey]]] = {
+            column: {} for column in INDEXED_COLUMNS
+        }
+        for row in rows:
+            key = self._key(row, columns)
+            by_key[key] = tuple(row)
+            for column in INDEXED_COLUMNS:
+                value = _bucket_key(column, row[columns[column]])
+                buckets[column].setdefault(value, set()).add(key)
+        keys = sorted(by_key)
+        with self._lock:
+            self._columns = columns
+            self._keys = keys
+            self._rows = by_key
+            self._buckets = buckets
+            self.description = description
+            self.window_start = window_start
+            self._loaded_at = self.clock()
+            self.version += 1
+
+    def ensure_loaded(self, conn: Connection) -> bool:
+        """
+        Load the index if it has not been loaded yet or has expired. While another
+        request reloads it, the current one keeps being served. Returns whether the
+        index can be used.
+        """
+        if self.loaded and self.clock() - self._loaded_at < self.ttl:  # type: ignore
+            return True
+        if not self._load_lock.acquire(blocking=not self.loaded):
+            return True
+        try:
+            if not self.loaded or self.clock() - self._loaded_at >= self.ttl:  # type: ignore
+                self.load(conn)
+        except (QueryError, MySQLError) as err:
+            LOG.warning("Failed to load the flight index: %s", err)
+            # A stale index is still better than failing the search
+            return self.loaded
+        finally:
+            self._load_lock.release()
+        return True
+
+    def preload(self, connect: Callable[[], Any]):
+        """
+        Load the index on a background thread, once. `connect` returns a context
+        manager that checks out a connection, like `ConnectionPool.connection`.
+        """
+        with self._lock:
+            if self._preloading:
+                return
+            self._preloading = True
+
+        def run():
+            try:
+                with connect() as conn:
+                    self.ensure_loaded(conn)
+            except Exception:
+                # The first search loads it instead
+                LOG.exception("Failed to preload the flight index")
+
+        threading.Thread(target=run, daemon=True).start()
+
+    def _add(self, key: FlightKey, row: Sequence[Any]):
+        if key in self._rows:
+            self._remove(key)
+        position = bisect_left(self._keys, key)
+        self._keys.insert(position, key)
+        self._rows[key] = tuple(row)
+        self.version += 1
+        for column in INDEXED_COLUMNS:
+            value = _bucket_key(column, row[self._columns[column]])
+            self._buckets[column].setdefault(value, set()).add(key)
+
+    def _remove(self, key: FlightKey):
+        row = self._rows.pop(key, None)
+        if row is None:
+            return
+        position = bisect_left(self._keys, key)
+        del self._keys[position]
+        self.version += 1
+        for column in INDEXED_COLUMNS:
+            value = _bucket_key(column, row[self._columns[column]])
+            keys = self._buckets[column].get(value)
+            if keys is not None:
+                keys.discard(key)
+                if len(keys) == 0:
+                    del self._buckets[column][value]
+
+    def refresh(
+        self, conn: Connection, flight_number: Any, dep_date: Any, dep_time: Any
+    ):
+        """
+        Reload one flight after it was created or changed, or drop it if it is gone. The
+        change is already committed, so if the flight cannot be read back, the whole
+        index is reloaded before the next search instead of failing the request.
+        """
+        if not self.loaded:
+            return
+        try:
+            key = (parse_date(dep_date), parse_time(dep_time), int(flight_number))
+        except (Unsupported, TypeError, ValueError):
+            # MySQL read the values in its own way, so we cannot tell which flight it was
+            self.invalidate()
+            return
+        if key[0] < self.window_start:  # type: ignore
+            return
+        try:
+            row, description = query(
+                conn,
+                INDEXED_FLIGHT,
+                FetchMode.ONE,
+                args=dict(
+                    flight_number=key[2],
+                    dep_date=key[0].isoformat(),
+                    dep_time=str(key[1]),
+                ),
+                describe=True,
+            )
+        except (QueryError, MySQLError) as err:
+            LOG.warning("Failed to refresh flight %s: %s", key[2], err)
+            self.invalidate()
+            return
+        with self._lock:
+            if row is None:
+                self._remove(key)
+            else:
+                self._add(key, row)
+
+    def snapshot(self) -> Tuple[int, List[Sequence[Any]], Dict[str, int]]:
+        """
+        The version, the rows in departure order and the positions of the columns.
+        """
+        with self._lock:
+            rows = [self._rows[key] for key in self._keys]
+            return self.version, rows, self._columns
+
+    def invalidate(self):
+        """
+        Reload the index before the next search, like after a bulk import.
+        """
+        with self._lock:
+            self._loaded_at = None
+
+    def search(
+        self,
+        conn: Connection,
+        dep_date: Bounds,
+        dep_time: Bounds,
+        arr_date: Bounds,
+        arr_time: Bounds,
+        constraints: Dict[str, Any],
+        after: Optional[Tuple[str, str, int]] = None,
+        limit: Optional[int] = None,
+    ) -> Optional[Tuple[List[Sequence[Any]], Sequence[Sequence[Any]]]]:
+        """
+        The flights that match, ordered by (dep_date, dep_time, flight_number), with the
+        description of their columns. None if the search has to go to the database.
+        `constraints` maps the columns of INDEXED_COLUMNS to the values they equal.
+        """
+        for bound in (*dep_date, *dep_time, *arr_date, *arr_time):
+            if bound is not None and len(bound.strip()) == 0:
+                # add_filter_range and add_optional_constraint disagree on blank bounds
+                return None
+        try:
+            dep_dates = parse_bounds(dep_date, parse_date)
+            dep_times = parse_bounds(dep_time, parse_time)
+            arr_dates = parse_bounds(arr_date, parse_date)
+            arr_times = parse_bounds(arr_time, parse_time)
+            values = {
+                column: parse_constraint(column, value)
+                for column, value in constraints.items()
+            }
+            after_key = None
+            if after is not None:
+                after_key = (
+                    parse_date(after[0]),
+                    parse_time(after[1]),
+                    int(after[2]),
+                )
+        except (Unsupported, TypeError, ValueError):
+            return None
+        values = {
+            column: value for column, value in values.items() if value is not None
+        }
+        if dep_dates[0] is None:
+            return None
+
+        if not self.ensure_loaded(conn):
+            return None
+        with self._lock:
+            # The flights before window_start are not indexed
+            if not self.loaded or dep_dates[0] < self.window_start:  # type: ignore
+                return None
+            columns = self._columns
+            sets = [
+                self._buckets[column].get(value, set())
+                for column, value in values.items()
+            ]
+            if len(sets) > 0:
+                sets.sort(key=len)
+                candidates: Iterable[FlightKey] = sorted(
+                    key
+                    for key in sets[0]
+                    if all(key in others for others in sets[1:])
+                    and (after_key is None or key > after_key)
+                )
+            else:
+                start = bisect_left(self._keys, (dep_dates[0],))
+                if after_key is not None:
+                    start = max(start, bisect_right(self._keys, after_key))
+                end = len(self._keys)
+                if dep_dates[1] is not None:
+                    end = bisect_left(self._keys, (dep_dates[1] + timedelta(days=1),))
+                candidates = self._keys[start:end]
+
+            result = []
+            for key in candidates:
+                if limit is not None and len(result) >= limit:
+                    break
+                row = self._rows[key]
+                if not in_date_time_range(key[0], key[1], dep_dates, dep_times):
+                    continue
+                arr_day = row[columns["arr_date"]]
+                arr_moment = row[columns["arr_time"]]
+                if not in_date_time_range(
+                    None if arr_day is None else parse_date(arr_day),
+                    None if arr_moment is None else parse_time(arr_moment),
+                    arr_dates,
+                    arr_times,
+                ):
+                    continue
+                result.append(row)
+            return result, self.description  # type: ignore
+
+
+FLIGHTS = FlightIndex(config.FLIGHT_INDEX_TTL, config.FLIGHT_INDEX_PAST_DAYS)
@@ -0,0 +1,369 @@
+import heapq
+import threading
+
+from bisect import bisect_left, bisect_right
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from itertools import count
+from typing import Any, Dict, List, NamedTuple, Optional, Sequence, Set, Tuple
+from pymysql.connections import Connection
+from backend.utils.error import JsonError, MissingKeyError
+from backend.utils.flight_index import (
+    FLIGHTS,
+    FlightIndex,
+    Unsupported,
+    fold,
+    parse_date,
+    parse_time,
+)
+from backend.utils.serialize import encode_value
+from backend import config
+
+"""
+Search for itineraries: direct flights and connections with one or two stops, one way or
+round trip, over the schedule held by the flight index.
+
+The schedule is a time-expanded graph. Each flight is an edge from its departure to its
+arrival, and a flight connects to the flights that leave its arrival airport after the
+minimum layover and before the maximum one. The search is a best-first search over the
+partial itineraries, ordered by their total time, their price or their arrival. Since
+adding a flight never lowers any of them, the itineraries come out of the queue best
+first, and the search stops after the top K.
+
+Partial itineraries are pruned when they come back to an airport they went through, and
+when they land at an airport from which the destination is more flights away than the
+stops left allow.
+"""
+
+SORT_KEYS = ("duration", "price", "arrival")
+
+
+class Leg(NamedTuple):
+    flight_number: int
+    airline_name: str
+    dep_airport: str
+    arr_airport: str
+    departure: datetime
+    arrival: datetime
+    base_price: Decimal
+    # The airports folded like the flight index compares them
+    origin: str
+    destination: str
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            flight_number=self.flight_number,
+            airline_name=self.airline_name,
+            dep_airport=self.dep_airport,
+            dep_date=encode_value(self.departure.date()),
+            dep_time=encode_value(self.departure.time()),
+            arr_airport=self.arr_airport,
+            arr_date=encode_value(self.arrival.date()),
+            arr_time=encode_value(self.arrival.time()),
+            base_price=encode_value(self.base_price),
+        )
+
+
+class Itinerary(NamedTuple):
+    legs: Tuple[Leg, ...]
+
+    @property
+    def duration(self) -> timedelta:
+        return self.legs[-1].arrival - self.legs[0].departure
+
+    @property
+    def price(self) -> Decimal:
+        return sum((leg.base_price for leg in self.legs), Decimal(0))
+
+    def to_dict(self) -> Dict[str, Any]:
+        return dict(
+            legs=[leg.to_dict() for leg in self.legs],
+            stops=len(self.legs) - 1,
+            duration=int(self.duration.total_seconds()) // 60,
+            price=encode_value(self.price),
+        )
+
+
+def get_cost(legs: Tuple[Leg, ...], sort_by: str) -> Tuple[Any, ...]:
+    duration = legs[-1].arrival - legs[0].departure
+    if sort_by == "price":
+        return sum((leg.base_price for leg in legs), Decimal(0)), duration
+    if sort_by == "arrival":
+        return legs[-1].arrival, duration
+    return (duration,)
+
+
+class Schedule:
+    def __init__(self, rows: Sequence[Sequence[Any]], columns: Dict[str, int]):
+        """
+        `rows` are the flights of the flight index, in departure order.
+        """
+        self.departures: Dict[str, List[Leg]] = {}
+        self._times: Dict[str, List[datetime]] = {}
+        self.airports_by_city: Dict[str, Set[str]] = {}
+        # The airports that have a flight to each airport
+        self._sources: Dict[str, Set[str]] = {}
+        for row in rows:
+            self._add_airport(row[columns["dep_airport"]], row[columns["dep_city"]])
+            self._add_airport(row[columns["arr_airport"]], row[columns["arr_city"]])
+            arr_date, arr_time = row[columns["arr_date"]], row[columns["arr_time"]]
+            if arr_date is None or arr_time is None:
+                # Flights that do not tell when they land cannot be connected
+                continue
+            try:
+                departure = datetime.combine(
+                    parse_date(row[columns["dep_date"]]), time()
+                ) + parse_time(row[columns["dep_time"]])
+                arrival = datetime.combine(parse_date(arr_date), time()) + parse_time(
+                    arr_time
+                )
+            except Unsupported:
+                continue
+            if arrival < departure:
+                continue
+            leg = Leg(
+                int(row[columns["flight_number"]]),
+                row[columns["airline_name"]],
+                row[columns["dep_airport"]],
+                row[columns["arr_airport"]],
+                departure,
+                arrival,
+                Decimal(row[columns["base_price"]]),
+                fold(row[columns["dep_airport"]]),
+                fold(row[columns["arr_airport"]]),
+            )
+            # Keep the departures of each airport sorted, which the rows mostly are already
+            times = self._times.setdefault(leg.origin, [])
+            legs = self.departures.setdefault(leg.origin, [])
+            position = bisect_right(times, departure)
+            times.insert(position, departure)
+            legs.insert(position, leg)
+            self._sources.setdefault(leg.destination, set()).add(leg.origin)
+
+    def _add_airport(self, airport: str, city: Optional[str]):
+        if city is not None:
+            self.airports_by_city.setdefault(fold(city), set()).add(fold(airport))
+
+    def resolve(self, airport: Optional[str], city: Optional[str]) -> Set[str]:
+        """
+        The airports that match the airport name and the city, whichever are given.
+        """
+        airports = None
+        if airport is not None and len(airport.strip()) > 0:
+            airports = {fold(airport)}
+        if city is not None and len(city.strip()) > 0:
+            in_city = self.airports_by_city.get(fold(city), set())
+            airports = in_city if airports is None else airports & in_city
+        return set() if airports is None else airports
+
+    def departing(
+        self, airport: str, earliest: datetime, latest: datetime
+    ) -> List[Leg]:
+        """
+        The flights that leave the airport between `earliest` and `latest`, both included.
+        """
+        times = self._times.get(airport)
+        if times is None:
+            return []
+        start = bisect_left(times, earliest)
+        end = bisect_right(times, latest)
+        return self.departures[airport][start:end]
+
+    def reachable(self, destinations: Set[str], legs: int) -> List[Set[str]]:
+        """
+        The airports from which a destination can be reached with at most `i` flights,
+        for i from 0 to `legs`.
+        """
+        reach = [set(destinations)]
+        for i in range(legs):
+            airports = set(reach[-1])
+            for airport in reach[-1]:
+                airports |= self._sources.get(airport, set())
+            reach.append(airports)
+        return reach
+
+
+def find_itineraries(
+    schedule: Schedule,
+    origins: Set[str],
+    destinations: Set[str],
+    day: date,
+    max_stops: int,
+    min_layover: timedelta,
+    max_layover: timedelta,
+    top_k: int,
+    sort_by: str = "duration",
+    now: Optional[datetime] = None,
+    max_expansions: Optional[int] = None,
+) -> Tuple[List[Itinerary], bool]:
+    """
+    The `top_k` best itineraries from an origin to a destination that leave on `day`
+    (and after `now`), with at most `max_stops` stops, and whether the search gave up
+    after `max_expansions` partial itineraries, in which case better ones may be missing.
+    """
+    max_expansions = max_expansions or config.ITINERARY_MAX_EXPANSIONS
+    reach = schedule.reachable(destinations, max_stops)
+    queue: List[Tuple[Any, int, Tuple[Leg, ...]]] = []
+    order = count()
+
+    def push(legs: Tuple[Leg, ...]):
+        heapq.heappush(queue, (get_cost(legs, sort_by), next(order), legs))
+
+    start = datetime.combine(day, time())
+    end = start + timedelta(days=1) - timedelta(microseconds=1)
+    if now is not None:
+        start = max(start, now)
+    for origin in origins:
+        for leg in schedule.departing(origin, start, end):
+            if leg.destination not in origins and leg.destination in reach[max_stops]:
+                push((leg,))
+
+    result: List[Itinerary] = []
+    expansions = 0
+    truncated = False
+    while len(queue) > 0 and len(result) < top_k:
+        legs = heapq.heappop(queue)[2]
+        last = legs[-1]
+        if last.destination in destinations:
+            result.append(Itinerary(legs))
+            continue
+        # The flights that the itinerary can still take
+        remaining = max_stops + 1 - len(legs)
+        if remaining <= 0:
+            continue
+        expansions += 1
+        if expansions > max_expansions:
+            truncated = True
+            break
+        visited = origins | {leg.origin for leg in legs}
+        for leg in schedule.departing(
+            last.destination, last.arrival + min_layover, last.arrival + max_layover
+        ):
+            if (
+                leg.destination in visited
+                or leg.destination not in reach[remaining - 1]
+            ):
+                continue
+            push(legs + (leg,))
+    return result, truncated
+
+
+class ItinerarySearch:
+    def __init__(self, index: FlightIndex):
+        self.index = index
+        self._schedule: Optional[Tuple[int, Schedule]] = None
+        self._lock = threading.Lock()
+
+    def get_schedule(self, conn: Connection) -> Schedule:
+        """
+        The graph of the flights of the index, rebuilt whenever the index changed.
+        """
+        if not self.index.ensure_loaded(conn) or not self.index.loaded:
+            raise JsonError("The flight schedule is not available, please try again!")
+        with self._lock:
+            if self._schedule is None or self._schedule[0] != self.index.version:
+                version, rows, columns = self.index.snapshot()
+                self._schedule = (version, Schedule(rows, columns))
+            return self._schedule[1]
+
+    def search(
+        self, conn: Connection, search: Dict[str, Any], now: Optional[datetime] = None
+    ) -> Dict[str, Any]:
+        """
+        Run a search parsed by `parse_itinerary_search`. Round trips also return the
+        itineraries back, from the destination on the return date. `truncated` tells
+        whether either search stopped early.
+        """
+        schedule = self.get_schedule(conn)
+        window_start = self.index.window_start
+        if window_start is not None and search["dep_date"] < window_start:
+            raise JsonError("The departure date should not be in the past!")
+        origins = schedule.resolve(search["dep_airport"], search["dep_city"])
+        destinations = schedule.resolve(search["arr_airport"], search["arr_city"])
+        options = dict(
+            max_stops=search["max_stops"],
+            min_layover=search["min_layover"],
+            max_layover=search["max_layover"],
+            top_k=search["top_k"],
+            sort_by=search["sort_by"],
+            now=now or datetime.now(),
+        )
+        outbound, truncated = find_itineraries(
+            schedule, origins, destinations, search["dep_date"], **options
+        )
+        result: Dict[str, Any] = dict(
+            outbound=[itinerary.to_dict() for itinerary in outbound]
+        )
+        if search["return_date"] is not None:
+            inbound, inbound_truncated = find_itineraries(
+                schedule, destinations, origins, search["return_date"], **options
+            )
+            result["return"] = [itinerary.to_dict() for itinerary in inbound]
+            truncated = truncated or inbound_truncated
+        result["truncated"] = truncated
+        return result
+
+
+def _get_int(data: Dict[str, Any], key: str, default: int, lower: int, upper: int):
+    value = data.get(key)
+    if value is None:
+        return default
+    try:
+        value = int(value)
+    except (TypeError, ValueError):
+        raise JsonError('The value of "{}" should be a number!'.format(key))
+    if not lower <= value <= upper:
+        raise JsonError(
+            'The value of "{}" should be between {} and {}!'.format(key, lower, upper)
+        )
+    return value
+
+
+def _get_date(data: Dict[str, Any], key: str) -> date:
+    try:
+        return parse_date(data[key])
+    except KeyError as err:
+        raise MissingKeyError(err.args[0])
+    except Unsupported:
+        raise JsonError('The value of "{}" should be a date!'.format(key))
+
+
+def parse_itinerary_search(data: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    if data is None:
+        data = {}
+    search: Dict[str, Any] = {}
+    for side in ("dep", "arr"):
+        airport, city = data.get(side + "_airport"), data.get(side + "_city")
+        for key, value in ((side + "_airport", airport), (side + "_city", city)):
+            if value is not None and not isinstance(value, str):
+                raise JsonError('The value of "{}" should be a string!'.format(key))
+        if not (airport or "").strip() and not (city or "").strip():
+            raise MissingKeyError(side + "_airport")
+        search[side + "_airport"], search[side + "_city"] = airport, city
+    search["dep_date"] = _get_date(data, "dep_date")
+    search["return_date"] = None
+    if data.get("return_date") is not None:
+        search["return_date"] = _get_date(data, "return_date")
+        if search["return_date"] < search["dep_date"]:
+            raise JsonError("The return date should not be before the departure date!")
+    search["max_stops"] = _get_int(data, "max_stops", 1, 0, config.ITINERARY_MAX_STOPS)
+    min_layover = _get_int(
+        data, "min_layover", config.ITINERARY_MIN_LAYOVER, 0, 24 * 60
+    )
+    max_layover = _get_int(
+        data, "max_layover", config.ITINERARY_MAX_LAYOVER, min_layover, 48 * 60
+    )
+    search["min_layover"] = timedelta(minutes=min_layover)
+    search["max_layover"] = timedelta(minutes=max_layover)
+    search["top_k"] = _get_int(
+        data, "top_k", config.ITINERARY_TOP_K, 1, config.ITINERARY_MAX_TOP_K
+    )
+    search["sort_by"] = data.get("sort_by", "duration")
+    if search["sort_by"] not in SORT_KEYS:
+        raise JsonError(
+            "The itineraries can only be sorted by {}!".format(", ".join(SORT_KEYS))
+        )
+    return search
+
+
+ITINERARIES = ItinerarySearch(FLIGHTS)
@@ -0,0 +1,67 @@
+import threading
+
+from collections import OrderedDict
+from typing import Any, Callable, Generic, Hashable, Optional, TypeVar
+from backend.utils.metrics import counter
+
+"""
+A thread-safe, size-bounded LRU map that counts its hits and misses.
+"""
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+_MISSING = object()
+
+
+class LRUCache(Generic[K, V]):
+    def __init__(self, name: str, max_size: int = 256):
+        assert max_size > 0
+        self.name = name
+        self.max_size = max_size
+        self._data: "OrderedDict[K, V]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = counter("{}_hits".format(name))
+        self.misses = counter("{}_misses".format(name))
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def __contains__(self, key: K) -> bool:
+        return key in self._data
+
+    def get(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        with self._lock:
+            value = self._data.get(key, _MISSING)
+            if value is _MISSING:
+                self.misses.increment()
+                return default
+            self._data.move_to_end(key)
+        self.hits.increment()
+        return value  # type: ignore
+
+    def put(self, key: K, value: V):
+        with self._lock:
+            self._data[key] = value
+            self._data.move_to_end(key)
+            while len(self._data) > self.max_size:
+                self._data.popitem(last=False)
+
+    def get_or_put(self, key: K, factory: Callable[[], V]) -> V:
+        """
+        Return the cached value for `key`, building and caching it with `factory` on a miss.
+        The factory runs outside of the lock, so concurrent misses may both build it.
+        """
+        value = self.get(key, _MISSING)  # type: ignore
+        if value is _MISSING:
+            value = factory()
+            self.put(key, value)
+        return value  # type: ignore
+
+    def pop(self, key: K, default: Optional[V] = None) -> Optional[V]:
+        with self._lock:
+            return self._data.pop(key, default)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
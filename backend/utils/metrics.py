@@ -0,0 +1,38 @@
+import threading
+
+from typing import Dict
+
+"""
+Process-wide counters for events worth watching in production, like reconnects.
+Counters are registered by name so that any module can share them.
+"""
+
+
+class Counter:
+    def __init__(self, name: str):
+        self.name = name
+        self._value = 0
+        self._lock = threading.Lock()
+
+    def increment(self, amount: int = 1):
+        with self._lock:
+            self._value += amount
+
+    @property
+    def value(self) -> int:
+        return self._value
+
+
+COUNTERS: Dict[str, Counter] = {}
+_registry_lock = threading.Lock()
+
+
+def counter(name: str) -> Counter:
+    with _registry_lock:
+        if name not in COUNTERS:
+            COUNTERS[name] = Counter(name)
+        return COUNTERS[name]
+
+
+def snapshot() -> Dict[str, int]:
+    return {name: c.value for name, c in COUNTERS.items()}
@@ -0,0 +1,178 @@
+import threading
+import time
+
+from datetime import date, time as dt_time
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, NamedTuple, Optional, Sequence, Tuple
+from pymysql.connections import Connection
+from backend.utils.lru import LRUCache
+from backend.utils.metrics import counter
+from backend.utils.query import (
+    query,
+    FetchMode,
+    FLIGHT_OCCUPANCY,
+    FLIGHT_OCCUPANCY_MANY,
+)
+from backend.utils.serialize import encode_value
+from backend import config
+
+"""
+An in-process cache of the seats sold on each flight, which is all the ticket price
+depends on.
+
+Entries are loaded with FLIGHT_OCCUPANCY (FLIGHT_OCCUPANCY_MANY for batches). A purchase
+reads the count of its flight under lock anyway, so it replaces the entry with that
+count through `refresh()` once the tickets are inserted. Tickets sold by other processes
+are only picked up when an entry is older than the TTL and is reloaded from the
+database; reloads that find a different count bump the `occupancy_drift` counter.
+"""
+
+FlightKey = Tuple[int, str, str]
+
+
+class Occupancy(NamedTuple):
+    base_price: Decimal
+    sold: int
+    capacity: int
+    loaded_at: float
+
+
+def _parse_date(value: str) -> str:
+    year, month, day = (int(part) for part in value.split("-"))
+    return date(year, month, day).isoformat()
+
+
+def _parse_time(value: str) -> str:
+    parts = [int(part) for part in value.split(":")]
+    if not 2 <= len(parts) <= 3:
+        raise ValueError(value)
+    return dt_time(*parts).isoformat()
+
+
+def _normalize(value: Any, parse: Callable[[str], str]) -> str:
+    # Requests spell dates and times the loose way MySQL accepts them ("2021-5-28"),
+    # while query results come back as date and timedelta objects, which are encoded
+    # without the leading zero of the hour
+    if not isinstance(value, str):
+        value = str(encode_value(value))
+    try:
+        return parse(value)
+    except ValueError:
+        return value
+
+
+def flight_key(flight_number: Any, dep_date: Any, dep_time: Any) -> FlightKey:
+    return (
+        int(flight_number),
+        _normalize(dep_date, _parse_date),
+        _normalize(dep_time, _parse_time),
+    )
+
+
+def load_occupancy(conn: Connection, key: FlightKey) -> Optional[Sequence[Any]]:
+    flight_number, dep_date, dep_time = key
+    return query(
+        conn,
+        FLIGHT_OCCUPANCY,
+        FetchMode.ONE,
+        args=dict(flight_number=flight_number, dep_date=dep_date, dep_time=dep_time),
+    )
+
+
+def load_occupancy_many(
+    conn: Connection, keys: Sequence[FlightKey]
+) -> List[Sequence[Any]]:
+    """
+    Load the occupancy of several flights with a single grouped query.
+    Each row starts with the key columns of its flight.
+    """
+    sql = FLIGHT_OCCUPANCY_MANY.format(keys=",".join(["(%s,%s,%s)"] * len(keys)))
+    return query(conn, sql, args=[value for key in keys for value in key])
+
+
+class OccupancyCache:
+    def __init__(
+        self,
+        load: Callable[[Connection, FlightKey], Optional[Sequence[Any]]],
+        load_many: Callable[[Connection, Sequence[FlightKey]], Sequence[Sequence[Any]]],
+        max_size: int = 4096,
+        ttl: float = 30.0,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self._cache: LRUCache[FlightKey, Occupancy] = LRUCache("occupancy", max_size)
+        self._load = load
+        self._load_many = load_many
+        self._clock = clock
+        self._lock = threading.Lock()
+        self.ttl = ttl
+        self.drift = counter("occupancy_drift")
+
+    def get(self, conn: Connection, key: FlightKey) -> Optional[Occupancy]:
+        """
+        Return the occupancy of the flight, or None if there is no such flight.
+        """
+        entry = self._cache.get(key)
+        if entry is not None and self._clock() - entry.loaded_at < self.ttl:
+            return entry
+        row = self._load(conn, key)
+        if row is None:
+            self._cache.pop(key)
+            return None
+        return self._store(key, entry, row)
+
+    def get_many(
+        self, conn: Connection, keys: Sequence[FlightKey]
+    ) -> Dict[FlightKey, Optional[Occupancy]]:
+        """
+        Return the occupancy of each flight, loading all the ones that are not
+        cached or have expired with one query. Flights that do not exist map to None.
+        """
+        now = self._clock()
+        result: Dict[FlightKey, Optional[Occupancy]] = {}
+        stale: Dict[FlightKey, Optional[Occupancy]] = {}
+        for key in keys:
+            entry = self._cache.get(key)
+            if entry is not None and now - entry.loaded_at < self.ttl:
+                result[key] = entry
+            else:
+                stale[key] = entry
+        if len(stale) == 0:
+            return result
+        for row in self._load_many(conn, list(stale)):
+            key = flight_key(*row[:3])
+            if key in stale:
+                result[key] = self._store(key, stale.pop(key), row[3:])
+        for key in stale:
+            self._cache.pop(key)
+            result[key] = None
+        return result
+
+    def _store(
+        self, key: FlightKey, entry: Optional[Occupancy], row: Sequence[Any]
+    ) -> Occupancy:
+        base_price, sold, capacity = row
+        fresh = Occupancy(base_price, int(sold), int(capacity), self._clock())
+        with self._lock:
+            if entry is not None and entry.sold != fresh.sold:
+                self.drift.increment()
+            self._cache.put(key, fresh)
+        return fresh
+
+    def refresh(
+        self, key: FlightKey, base_price: Decimal, sold: int, capacity: int
+    ) -> Occupancy:
+        """
+        Replace the entry with a count that is known to be exact, like one read under lock.
+        """
+        return self._store(key, None, (base_price, sold, capacity))
+
+    def clear(self):
+        self._cache.clear()
+
+
+OCCUPANCY = OccupancyCache(
+    load_occupancy,
+    load_occupancy_many,
+    config.OCCUPANCY_CACHE_SIZE,
+    config.OCCUPANCY_CACHE_TTL,
+)
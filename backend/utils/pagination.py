@@ -0,0 +1,64 @@
+import binascii
+import json
+
+from base64 import urlsafe_b64decode, urlsafe_b64encode
+from typing import Any, Optional, Sequence, Tuple
+from backend.utils.error import JsonError
+from backend.utils.serialize import encode_value
+from backend import config
+
+"""
+Keyset pagination for the flight filters.
+Pages are ordered by (dep_date, dep_time, flight_number), the primary key of Flight, and
+a page continues strictly after the key of the last row of the previous one.
+The key is handed to the client as an opaque continuation token.
+"""
+
+KEYSET_COLUMNS = ("dep_date", "dep_time", "flight_number")
+
+
+def get_page_size(page_size: Any) -> int:
+    if page_size is None:
+        return config.SEARCH_PAGE_SIZE
+    try:
+        page_size = int(page_size)
+    except (TypeError, ValueError):
+        raise JsonError("The page size should be a number!")
+    if page_size <= 0:
+        raise JsonError("The page size should be positive!")
+    return min(page_size, config.SEARCH_MAX_PAGE_SIZE)
+
+
+def encode_cursor(key: Sequence[Any]) -> str:
+    data = json.dumps([encode_value(value) for value in key], separators=(",", ":"))
+    return urlsafe_b64encode(data.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: Optional[str]) -> Optional[Tuple[str, str, int]]:
+    if token is None:
+        return None
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        dep_date, dep_time, flight_number = json.loads(urlsafe_b64decode(padded))
+        if not isinstance(dep_date, str) or not isinstance(dep_time, str):
+            raise ValueError()
+        return dep_date, dep_time, int(flight_number)
+    except (binascii.Error, UnicodeDecodeError, TypeError, ValueError):
+        raise JsonError("The continuation token is invalid!")
+
+
+def split_page(
+    rows: Sequence[Sequence[Any]],
+    description: Optional[Sequence[Sequence[Any]]],
+    page_size: int,
+) -> Tuple[Sequence[Sequence[Any]], Optional[str]]:
+    """
+    The filters fetch one row more than the page size to tell whether another page follows.
+    Returns the rows of the page and the token for the next page, if there is one.
+    """
+    if len(rows) <= page_size or description is None:
+        return rows, None
+    rows = rows[:page_size]
+    names = [column[0] for column in description]
+    last = rows[-1]
+    return rows, encode_cursor([last[names.index(name)] for name in KEYSET_COLUMNS])
@@ -1,11 +1,14 @@
 from typing import Sequence, Dict, Any
 from flask import session
 from backend.utils.authentication import DataType
+from backend.utils.profile import get_profile_key, PROFILES
+from backend.utils.staff import remember_staff_airline
 
 
 def handle_login_data(user_type: DataType, user_data_raw: Sequence):
     """
-    Modify the session with the user data and return a dictionary containing user data.
+    Modify the session with the user data and return a dictionary containing user data,
+    which is also cached for `/session-fetch`.
     """
     user_data: Dict[str, Any] = {}
 
@@ -34,6 +37,7 @@ def handle_login_data(user_type: DataType, user_data_raw: Sequence):
         user_data["email"] = user_data_raw[1]
     elif user_type == DataType.STAFF:
         session["username"] = user_data_raw[0]
+        remember_staff_airline(session, user_data_raw[6])
 
         user_data["username"] = user_data_raw[0]
         user_data["first_name"] = user_data_raw[3]
@@ -41,4 +45,5 @@ def handle_login_data(user_type: DataType, user_data_raw: Sequence):
         user_data["date_of_birth"] = user_data_raw[5]
         user_data["airline_name"] = user_data_raw[6]
 
+    PROFILES.put(get_profile_key(user_type, session), user_data)
     return user_data
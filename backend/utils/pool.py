@@ -0,0 +1,177 @@
+import threading
+import time
+
+from collections import deque
+from contextlib import contextmanager
+from typing import Callable, Deque, Iterator, Optional, Tuple
+from flask import Flask, g
+from pymysql.connections import Connection
+from pymysql.constants.SERVER_STATUS import SERVER_STATUS_IN_TRANS
+from pymysql.err import Error
+
+from backend.utils.error import PoolTimeoutError
+from backend.utils.metrics import counter
+
+"""
+A thread-safe pool of MySQL connections.
+Each request checks out at most one connection on its first call to `get_conn`,
+and the connection is returned to the pool when the application context is torn down.
+Connections that sat idle for longer than `idle_check` seconds are pinged on checkout
+instead of pinging before every statement.
+"""
+
+RECONNECTS = counter("db_reconnects")
+
+
+class ConnectionPool:
+    def __init__(
+        self,
+        connect: Callable[[], Connection],
+        min_size: int = 1,
+        max_size: int = 10,
+        timeout: float = 5.0,
+        idle_check: float = 30.0,
+    ):
+        assert 0 <= min_size <= max_size and max_size > 0
+        self._connect = connect
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.idle_check = idle_check
+        # Idle connections paired with the time they were returned
+        self._idle: Deque[Tuple[Connection, float]] = deque()
+        # The number of connections owned by the pool, both idle and checked out.
+        self._size = 0
+        self._cond = threading.Condition()
+
+    @property
+    def size(self) -> int:
+        return self._size
+
+    @property
+    def idle(self) -> int:
+        return len(self._idle)
+
+    def _open(self) -> Connection:
+        """
+        Open a new connection for a slot that has already been reserved in `_size`.
+        """
+        try:
+            return self._connect()
+        except Exception:
+            with self._cond:
+                self._size -= 1
+                self._cond.notify()
+            raise
+
+    def _fill(self):
+        while True:
+            with self._cond:
+                if self._size >= self.min_size:
+                    return
+                self._size += 1
+            conn = self._open()
+            with self._cond:
+                self._idle.append((conn, time.monotonic()))
+                self._cond.notify()
+
+    def _is_healthy(self, conn: Connection) -> bool:
+        return bool(conn.open)
+
+    def _validate(self, conn: Connection, released_at: float) -> bool:
+        """
+        Ping the server only when the connection has been idle long enough for
+        the server to have dropped it (wait_timeout, restarts, network blips).
+        """
+        if not self._is_healthy(conn):
+            return False
+        if time.monotonic() - released_at < self.idle_check:
+            return True
+        try:
+            conn.ping(reconnect=False)
+        except Error:
+            return False
+        return True
+
+    def _discard(self, conn: Connection):
+        try:
+            conn.close()
+        except Error:
+            pass
+        with self._cond:
+            self._size -= 1
+            self._cond.notify()
+
+    def acquire(self, timeout: Optional[float] = None) -> Connection:
+        """
+        Check out a connection, waiting up to `timeout` seconds for one to be returned
+        when the pool is exhausted. Raises PoolTimeoutError if none becomes available.
+        """
+        self._fill()
+        timeout = self.timeout if timeout is None else timeout
+        while True:
+            with self._cond:
+                if not self._cond.wait_for(
+                    lambda: len(self._idle) > 0 or self._size < self.max_size,
+                    timeout,
+                ):
+                    raise PoolTimeoutError(self.max_size, timeout)
+                if len(self._idle) > 0:
+                    conn, released_at = self._idle.pop()
+                else:
+                    self._size += 1
+                    conn = None
+            if conn is None:
+                return self._open()
+            if self._validate(conn, released_at):
+                return conn
+            RECONNECTS.increment()
+            self._discard(conn)
+
+    def release(self, conn: Connection):
+        """
+        Return a connection to the pool. Transactions left open are rolled back so
+        that the next borrower starts from a clean state.
+        """
+        if not self._is_healthy(conn):
+            self._discard(conn)
+            return
+        if conn.server_status & SERVER_STATUS_IN_TRANS:
+            try:
+                conn.rollback()
+            except Error:
+                self._discard(conn)
+                return
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    def close(self):
+        with self._cond:
+            idle, self._idle = self._idle, deque()
+        for conn, _ in idle:
+            self._discard(conn)
+
+    @contextmanager
+    def connection(self) -> Iterator[Connection]:
+        conn = self.acquire()
+        try:
+            yield conn
+        finally:
+            self.release(conn)
+
+    def get_conn(self) -> Connection:
+        """
+        Get the connection checked out for the current request, checking one out if needed.
+        """
+        if "db_conn" not in g:
+            g.db_conn = self.acquire()
+        return g.db_conn
+
+    def _teardown(self, exception: Optional[BaseException]):
+        conn = g.pop("db_conn", None)
+        if conn is not None:
+            self.release(conn)
+
+    def init_app(self, app: Flask):
+        app.teardown_appcontext(self._teardown)
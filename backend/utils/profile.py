@@ -0,0 +1,156 @@
+import hashlib
+import json
+import time
+
+from typing import Any, Callable, Dict, Mapping, NamedTuple, Optional, Sequence, Tuple
+from flask import Response
+from pymysql.connections import Connection
+from backend.utils.authentication import DataType
+from backend.utils.error import JsonError
+from backend.utils.lru import LRUCache
+from backend.utils.query import (
+    query,
+    FetchMode,
+    CUST_PROFILE,
+    AGENT_PROFILE,
+    STAFF_PROFILE,
+)
+from backend import config
+
+"""
+An in-process cache of the user data that `/session-fetch` returns, keyed by the identity
+kept in the session.
+
+Profiles are stored by `handle_login_data()` at login and loaded with the *_PROFILE
+queries on a miss, which leave the password and its salt out. They expire after
+PROFILE_CACHE_TTL seconds; call `invalidate()` when a profile is changed.
+
+Each profile has a version, a hash of its content, which is the same in every process.
+It is sent along with the user data and in the `airbook_profile` cookie. A client that
+still has the user data of that version can skip `/session-fetch`, or send the version
+to get a response without the user data when it has not changed.
+"""
+
+ProfileKey = Tuple[Any, ...]
+
+PROFILE_COOKIE = "airbook_profile"
+
+# The columns selected by the *_PROFILE queries
+PROFILE_FIELDS = {
+    DataType.CUST: (
+        "email",
+        "name",
+        "phone_number",
+        "date_of_birth",
+        "passport_number",
+        "passport_expiration",
+        "passport_country",
+        "building_number",
+        "street",
+        "city",
+        "state",
+    ),
+    DataType.AGENT: ("agent_id", "email"),
+    DataType.STAFF: (
+        "username",
+        "first_name",
+        "last_name",
+        "date_of_birth",
+        "airline_name",
+    ),
+}
+
+PROFILE_QUERIES = {
+    DataType.CUST: CUST_PROFILE,
+    DataType.AGENT: AGENT_PROFILE,
+    DataType.STAFF: STAFF_PROFILE,
+}
+
+
+class Profile(NamedTuple):
+    user_data: Dict[str, Any]
+    version: str
+    loaded_at: float
+
+
+def get_profile_key(user_type: DataType, session: Mapping[str, Any]) -> ProfileKey:
+    """
+    Raises KeyError if the session does not identify a user of that type.
+    """
+    if user_type is DataType.CUST:
+        return (user_type.value, session["email"])
+    if user_type is DataType.AGENT:
+        return (user_type.value, session["agent_id"], session["agent_email"])
+    if user_type is DataType.STAFF:
+        return (user_type.value, session["username"])
+    raise KeyError(user_type.value)
+
+
+def get_version(user_data: Dict[str, Any]) -> str:
+    encoded = json.dumps(user_data, sort_keys=True, default=str)
+    return hashlib.sha256(encoded.encode("utf-8")).hexdigest()[:16]
+
+
+def parse_profile(user_type: DataType, row: Sequence) -> Dict[str, Any]:
+    user_data: Dict[str, Any] = dict(user_type=user_type.value)
+    user_data.update(zip(PROFILE_FIELDS[user_type], row))
+    return user_data
+
+
+class ProfileCache:
+    def __init__(
+        self,
+        max_size: int,
+        ttl: float,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.ttl = ttl
+        self.clock = clock
+        self._cache: LRUCache[ProfileKey, Profile] = LRUCache("profile", max_size)
+
+    def get(self, key: ProfileKey) -> Optional[Profile]:
+        profile = self._cache.get(key)
+        if profile is None or self.clock() - profile.loaded_at >= self.ttl:
+            return None
+        return profile
+
+    def put(self, key: ProfileKey, user_data: Dict[str, Any]) -> Profile:
+        profile = Profile(user_data, get_version(user_data), self.clock())
+        self._cache.put(key, profile)
+        return profile
+
+    def load(
+        self, conn: Connection, user_type: DataType, session: Mapping[str, Any]
+    ) -> Profile:
+        """
+        Return the cached profile of the session's user, querying it on a miss.
+        Raises KeyError if the session does not identify a user of that type.
+        """
+        key = get_profile_key(user_type, session)
+        profile = self.get(key)
+        if profile is not None:
+            return profile
+        row = query(conn, PROFILE_QUERIES[user_type], FetchMode.ONE, args=dict(session))
+        if row is None:
+            raise JsonError("The user might have been removed!")
+        return self.put(key, parse_profile(user_type, row))
+
+    def invalidate(self, key: ProfileKey):
+        self._cache.pop(key)
+
+    def clear(self):
+        self._cache.clear()
+
+
+PROFILES = ProfileCache(config.PROFILE_CACHE_SIZE, config.PROFILE_CACHE_TTL)
+
+
+def set_profile_cookie(response: Response, version: str):
+    # Not HttpOnly, the frontend compares it with the version of the user data it kept.
+    # It expires with the cached profile, so that the frontend does not keep stale data.
+    response.set_cookie(
+        PROFILE_COOKIE,
+        version,
+        max_age=int(config.PROFILE_CACHE_TTL),
+        samesite="Lax",
+    )
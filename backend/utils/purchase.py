@@ -0,0 +1,227 @@
+from decimal import Decimal
+from typing import Any, Dict, List
+from pymysql.connections import Connection
+from backend.utils.error import JsonError, MissingKeyError
+from backend.utils.flight import compute_price
+from backend.utils.occupancy import OCCUPANCY, flight_key
+from backend.utils.sales import record_agent_sales, record_airline_sales, to_cents
+from backend.utils.query import (
+    insert_into,
+    insert_rows,
+    query,
+    transaction,
+    FetchMode,
+    EXISTING_CUSTOMERS,
+    LOCK_FLIGHT_FOR_PURCHASE,
+    NEW_FLIGHT_TICKETS,
+)
+from backend import config
+
+"""
+Ticket purchases, each run as one transaction.
+
+The flight is priced and validated by the same statement that locks it, so a purchase
+costs a BEGIN, that statement, the inserts and a COMMIT. The price is kept in memory for
+the commission instead of being read back from the new ticket. The daily sales are only
+updated once the purchase is committed.
+
+Bulk purchases by booking agents book a group of passengers on one flight with one
+multi-row INSERT per table. The passengers are priced in order, so the ones that push the
+flight past 70% already pay the higher price.
+"""
+
+# Booking agents earn 10% of the price of the tickets they sell
+COMMISSION_RATE = Decimal("0.1")
+
+FLIGHT_KEYS = ("airline_name", "flight_number", "dep_date", "dep_time")
+PASSENGER_KEYS = ("email", "card_type", "card_number", "name_on_card", "exp_date")
+# Passengers without their own card are charged on the card given for the whole group
+CARD_KEYS = ("card_type", "card_number", "name_on_card", "exp_date")
+
+
+def get_commission(price: Decimal) -> Decimal:
+    return to_cents(price * COMMISSION_RATE)
+
+
+def purchase_ticket(conn: Connection, ticket_data: Dict[str, Any]) -> int:
+    """
+    Sell a ticket for the flight in `ticket_data`, which holds the columns of Ticket
+    except for the price. Returns the ID of the new ticket.
+    """
+    with transaction(conn):
+        row = query(conn, LOCK_FLIGHT_FOR_PURCHASE, FetchMode.ONE, args=ticket_data)
+        if row is None:
+            raise JsonError("The flight is invalid!")
+        base_price, sold, capacity, upcoming = row
+        if not upcoming:
+            raise JsonError("Cannot purchase a ticket for a flight in the past!")
+        price = to_cents(compute_price(base_price, int(sold), int(capacity)))
+        ticket_ID = insert_into(conn, "Ticket", sold_price=price, **ticket_data)
+        if ticket_ID is None:
+            raise JsonError("Failed due to an unknown error.")
+        commissions = None
+        if "booking_agent_id" in ticket_data:
+            commission = get_commission(price)
+            insert_into(
+                conn,
+                "Book",
+                ticket_ID=ticket_ID,
+                booking_agent_id=ticket_data["booking_agent_id"],
+                commission=commission,
+            )
+            commissions = [commission]
+    record_airline_sales(conn, ticket_ID, [price], commissions)
+    if commissions is not None:
+        record_agent_sales(
+            conn, ticket_data["booking_agent_id"], ticket_ID, commissions
+        )
+    # The locked count is exact, so the cache can take it as is
+    OCCUPANCY.refresh(
+        flight_key(
+            ticket_data["flight_number"],
+            ticket_data["dep_date"],
+            ticket_data["dep_time"],
+        ),
+        base_price,
+        int(sold) + 1,
+        int(capacity),
+    )
+    return ticket_ID
+
+
+def parse_bulk_purchase(data: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Collect the flight and the passengers of a bulk purchase. Passengers with missing
+    details are reported together, by their position in the list.
+    """
+    flight_data: Dict[str, Any] = {}
+    try:
+        for key in FLIGHT_KEYS:
+            flight_data[key] = data[key]
+        passengers = data["passengers"]
+    except KeyError as err:
+        raise MissingKeyError(err.args[0])
+    try:
+        flight_data["flight_number"] = int(flight_data["flight_number"])
+    except (TypeError, ValueError):
+        raise JsonError("The flight number should be a number!")
+    if not isinstance(passengers, list) or len(passengers) == 0:
+        raise JsonError("The passengers should be a non-empty list!")
+    if len(passengers) > config.BULK_PURCHASE_MAX_SIZE:
+        raise JsonError(
+            "At most {} passengers can be booked at once!".format(
+                config.BULK_PURCHASE_MAX_SIZE
+            )
+        )
+    card = {key: data[key] for key in CARD_KEYS if key in data}
+    rows = []
+    errors = []
+    for index, passenger in enumerate(passengers):
+        if not isinstance(passenger, dict):
+            errors.append(dict(index=index, message="The passenger is invalid!"))
+            continue
+        passenger = {**card, **passenger}
+        missing = [key for key in PASSENGER_KEYS if key not in passenger]
+        if len(missing) > 0:
+            errors.append(
+                dict(
+                    index=index,
+                    message='Missing required key "{}"!'.format(missing[0]),
+                    key=missing[0],
+                )
+            )
+            continue
+        rows.append({key: passenger[key] for key in PASSENGER_KEYS})
+    if len(errors) > 0:
+        raise JsonError("Some of the passengers cannot be booked!", errors=errors)
+    return dict(flight=flight_data, passengers=rows)
+
+
+def purchase_tickets(
+    conn: Connection,
+    flight_data: Dict[str, Any],
+    passengers: List[Dict[str, Any]],
+    booking_agent_id: Any,
+) -> List[Dict[str, Any]]:
+    """
+    Book all the passengers on the flight, or none of them. Returns the ID and the
+    price of each ticket, in the order of the passengers.
+    """
+    emails = [passenger["email"] for passenger in passengers]
+    found = query(
+        conn,
+        EXISTING_CUSTOMERS.format(emails=",".join(["%s"] * len(set(emails)))),
+        args=list(set(emails)),
+    )
+    # Emails are compared case-insensitively, like the collation of the column does
+    customers = {row[0].lower() for row in found}
+    errors = [
+        dict(index=index, message="The customer {} does not exist!".format(email))
+        for index, email in enumerate(emails)
+        if str(email).lower() not in customers
+    ]
+    if len(errors) > 0:
+        raise JsonError("Some of the passengers cannot be booked!", errors=errors)
+
+    with transaction(conn):
+        row = query(conn, LOCK_FLIGHT_FOR_PURCHASE, FetchMode.ONE, args=flight_data)
+        if row is None:
+            raise JsonError("The flight is invalid!")
+        base_price, sold, capacity, upcoming = row
+        if not upcoming:
+            raise JsonError("Cannot purchase a ticket for a flight in the past!")
+        sold, capacity = int(sold), int(capacity)
+        # Rounded once, like the Ticket rows store them, so that the commissions, the
+        # sales totals and the response all agree with the tickets
+        prices = [
+            to_cents(compute_price(base_price, sold + index, capacity))
+            for index in range(len(passengers))
+        ]
+        columns = PASSENGER_KEYS + FLIGHT_KEYS + ("booking_agent_id", "sold_price")
+        first_ticket_ID = insert_rows(
+            conn,
+            "Ticket",
+            columns,
+            [
+                [passenger[key] for key in PASSENGER_KEYS]
+                + [flight_data[key] for key in FLIGHT_KEYS]
+                + [booking_agent_id, price]
+                for passenger, price in zip(passengers, prices)
+            ],
+        )
+        ticket_IDs = [
+            row[0]
+            for row in query(
+                conn,
+                NEW_FLIGHT_TICKETS,
+                args=dict(flight_data, first_ticket_ID=first_ticket_ID),
+            )
+        ]
+        if len(ticket_IDs) != len(passengers):
+            raise JsonError("Failed due to an unknown error.")
+        commissions = [get_commission(price) for price in prices]
+        insert_rows(
+            conn,
+            "Book",
+            ("ticket_ID", "booking_agent_id", "commission"),
+            [
+                (ticket_ID, booking_agent_id, commission)
+                for ticket_ID, commission in zip(ticket_IDs, commissions)
+            ],
+        )
+    record_airline_sales(conn, ticket_IDs[0], prices, commissions)
+    record_agent_sales(conn, booking_agent_id, ticket_IDs[0], commissions)
+    OCCUPANCY.refresh(
+        flight_key(
+            flight_data["flight_number"],
+            flight_data["dep_date"],
+            flight_data["dep_time"],
+        ),
+        base_price,
+        sold + len(passengers),
+        capacity,
+    )
+    return [
+        dict(ticket_ID=ticket_ID, price=float(str(price)))
+        for ticket_ID, price in zip(ticket_IDs, prices)
+    ]
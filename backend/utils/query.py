@@ -1,23 +1,46 @@
 import re
+import time
 
+from contextlib import contextmanager
 from pymysql.err import (
     IntegrityError,
     ProgrammingError,
     InternalError,
+    InterfaceError,
     OperationalError,
 )
 from pymysql.connections import Connection
-from typing import Dict, Any, Optional, Union
+from pymysql.constants import CR
+from pymysql.constants.SERVER_STATUS import SERVER_STATUS_IN_TRANS
+from typing import (
+    Dict,
+    Any,
+    Iterable,
+    Iterator,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
 from enum import Enum, auto
 
 from backend.utils.error import QueryError, QueryKeyError, QueryDuplicateError
+from backend.utils.metrics import counter
+from backend.utils.query_log import QueryLog
+from backend.utils.result_cache import begin_writes, end_writes, record_write
+from backend.utils.statements import STATEMENTS, prepare
+from backend import config
 
 INSERT_INTO = "INSERT INTO {} ({}) VALUES ({});"
+INSERT_ROWS = "INSERT INTO {} ({}) VALUES {}{};"
+UPSERT_CLAUSE = " ON DUPLICATE KEY UPDATE {}"
 SELECT_IDENTITY = "SELECT @@IDENTITY;"
 BASIC_SELECT = "SELECT * FROM {table} {predicates}"
 BASIC_DELETE = "DELETE FROM {table} WHERE {}"
 
-CITY_AIRPORT = "call city_airport(%(city)s);"
+CITY_AIRPORT = prepare("call city_airport(%(city)s);")
 
 DELAYED_FLIGHTS = "SELECT * FROM Flight\
     WHERE status='delayed';"
@@ -26,22 +49,124 @@ CUSTOMER_WHO_BOUGHT_TICKETS = "SELECT * FROM Customer\
         SELECT * FROM Ticket\
         WHERE Customer.email=Ticket.email\
     );"
-UPDATE_STATUS = "UPDATE Flight SET status=%(status)s WHERE (flight_number, dep_date, dep_time,airline_name)=(%(flight_number)s,%(dep_date)s,%(dep_time)s,%(airline_name)s)"
-TICKET_PRICE = "SELECT base_price * \
-    (SELECT IF((SELECT COUNT(*)/\
-        (SELECT seat_capacity \
-            FROM Flight JOIN Airplane USING(plane_ID)\
-            where (flight_number, dep_date, dep_time)=({flight_number},%(dep_date)s,%(dep_time)s))\
-        FROM Ticket where (flight_number, dep_date, dep_time)=({flight_number},%(dep_date)s,%(dep_time)s))>0.7,1.2,1)) \
-    FROM Flight WHERE (flight_number, dep_date, dep_time)=({flight_number},%(dep_date)s,%(dep_time)s)"  # 0.7 is the 70% capacity cap; 1.2 is for the extra price
-
-CHECK_CUST_LOGIN = "SELECT * FROM Customer\
+UPDATE_STATUS = prepare(
+    "UPDATE Flight SET status=%(status)s WHERE (flight_number, dep_date, dep_time,airline_name)=(%(flight_number)s,%(dep_date)s,%(dep_time)s,%(airline_name)s)"
+)
+# A flight that is more than 70% full sells at 1.2 times its base price.
+# The load factor is compared as integers (sold * 10 > capacity * 7) to avoid rounding.
+TICKET_PRICE = prepare(
+    "SELECT base_price * IF(COUNT(ticket_ID) * 10 > seat_capacity * 7, 1.2, 1) \
+    FROM Flight JOIN Airplane USING(airline_name, plane_ID) \
+    LEFT JOIN Ticket USING(flight_number, dep_date, dep_time) \
+    WHERE (flight_number, dep_date, dep_time)=(%(flight_number)s,%(dep_date)s,%(dep_time)s) \
+    GROUP BY flight_number, dep_date, dep_time"
+)
+# The inputs of TICKET_PRICE, for pricing flights from the occupancy cache
+FLIGHT_OCCUPANCY = prepare(
+    "SELECT base_price, COUNT(ticket_ID), seat_capacity \
+    FROM Flight JOIN Airplane USING(airline_name, plane_ID) \
+    LEFT JOIN Ticket USING(flight_number, dep_date, dep_time) \
+    WHERE (flight_number, dep_date, dep_time)=(%(flight_number)s,%(dep_date)s,%(dep_time)s) \
+    GROUP BY flight_number, dep_date, dep_time"
+)
+# FLIGHT_OCCUPANCY for a batch of flights; {keys} is a list of "(%s,%s,%s)" placeholders
+FLIGHT_OCCUPANCY_MANY = "SELECT flight_number, dep_date, dep_time, \
+    base_price, COUNT(ticket_ID), seat_capacity \
+    FROM Flight JOIN Airplane USING(airline_name, plane_ID) \
+    LEFT JOIN Ticket USING(flight_number, dep_date, dep_time) \
+    WHERE (flight_number, dep_date, dep_time) IN ({keys}) \
+    GROUP BY flight_number, dep_date, dep_time"
+# The airports held by the autocomplete index, see airports.py
+ALL_AIRPORTS = prepare("SELECT airport_name, city FROM Airport")
+# The flights held by the in-process flight index, see flight_index.py
+INDEXED_FLIGHTS = prepare(
+    "SELECT * FROM verbose_flights WHERE dep_date >= %(window_start)s"
+)
+INDEXED_FLIGHT = prepare(
+    "SELECT * FROM verbose_flights \
+    WHERE (flight_number, dep_date, dep_time)=(%(flight_number)s,%(dep_date)s,%(dep_time)s)"
+)
+# Lock the flight and its tickets for a purchase, and read what the purchase needs to
+# price and validate it. Concurrent purchases of the same flight wait on the locks, so
+# each of them counts the tickets sold by the ones before it.
+LOCK_FLIGHT_FOR_PURCHASE = prepare(
+    "SELECT base_price, COUNT(ticket_ID), seat_capacity, \
+    (dep_date, dep_time) > (UTC_DATE(), UTC_TIME()) \
+    FROM Flight JOIN Airplane USING(airline_name, plane_ID) \
+    LEFT JOIN Ticket USING(flight_number, dep_date, dep_time) \
+    WHERE (flight_number, dep_date, dep_time)=(%(flight_number)s,%(dep_date)s,%(dep_time)s) \
+    GROUP BY flight_number, dep_date, dep_time \
+    FOR UPDATE"
+)
+# The tickets that a bulk purchase has just inserted, in the order of its rows. No one else
+# can insert tickets for the flight while the purchase holds LOCK_FLIGHT_FOR_PURCHASE.
+NEW_FLIGHT_TICKETS = prepare(
+    "SELECT ticket_ID FROM Ticket \
+    WHERE (flight_number, dep_date, dep_time)=(%(flight_number)s,%(dep_date)s,%(dep_time)s) \
+    AND ticket_ID >= %(first_ticket_ID)s ORDER BY ticket_ID"
+)
+EXISTING_CUSTOMERS = "SELECT email FROM Customer WHERE email IN ({emails})"
+# Count new tickets into the daily sales of their booking agent and of their airline, on
+# the day the tickets were purchased. Tickets sold together share the purchase date.
+ADD_AGENT_DAILY_SALES = prepare(
+    "INSERT INTO AgentDailySales \
+    (booking_agent_ID, sale_date, total_commission, total_tickets) \
+    SELECT %(booking_agent_id)s, purchase_date, %(commission)s, %(tickets)s \
+    FROM Ticket WHERE ticket_ID = %(ticket_ID)s \
+    ON DUPLICATE KEY UPDATE \
+    total_commission = total_commission + VALUES(total_commission), \
+    total_tickets = total_tickets + VALUES(total_tickets);"
+)
+ADD_AIRLINE_DAILY_SALES = prepare(
+    "INSERT INTO AirlineDailySales \
+    (airline_name, sale_date, direct_tickets, indirect_tickets, total_sales) \
+    SELECT airline_name, purchase_date, %(direct_tickets)s, %(indirect_tickets)s, %(sales)s \
+    FROM Ticket WHERE ticket_ID = %(ticket_ID)s \
+    ON DUPLICATE KEY UPDATE \
+    direct_tickets = direct_tickets + VALUES(direct_tickets), \
+    indirect_tickets = indirect_tickets + VALUES(indirect_tickets), \
+    total_sales = total_sales + VALUES(total_sales);"
+)
+
+CHECK_CUST_LOGIN = prepare(
+    "SELECT * FROM Customer\
     WHERE email=%(email)s;"
-CHECK_AGENT_LOGIN = "SELECT * FROM BookingAgent\
+)
+CHECK_AGENT_LOGIN = prepare(
+    "SELECT * FROM BookingAgent\
     WHERE (booking_agent_ID, email) = (%(booking_agent_id)s, %(email)s);"
-CHECK_STAFF_LOGIN = "SELECT * FROM AirlineStaff\
+)
+CHECK_STAFF_LOGIN = prepare(
+    "SELECT * FROM AirlineStaff\
     WHERE username=%(username)s;"
-STAFF_AIRLINE = "SELECT airline_name FROM AirlineStaff WHERE username=%(username)s;"
+)
+CUST_PROFILE = prepare(
+    "SELECT email, name, phone_number, date_of_birth, passport_number, \
+    passport_expiration, passport_country, building_number, street, city, state \
+    FROM Customer WHERE email=%(email)s;"
+)
+AGENT_PROFILE = prepare(
+    "SELECT booking_agent_ID, email FROM BookingAgent \
+    WHERE (booking_agent_ID, email) = (%(agent_id)s, %(agent_email)s);"
+)
+STAFF_PROFILE = prepare(
+    "SELECT username, first_name, last_name, date_of_birth, airline_name \
+    FROM AirlineStaff WHERE username=%(username)s;"
+)
+UPDATE_CUST_PASSWORD = prepare(
+    "UPDATE Customer SET password=%(password)s, salt=%(salt)s WHERE email=%(email)s"
+)
+UPDATE_AGENT_PASSWORD = prepare(
+    "UPDATE BookingAgent SET password=%(password)s, salt=%(salt)s \
+    WHERE booking_agent_ID=%(booking_agent_id)s"
+)
+UPDATE_STAFF_PASSWORD = prepare(
+    "UPDATE AirlineStaff SET password=%(password)s, salt=%(salt)s \
+    WHERE username=%(username)s"
+)
+STAFF_AIRLINE = prepare(
+    "SELECT airline_name FROM AirlineStaff WHERE username=%(username)s;"
+)
 
 
 class FetchMode(Enum):
@@ -88,6 +213,73 @@ ENTITY_TO_TABLE_MAP = {
 DUPLICATE_KEY_ERROR_PATTERN = re.compile(
     r"Duplicate entry \'(.*)\' for key \'(.*)\.(.*)\'"
 )
+# Statements that can be re-run safely after the connection drops mid-flight
+READ_ONLY_PATTERN = re.compile(r"\s*(SELECT|SHOW|WITH)\b", re.IGNORECASE)
+# The table that an INSERT, UPDATE or DELETE writes to
+WRITE_PATTERN = re.compile(
+    r"\s*(?:INSERT\s+(?:IGNORE\s+)?INTO|REPLACE\s+INTO|UPDATE|DELETE\s+FROM)\s+`?(\w+)",
+    re.IGNORECASE,
+)
+CONNECTION_LOST_ERRORS = {
+    CR.CR_SERVER_GONE_ERROR,
+    CR.CR_SERVER_LOST,
+    CR.CR_SERVER_LOST_EXTENDED,
+}
+
+RECONNECTS = counter("db_reconnects")
+QUERY_LOG = QueryLog(
+    level=config.QUERY_LOG_LEVEL,
+    sample_rate=config.QUERY_LOG_SAMPLE_RATE,
+    slow_ms=config.QUERY_LOG_SLOW_MS,
+    redact_args=config.QUERY_LOG_REDACT,
+)
+
+
+def is_connection_lost(err: Exception) -> bool:
+    # pymysql raises InterfaceError when the socket was already closed on our side
+    if isinstance(err, InterfaceError):
+        return True
+    return isinstance(err, OperationalError) and err.args[0] in CONNECTION_LOST_ERRORS
+
+
+def reconnect(conn: Connection):
+    conn.connect()
+    RECONNECTS.increment()
+
+
+def in_transaction(conn: Connection) -> bool:
+    return bool(conn.server_status & SERVER_STATUS_IN_TRANS)
+
+
+@contextmanager
+def transaction(conn: Connection) -> Iterator[Connection]:
+    """
+    Run the statements in the block as one transaction, which is committed when the
+    block exits and rolled back if it raises.
+    """
+    conn.begin()
+    begin_writes()
+    try:
+        try:
+            yield conn
+        except BaseException:
+            try:
+                conn.rollback()
+            except (OperationalError, InterfaceError) as err:
+                # The server rolls back by itself when the connection drops
+                if not is_connection_lost(err):
+                    raise
+                reconnect(conn)
+            raise
+        try:
+            conn.commit()
+        except (OperationalError, InterfaceError) as err:
+            if is_connection_lost(err):
+                reconnect(conn)
+            raise QueryError(*err.args)
+    finally:
+        # Cached results read before the commit could have been stored in the meantime
+        end_writes()
 
 
 def form_args_list(args, backticks=False):
@@ -112,14 +304,144 @@ def get_key_val_lists(**kwargs):
 
 
 def insert_into(conn: Connection, table_name: str, **kwargs: Any) -> Optional[int]:
-    conn.ping(True)
+    """
+    Inserts are never retried after a dropped connection since we cannot tell
+    whether the server applied them. The connection is restored for the next call.
+    """
     keys, values, make_str = get_key_val_lists(**kwargs)
+    result, _ = _execute_insert(
+        conn, INSERT_INTO.format(table_name, ",".join(keys), make_str), (*values,)
+    )
+    if result is not None:
+        return result
+
+
+def insert_rows(
+    conn: Connection,
+    table_name: str,
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    upsert: Union[bool, Sequence[str]] = False,
+) -> Optional[int]:
+    """
+    Insert the rows with a single multi-row INSERT, which either inserts all of them or
+    none. Returns the auto-increment ID of the first row. Errors are raised like in `insert_into`.
+    With `upsert`, rows that hit an existing key update it instead: all the columns if
+    `upsert` is True, or only the listed ones.
+    """
+    return _insert_rows(conn, table_name, columns, rows, upsert)[0]
+
+
+class ChunkError(NamedTuple):
+    # The rows [start, end) of the input were not inserted because of the error
+    start: int
+    end: int
+    error: QueryError
+
+
+class InsertReport:
+    def __init__(self):
+        self.inserted = 0
+        self.chunks = 0
+        self.errors: List[ChunkError] = []
+
+    def get_duplicates(self) -> List[ChunkError]:
+        return [
+            chunk
+            for chunk in self.errors
+            if isinstance(chunk.error, QueryDuplicateError)
+        ]
+
+
+def insert_many(
+    conn: Connection,
+    table_name: str,
+    rows: Iterable[Dict[str, Any]],
+    chunk_size: Optional[int] = None,
+    upsert: Union[bool, Sequence[str]] = False,
+    fail_fast: bool = False,
+) -> InsertReport:
+    """
+    Insert the rows, which all have the same keys, with one multi-row INSERT per chunk of
+    `chunk_size` rows. In autocommit mode each chunk is committed on its own, so a failing
+    chunk (like one with a duplicate key) is reported and the others still go in. With
+    `fail_fast`, the first error is raised instead, which lets a surrounding `transaction()`
+    roll back everything.
+
+    `inserted` counts the rows that were inserted; with `upsert` it counts every row of
+    the chunks that went in, whether it was inserted or updated.
+    """
+    chunk_size = chunk_size or config.INSERT_CHUNK_SIZE
+    report = InsertReport()
+    columns: Optional[List[str]] = None
+    chunk: List[List[Any]] = []
+    start = 0
+
+    def flush():
+        nonlocal chunk, start
+        if len(chunk) == 0:
+            return
+        report.chunks += 1
+        try:
+            _, affected = _insert_rows(conn, table_name, columns, chunk, upsert)
+            # MySQL reports 2 affected rows for each updated row, and 0 for unchanged ones
+            report.inserted += len(chunk) if upsert else affected
+        except QueryError as err:
+            if fail_fast:
+                raise err
+            report.errors.append(ChunkError(start, start + len(chunk), err))
+        start += len(chunk)
+        chunk = []
+
+    for row in rows:
+        if columns is None:
+            columns = list(row.keys())
+        try:
+            chunk.append([row[column] for column in columns])
+        except KeyError as err:
+            raise QueryKeyError(key=err.args[0])
+        if len(chunk) >= chunk_size:
+            flush()
+    flush()
+    return report
+
+
+def _insert_rows(
+    conn: Connection,
+    table_name: str,
+    columns: Sequence[str],
+    rows: Sequence[Sequence[Any]],
+    upsert: Union[bool, Sequence[str]] = False,
+) -> Tuple[Optional[int], int]:
+    placeholder = "({})".format(",".join(["%s"] * len(columns)))
+    update = ""
+    if upsert:
+        updated = form_args_list(columns if upsert is True else upsert)
+        update = UPSERT_CLAUSE.format(
+            ",".join("{0}=VALUES({0})".format(column) for column in updated)
+        )
+    return _execute_insert(
+        conn,
+        INSERT_ROWS.format(
+            table_name,
+            ",".join(form_args_list(columns)),
+            ",".join([placeholder] * len(rows)),
+            update,
+        ),
+        [value for row in rows for value in row],
+    )
+
+
+def _execute_insert(
+    conn: Connection, sql: str, values: Sequence[Any]
+) -> Tuple[Optional[int], int]:
+    """
+    Returns the auto-increment ID of the first row and the number of affected rows.
+    """
     result = None
     try:
         with conn.cursor() as cursor:
-            cursor.execute(
-                INSERT_INTO.format(table_name, ",".join(keys), make_str), (*values,)
-            )
+            affected = cursor.execute(sql, values)
             result = cursor.lastrowid
     except IntegrityError as err:
         matches = DUPLICATE_KEY_ERROR_PATTERN.match(err.args[1])
@@ -129,11 +451,25 @@ def insert_into(conn: Connection, table_name: str, **kwargs: Any) -> Optional[in
             raise QueryError(*err.args)
     except ProgrammingError as err:
         raise QueryError(*err.args)
-    except OperationalError as err:
+    except (OperationalError, InterfaceError) as err:
+        if is_connection_lost(err):
+            reconnect(conn)
         raise QueryError(*err.args)
-    conn.commit()
-    if result is not None:
-        return result
+    # Pooled connections run in autocommit mode, which saves the COMMIT round trip. Inserts
+    # in a transaction() are committed when the block exits.
+    if not conn.get_autocommit() and not in_transaction(conn):
+        conn.commit()
+    _record_write(sql)
+    return result, affected
+
+
+def _record_write(sql: str):
+    """
+    Drop the cached results that read the table written by the statement, if any.
+    """
+    matches = WRITE_PATTERN.match(sql)
+    if matches is not None:
+        record_write(matches.group(1))
 
 
 def query(
@@ -142,30 +478,73 @@ def query(
     fetch_mode: FetchMode = FetchMode.ALL,
     size: int = 1,
     args: Optional[Union[dict, tuple, list]] = None,
+    describe: bool = False,
+):
+    """
+    Run a statement and fetch its result. With `describe`, return the result along
+    with `cursor.description`.
+    """
+    if not QUERY_LOG.enabled:
+        return _execute_with_retry(conn, sql, fetch_mode, size, args, describe)
+    start = time.perf_counter()
+    try:
+        return _execute_with_retry(conn, sql, fetch_mode, size, args, describe)
+    finally:
+        QUERY_LOG.record(sql, args, time.perf_counter() - start)
+
+
+def _execute_with_retry(
+    conn: Connection,
+    sql: str,
+    fetch_mode: FetchMode,
+    size: int,
+    args: Optional[Union[dict, tuple, list]],
+    describe: bool = False,
+):
+    transactional = in_transaction(conn)
+    try:
+        return _execute(conn, sql, fetch_mode, size, args, describe)
+    except (OperationalError, InterfaceError) as err:
+        if not is_connection_lost(err):
+            raise err
+        reconnect(conn)
+        # Only reads are retried, and only once. A transaction that was cut off has been
+        # rolled back, so none of its statements can be retried on their own.
+        if transactional or READ_ONLY_PATTERN.match(sql) is None:
+            raise err
+        return _execute(conn, sql, fetch_mode, size, args, describe)
+
+
+def _execute(
+    conn: Connection,
+    sql: str,
+    fetch_mode: FetchMode,
+    size: int,
+    args: Optional[Union[dict, tuple, list]],
+    describe: bool = False,
 ):
-    print(sql.replace("\n", " ").replace("    ", " "))
-    print(args)
-    conn.ping(True)
     # Throws QueryKeyError
     with conn.cursor() as cursor:
         try:
-            cursor.execute(sql, args)
+            statement = STATEMENTS.get(sql)
+            if statement is not None and isinstance(args, dict):
+                cursor.execute(statement.sql, statement.bind(args))
+            else:
+                cursor.execute(sql, args)
         except KeyError as err:
             raise QueryKeyError(key=err.args[0])
         except ProgrammingError as err:
-            print("A Programming error occurs =========")
-            print(sql)
-            print(err.args[0])
-            print(err.args[1])
-            print("=================")
+            QUERY_LOG.error(sql, err)
         except InternalError as err:
-            print(sql)
-            print(err.args[0])
+            QUERY_LOG.error(sql, err)
+        _record_write(sql)
 
         if fetch_mode is FetchMode.ONE:
-            return cursor.fetchone()
+            result = cursor.fetchone()
         elif fetch_mode is FetchMode.MANY:
-            return cursor.fetchmany(size)
+            result = cursor.fetchmany(size)
         elif fetch_mode is FetchMode.ALL:
-            return cursor.fetchall()
-    conn.commit()
+            result = cursor.fetchall()
+        if describe:
+            return result, cursor.description
+        return result
@@ -0,0 +1,169 @@
+import atexit
+import json
+import logging
+import queue
+import random
+import re
+import threading
+
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Optional
+
+"""
+Structured and sampled logging of the SQL statements issued by `query()`.
+
+Levels:
+  - "off": nothing is logged, and `query()` does not even time the statement.
+  - "slow": only statements slower than `slow_ms` are logged.
+  - "all": slow statements are always logged; the others are sampled at `sample_rate`.
+
+Records are handed to a queue and formatted on a background listener thread,
+so the request thread never does console I/O or string formatting for the log.
+Arguments are redacted before they leave the request thread.
+"""
+
+LEVELS = ("off", "slow", "all")
+
+# Keys whose values are never written to the log
+REDACTED_KEYS = {
+    "email",
+    "emails",
+    "agent_email",
+    "password",
+    "salt",
+    "card_number",
+    "name_on_card",
+    "exp_date",
+    "phone_number",
+    "passport_number",
+    "date_of_birth",
+}
+REDACTED = "***"
+EMAIL_PATTERN = re.compile(r"[^@\s]+@[^@\s]+")
+WHITESPACE_PATTERN = re.compile(r"\s+")
+
+
+def redact(args: Any, key: Optional[str] = None) -> Any:
+    """
+    Return a copy of the query arguments with sensitive values masked. Values passed
+    positionally have no key to go by, so anything that looks like an email is masked.
+    """
+    if key is not None and key.lower() in REDACTED_KEYS:
+        return REDACTED
+    if isinstance(args, dict):
+        return {k: redact(v, str(k)) for k, v in args.items()}
+    if isinstance(args, (list, tuple, set)):
+        return [redact(v) for v in args]
+    if isinstance(args, str) and EMAIL_PATTERN.search(args) is not None:
+        return REDACTED
+    return args
+
+
+class JsonLineFormatter(logging.Formatter):
+    def format(self, record: logging.LogRecord) -> str:
+        return json.dumps(
+            dict(
+                level=record.levelname.lower(),
+                event=record.getMessage(),
+                duration_ms=getattr(record, "duration_ms", None),
+                sql=WHITESPACE_PATTERN.sub(" ", getattr(record, "sql", "")).strip(),
+                args=getattr(record, "query_args", None),
+            ),
+            separators=(",", ":"),
+            default=str,
+        )
+
+
+class _DeferredQueueHandler(QueueHandler):
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        # The stock QueueHandler formats the message on the calling thread;
+        # leave that to the listener instead.
+        return record
+
+
+class QueryLog:
+    def __init__(
+        self,
+        level: str = "off",
+        sample_rate: float = 1.0,
+        slow_ms: float = 200.0,
+        redact_args: bool = True,
+        handler: Optional[logging.Handler] = None,
+    ):
+        self.logger = logging.getLogger("airbook.query")
+        self.logger.propagate = False
+        self.logger.setLevel(logging.DEBUG)
+        self._handler = handler
+        self._listener: Optional[QueueListener] = None
+        self._queue_handler: Optional[QueueHandler] = None
+        # `error()` starts the listener lazily, possibly from several threads at once
+        self._start_lock = threading.Lock()
+        self.configure(level, sample_rate, slow_ms, redact_args)
+
+    def configure(
+        self,
+        level: str = "off",
+        sample_rate: float = 1.0,
+        slow_ms: float = 200.0,
+        redact_args: bool = True,
+    ):
+        if level not in LEVELS:
+            raise ValueError("The query log level {} is invalid.".format(level))
+        self.level = level
+        self.sample_rate = sample_rate
+        self.slow_threshold = slow_ms / 1000
+        self.redact_args = redact_args
+        # `query()` checks this before doing any work for the log
+        self.enabled = level != "off"
+        if self.enabled:
+            self._start()
+
+    def _start(self):
+        if self._listener is not None:
+            return
+        with self._start_lock:
+            if self._listener is not None:
+                return
+            log_queue: queue.SimpleQueue = queue.SimpleQueue()
+            handler = self._handler or logging.StreamHandler()
+            handler.setFormatter(JsonLineFormatter())
+            self._queue_handler = _DeferredQueueHandler(log_queue)
+            self.logger.addHandler(self._queue_handler)
+            listener = QueueListener(log_queue, handler)
+            listener.start()
+            self._listener = listener
+        atexit.register(self.stop)
+
+    def stop(self):
+        """
+        Flush the pending records and stop the listener thread.
+        """
+        with self._start_lock:
+            if self._listener is not None:
+                self.logger.removeHandler(self._queue_handler)
+                self._listener.stop()
+                self._listener = None
+
+    def record(self, sql: str, args: Any, elapsed: float):
+        """
+        Log a finished statement that took `elapsed` seconds, if the level and sampling allow.
+        """
+        slow = elapsed >= self.slow_threshold
+        if not slow and (self.level != "all" or random.random() >= self.sample_rate):
+            return
+        self.logger.log(
+            logging.WARNING if slow else logging.DEBUG,
+            "slow_query" if slow else "query",
+            extra=dict(
+                sql=sql,
+                query_args=redact(args) if self.redact_args else args,
+                duration_ms=round(elapsed * 1000, 3),
+            ),
+        )
+
+    def error(self, sql: str, err: Exception):
+        # Failed statements point at bugs, so they are logged at any level
+        self._start()
+        self.logger.error(
+            "query_error", extra=dict(sql=sql, query_args=redact(err.args))
+        )
@@ -0,0 +1,144 @@
+import socket
+import threading
+
+from typing import Any, BinaryIO, Optional, Sequence, Union
+from urllib.parse import urlsplit
+
+"""
+A minimal client for the protocol of Redis (RESP), enough for the session store to talk to
+Redis or anything compatible with it (KeyDB, Dragonfly, `backend.tools.fake_redis`).
+
+The client holds a single connection, used by one command at a time, and reconnects once
+when a command fails on a broken connection. The commands that the session store sends
+can all be repeated safely.
+"""
+
+Arg = Union[bytes, str, int, float]
+
+
+class RespError(Exception):
+    """
+    An error reply from the server.
+    """
+
+
+def encode_command(args: Sequence[Arg]) -> bytes:
+    parts = [b"*%d\r\n" % len(args)]
+    for arg in args:
+        if not isinstance(arg, bytes):
+            arg = str(arg).encode("utf-8")
+        parts.append(b"$%d\r\n%s\r\n" % (len(arg), arg))
+    return b"".join(parts)
+
+
+def read_reply(reader: BinaryIO) -> Any:
+    """
+    Read one reply. Error replies are returned as RespError instead of being raised,
+    so that a whole reply is always consumed. Raises ConnectionError at the end of the stream.
+    """
+    line = reader.readline()
+    if not line.endswith(b"\r\n"):
+        raise ConnectionError("The connection was closed.")
+    prefix, body = line[:1], line[1:-2]
+    if prefix == b"+":
+        return body.decode("utf-8")
+    if prefix == b"-":
+        return RespError(body.decode("utf-8"))
+    if prefix == b":":
+        return int(body)
+    if prefix == b"$":
+        length = int(body)
+        if length < 0:
+            return None
+        data = reader.read(length + 2)
+        if len(data) < length + 2:
+            raise ConnectionError("The connection was closed.")
+        return data[:-2]
+    if prefix == b"*":
+        length = int(body)
+        if length < 0:
+            return None
+        return [read_reply(reader) for i in range(length)]
+    raise RespError("Unexpected reply: {!r}".format(line))
+
+
+class RespClient:
+    def __init__(
+        self,
+        host: str = "localhost",
+        port: int = 6379,
+        password: Optional[str] = None,
+        db: int = 0,
+        timeout: float = 5,
+    ):
+        self.host = host
+        self.port = port
+        self.password = password
+        self.db = db
+        self.timeout = timeout
+        self._lock = threading.Lock()
+        self._sock: Optional[socket.socket] = None
+        self._reader: Optional[BinaryIO] = None
+
+    @classmethod
+    def from_url(cls, url: str, timeout: float = 5) -> "RespClient":
+        """
+        Parse a `redis://[:password@]host[:port][/db]` URL.
+        """
+        parts = urlsplit(url)
+        if parts.scheme != "redis":
+            raise ValueError("Only redis:// URLs are supported, got {}".format(url))
+        db = parts.path.strip("/")
+        return cls(
+            host=parts.hostname or "localhost",
+            port=parts.port or 6379,
+            password=parts.password,
+            db=int(db) if db else 0,
+            timeout=timeout,
+        )
+
+    def _connect(self):
+        self._sock = socket.create_connection((self.host, self.port), self.timeout)
+        self._reader = self._sock.makefile("rb")
+        if self.password is not None:
+            self._call(("AUTH", self.password))
+        if self.db != 0:
+            self._call(("SELECT", self.db))
+
+    def _call(self, args: Sequence[Arg]) -> Any:
+        assert self._sock is not None and self._reader is not None
+        self._sock.sendall(encode_command(args))
+        reply = read_reply(self._reader)
+        if isinstance(reply, RespError):
+            raise reply
+        return reply
+
+    def execute(self, *args: Arg) -> Any:
+        """
+        Send a command and return its reply. Raises RespError for an error reply,
+        and OSError when the server cannot be reached.
+        """
+        with self._lock:
+            for attempt in range(2):
+                try:
+                    if self._sock is None:
+                        self._connect()
+                    return self._call(args)
+                except (OSError, ConnectionError):
+                    self._close()
+                    if attempt > 0:
+                        raise
+        raise AssertionError("unreachable")
+
+    def _close(self):
+        if self._sock is not None:
+            try:
+                self._sock.close()
+            except OSError:
+                pass
+        self._sock = None
+        self._reader = None
+
+    def close(self):
+        with self._lock:
+            self._close()
@@ -0,0 +1,223 @@
+import sys
+import threading
+import time
+
+from collections import OrderedDict
+from typing import (
+    Any,
+    Callable,
+    Dict,
+    Hashable,
+    Iterable,
+    NamedTuple,
+    Optional,
+    Set,
+    Tuple,
+)
+from backend.utils.metrics import counter
+from backend import config
+
+"""
+An in-process cache of the results of the search filters that many users run with the
+same arguments, like the future flights and the staff reports.
+
+Each entry is tagged with the tables its query reads. `query()` and the inserts report the
+tables they write to with `invalidate()`, which drops only the entries tagged with them.
+The writes of a transaction are reported again once it ends, so that a result read by
+another request before the commit does not stay cached. Entries also expire after the TTL
+of their filter, which bounds how stale the results that depend on the clock can get.
+
+The invalidation only reaches the cache of the process that made the write. With several
+worker processes (or nodes), the others keep serving their results until the TTL runs
+out, so the TTL also bounds how stale a result can be after a write elsewhere.
+
+The cache is bounded by an estimate of the bytes held by the results, and evicts the
+least recently used ones first.
+"""
+
+
+class CachedResult(NamedTuple):
+    name: str
+    value: Any
+    tables: Tuple[str, ...]
+    size: int
+    expires_at: float
+
+
+class CacheStats:
+    def __init__(self, name: str):
+        self.hits = counter("result_cache_{}_hits".format(name))
+        self.misses = counter("result_cache_{}_misses".format(name))
+
+
+def get_size(value: Any) -> int:
+    """
+    Estimate the bytes held by a query result, made of tuples, lists and dicts of scalars.
+    """
+    size = sys.getsizeof(value)
+    if isinstance(value, (tuple, list)):
+        size += sum(get_size(item) for item in value)
+    elif isinstance(value, dict):
+        size += sum(get_size(key) + get_size(item) for key, item in value.items())
+    return size
+
+
+class ResultCache:
+    def __init__(self, max_bytes: int, clock: Callable[[], float] = time.monotonic):
+        assert max_bytes > 0
+        self.max_bytes = max_bytes
+        self.clock = clock
+        self._entries: "OrderedDict[Hashable, CachedResult]" = OrderedDict()
+        self._by_table: Dict[str, Set[Hashable]] = {}
+        # Bumped by every write, so that a result loaded across a write is not stored
+        self._versions: Dict[str, int] = {}
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._stats: Dict[str, CacheStats] = {}
+        self.hits = counter("result_cache_hits")
+        self.misses = counter("result_cache_misses")
+        self.evictions = counter("result_cache_evictions")
+        self.invalidations = counter("result_cache_invalidations")
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _get_stats(self, name: str) -> CacheStats:
+        stats = self._stats.get(name)
+        if stats is None:
+            stats = self._stats.setdefault(name, CacheStats(name))
+        return stats
+
+    def get_or_load(
+        self,
+        name: str,
+        key: Hashable,
+        tables: Iterable[str],
+        ttl: float,
+        load: Callable[[], Any],
+    ) -> Any:
+        """
+        Return the cached result for `key`, running `load` on a miss. `name` groups the
+        statistics, and `tables` are the tables that the result is read from.
+        """
+        tables = tuple(tables)
+        stats = self._get_stats(name)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and self.clock() < entry.expires_at:
+                self._entries.move_to_end(key)
+                hit = True
+            else:
+                hit = False
+                versions = [self._versions.get(table, 0) for table in tables]
+        if hit:
+            self.hits.increment()
+            stats.hits.increment()
+            return entry.value  # type: ignore
+        self.misses.increment()
+        stats.misses.increment()
+        value = load()
+        size = get_size(value)
+        with self._lock:
+            # Results that would push out a large part of the cache are not kept
+            if size > self.max_bytes // 4:
+                return value
+            if any(
+                self._versions.get(table, 0) != version
+                for table, version in zip(tables, versions)
+            ):
+                return value
+            self._remove(key)
+            self._entries[key] = CachedResult(
+                name, value, tables, size, self.clock() + ttl
+            )
+            for table in tables:
+                self._by_table.setdefault(table, set()).add(key)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._remove(next(iter(self._entries)))
+                self.evictions.increment()
+        return value
+
+    def _remove(self, key: Hashable):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        for table in entry.tables:
+            keys = self._by_table.get(table)
+            if keys is not None:
+                keys.discard(key)
+                if len(keys) == 0:
+                    del self._by_table[table]
+
+    def invalidate(self, tables: Iterable[str]):
+        """
+        Drop the results read from any of the tables, which were just written to.
+        """
+        with self._lock:
+            for table in tables:
+                self._versions[table] = self._versions.get(table, 0) + 1
+                for key in list(self._by_table.get(table, ())):
+                    self._remove(key)
+                    self.invalidations.increment()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._by_table.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        The hits and misses, overall and per filter, and the size of the cache.
+        """
+        with self._lock:
+            entries = len(self._entries)
+            size = self._bytes
+        return dict(
+            hits=self.hits.value,
+            misses=self.misses.value,
+            evictions=self.evictions.value,
+            invalidations=self.invalidations.value,
+            entries=entries,
+            bytes=size,
+            max_bytes=self.max_bytes,
+            filters={
+                name: dict(hits=stats.hits.value, misses=stats.misses.value)
+                for name, stats in list(self._stats.items())
+            },
+        )
+
+
+RESULTS = ResultCache(config.RESULT_CACHE_MAX_BYTES)
+
+
+class _PendingWrites(threading.local):
+    def __init__(self):
+        self.tables: Optional[Set[str]] = None
+
+
+_pending = _PendingWrites()
+
+
+def begin_writes():
+    """
+    Start collecting the tables written by the transaction of this thread.
+    """
+    _pending.tables = set()
+
+
+def record_write(table: str):
+    RESULTS.invalidate((table,))
+    if _pending.tables is not None:
+        _pending.tables.add(table)
+
+
+def end_writes():
+    """
+    Invalidate the tables written by the transaction again, now that it has ended.
+    """
+    tables, _pending.tables = _pending.tables, None
+    if tables:
+        RESULTS.invalidate(tables)
@@ -0,0 +1,95 @@
+import logging
+
+from decimal import Decimal, ROUND_HALF_UP
+from typing import Any, Optional, Sequence
+from pymysql.connections import Connection
+from pymysql.err import MySQLError
+from backend.utils.error import AirbookError
+from backend.utils.query import query, ADD_AGENT_DAILY_SALES, ADD_AIRLINE_DAILY_SALES
+
+"""
+Daily sales totals, kept up to date as tickets are sold so that the reports read a few
+rows per day instead of aggregating the whole ticket history.
+
+AgentDailySales holds the commission and the number of tickets of each booking agent per
+day, which the `agent_stats_last_month` and `agent_stats_last_year` views add up for
+the Top Agents page. AirlineDailySales holds the tickets sold by each airline per day,
+directly and through agents, and what the customers paid for them. The revenue report
+and the monthly sales of the staff are added up from it. The windows move forward a day
+at a time without any upkeep.
+
+Both tables are updated right after the purchase commits, each in a statement of its own,
+so that the lock on the row of the day is not held for the whole purchase. Otherwise every
+purchase for an airline on a given day would wait for the ones before it to commit. A total that
+fails to update is logged and left behind, and the purchase still succeeds. Those tickets,
+and tickets inserted in another way (like `scripts/sql/data.sql`), are counted again by
+`scripts/sql/rollups.sql`, which rebuilds the tables.
+"""
+
+LOG = logging.getLogger("airbook.sales")
+
+CENT = Decimal("0.01")
+
+
+def to_cents(value: Decimal) -> Decimal:
+    # Rounded like MySQL stores it in a DECIMAL(15,2), so that the totals add up to the same
+    return value.quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def record_agent_sales(
+    conn: Connection,
+    booking_agent_id: Any,
+    ticket_ID: int,
+    commissions: Sequence[Decimal],
+):
+    """
+    Count tickets sold together by a booking agent, `ticket_ID` being one of them. Run
+    after the purchase commits.
+    """
+    _add(
+        conn,
+        ADD_AGENT_DAILY_SALES,
+        dict(
+            booking_agent_id=booking_agent_id,
+            ticket_ID=ticket_ID,
+            commission=sum(commissions, Decimal(0)),
+            tickets=len(commissions),
+        ),
+    )
+
+
+def record_airline_sales(
+    conn: Connection,
+    ticket_ID: int,
+    prices: Sequence[Decimal],
+    commissions: Optional[Sequence[Decimal]] = None,
+):
+    """
+    Count tickets of one flight sold together, `ticket_ID` being one of them. The
+    commissions are only given for the tickets sold by booking agents. Run after the
+    purchase commits.
+    """
+    sales = sum((to_cents(price) for price in prices), Decimal(0))
+    if commissions is not None:
+        sales += sum(commissions, Decimal(0))
+    indirect = 0 if commissions is None else len(prices)
+    _add(
+        conn,
+        ADD_AIRLINE_DAILY_SALES,
+        dict(
+            ticket_ID=ticket_ID,
+            direct_tickets=len(prices) - indirect,
+            indirect_tickets=indirect,
+            sales=sales,
+        ),
+    )
+
+
+def _add(conn: Connection, sql: str, args: dict):
+    # The tickets are already sold, so a failure must not fail the purchase
+    try:
+        query(conn, sql, args=args)
+    except (AirbookError, MySQLError) as err:
+        LOG.warning(
+            "Failed to update the daily sales of ticket %s: %s", args["ticket_ID"], err
+        )
@@ -0,0 +1,129 @@
+import json
+
+from datetime import date, datetime, time, timedelta
+from decimal import Decimal
+from typing import Any, Callable, Dict, List, Optional, Sequence
+from pymysql.constants import FIELD_TYPE
+
+"""
+Serialize query results straight into a compact JSON response body.
+
+Rows are emitted once as JSON arrays, preceded by a typed column header built from
+`cursor.description`. Only the columns whose type has no native JSON representation
+(dates, times, decimals) go through a converter; everything else is handed to the
+C encoder as is.
+
+Dates and times are rendered the way `str()` renders them, and decimals are sent as
+strings so that no precision is lost, which is what the legacy format did too. The only
+difference is for TIME values of a day or more, which are written in hours, like MySQL
+writes them, instead of "1 day, ...".
+"""
+
+FIELD_TYPE_TO_NAME = {
+    FIELD_TYPE.DECIMAL: "decimal",
+    FIELD_TYPE.NEWDECIMAL: "decimal",
+    FIELD_TYPE.TINY: "int",
+    FIELD_TYPE.SHORT: "int",
+    FIELD_TYPE.LONG: "int",
+    FIELD_TYPE.LONGLONG: "int",
+    FIELD_TYPE.INT24: "int",
+    FIELD_TYPE.YEAR: "int",
+    FIELD_TYPE.FLOAT: "float",
+    FIELD_TYPE.DOUBLE: "float",
+    FIELD_TYPE.NULL: "null",
+    FIELD_TYPE.DATE: "date",
+    FIELD_TYPE.NEWDATE: "date",
+    FIELD_TYPE.TIME: "time",
+    FIELD_TYPE.DATETIME: "datetime",
+    FIELD_TYPE.TIMESTAMP: "datetime",
+    FIELD_TYPE.JSON: "json",
+}
+# Column types that pymysql returns as str, int, float or None
+NATIVE_TYPES = {"int", "float", "null", "string", "json"}
+
+
+def encode_timedelta(value: timedelta) -> str:
+    # Like str(timedelta), "5:20:15", but MySQL TIME values can exceed 24 hours, which
+    # str(timedelta) renders as "1 day, ..."
+    seconds = int(value.total_seconds())
+    sign = "-" if seconds < 0 else ""
+    hours, rest = divmod(abs(seconds), 3600)
+    return "{}{}:{:02d}:{:02d}".format(sign, hours, rest // 60, rest % 60)
+
+
+ENCODERS: Dict[type, Callable[[Any], Any]] = {
+    date: date.isoformat,
+    datetime: lambda value: value.isoformat(" "),
+    time: time.isoformat,
+    timedelta: encode_timedelta,
+    Decimal: str,
+    bytes: lambda value: value.decode("utf-8", "replace"),
+}
+
+
+def encode_value(value: Any) -> Any:
+    encoder = ENCODERS.get(type(value))
+    if encoder is not None:
+        return encoder(value)
+    if value is None or isinstance(value, (str, int, float)):
+        return value
+    return str(value)
+
+
+def column_type(type_code: int) -> str:
+    return FIELD_TYPE_TO_NAME.get(type_code, "string")
+
+
+def encode_columns(description: Optional[Sequence[Sequence[Any]]]) -> List[dict]:
+    if description is None:
+        return []
+    return [dict(name=column[0], type=column_type(column[1])) for column in description]
+
+
+def encode_rows(rows: Sequence[Sequence[Any]], columns: List[dict]) -> List[Any]:
+    converted = [
+        index
+        for index, column in enumerate(columns)
+        if column["type"] not in NATIVE_TYPES
+    ]
+    if len(columns) > 0 and len(converted) == 0:
+        # json encodes the row tuples as arrays directly
+        return list(rows)
+    if len(columns) == 0:
+        # Without a header we cannot tell which columns need converting
+        converted = list(range(len(rows[0]))) if len(rows) > 0 else []
+    result = []
+    for row in rows:
+        row = list(row)
+        for index in converted:
+            row[index] = encode_value(row[index])
+        result.append(row)
+    return result
+
+
+def dumps_rows(
+    rows: Optional[Sequence[Sequence[Any]]],
+    description: Optional[Sequence[Sequence[Any]]],
+    **extra: Any
+) -> str:
+    """
+    Render a successful search response with the rows encoded as compact JSON arrays.
+    """
+    columns = encode_columns(description)
+    return json.dumps(
+        dict(
+            result="success",
+            columns=columns,
+            data=encode_rows(rows or (), columns),
+            **extra
+        ),
+        separators=(",", ":"),
+    )
+
+
+def dumps_legacy(rows: Any) -> str:
+    """
+    The legacy format: the rows serialized into a pretty-printed string that is
+    embedded in the JSON response.
+    """
+    return json.dumps(rows, indent=4, sort_keys=True, default=str)
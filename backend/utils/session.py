@@ -0,0 +1,276 @@
+import json
+import os
+import random
+import secrets
+import sqlite3
+import threading
+import time
+
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from flask import Flask, Request, Response
+from flask.sessions import SessionInterface, SessionMixin
+from itsdangerous import BadSignature, Signer
+from werkzeug.datastructures import CallbackDict
+from backend.utils.lru import LRUCache
+from backend.utils.resp import RespClient
+from backend import config
+
+"""
+Sessions stored on the server, so that any worker process or node can serve any request.
+
+The session cookie only holds a random session ID, signed with SECRET_KEY. The session
+data is kept in a SessionStore under that ID:
+
+- MemorySessionStore: an LRU map in this process. Only for a single worker.
+- SQLiteSessionStore: a SQLite file, shared by the processes of one machine.
+- RespSessionStore: Redis or a server compatible with its protocol, shared by every node.
+
+Sessions expire SESSION_TTL seconds after the last request that used them. The data is
+stored as compact JSON, which is all a session holds.
+
+Clearing a session (at login and logout) also gives it a new ID, so that an ID known
+before the login cannot be used to take over the logged-in session.
+"""
+
+
+def dumps_session(data: Dict[str, Any]) -> bytes:
+    return json.dumps(data, separators=(",", ":")).encode("utf-8")
+
+
+def loads_session(data: bytes) -> Dict[str, Any]:
+    return json.loads(data.decode("utf-8"))
+
+
+class SessionStore(ABC):
+    @abstractmethod
+    def get(self, sid: str) -> Optional[bytes]:
+        pass
+
+    @abstractmethod
+    def set(self, sid: str, data: bytes, ttl: float):
+        pass
+
+    @abstractmethod
+    def touch(self, sid: str, ttl: float):
+        """
+        Make the session expire `ttl` seconds from now.
+        """
+
+    @abstractmethod
+    def delete(self, sid: str):
+        pass
+
+
+class MemorySessionStore(SessionStore):
+    def __init__(self, max_size: int, clock: Callable[[], float] = time.monotonic):
+        self.clock = clock
+        self._sessions: LRUCache[str, Tuple[bytes, float]] = LRUCache(
+            "session", max_size
+        )
+
+    def get(self, sid: str) -> Optional[bytes]:
+        entry = self._sessions.get(sid)
+        if entry is None:
+            return None
+        data, expires_at = entry
+        if self.clock() >= expires_at:
+            self._sessions.pop(sid)
+            return None
+        return data
+
+    def set(self, sid: str, data: bytes, ttl: float):
+        self._sessions.put(sid, (data, self.clock() + ttl))
+
+    def touch(self, sid: str, ttl: float):
+        data = self.get(sid)
+        if data is not None:
+            self.set(sid, data, ttl)
+
+    def delete(self, sid: str):
+        self._sessions.pop(sid)
+
+
+class SQLiteSessionStore(SessionStore):
+    # One write in PURGE_EVERY also deletes the expired sessions
+    PURGE_EVERY = 100
+
+    def __init__(self, path: str, clock: Callable[[], float] = time.time):
+        self.path = path
+        self.clock = clock
+        self._local = threading.local()
+        with self._conn() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS Session("
+                "id TEXT PRIMARY KEY, data BLOB NOT NULL, expires_at REAL NOT NULL)"
+            )
+
+    def _conn(self) -> sqlite3.Connection:
+        # sqlite3 connections cannot be shared between threads
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=5)
+            # Readers do not wait for the writers of the other processes
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+        return conn
+
+    def get(self, sid: str) -> Optional[bytes]:
+        row = (
+            self._conn()
+            .execute(
+                "SELECT data FROM Session WHERE id = ? AND expires_at > ?",
+                (sid, self.clock()),
+            )
+            .fetchone()
+        )
+        return None if row is None else bytes(row[0])
+
+    def set(self, sid: str, data: bytes, ttl: float):
+        now = self.clock()
+        with self._conn() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO Session(id, data, expires_at) VALUES (?, ?, ?)",
+                (sid, data, now + ttl),
+            )
+            if random.randrange(self.PURGE_EVERY) == 0:
+                conn.execute("DELETE FROM Session WHERE expires_at <= ?", (now,))
+
+    def touch(self, sid: str, ttl: float):
+        with self._conn() as conn:
+            conn.execute(
+                "UPDATE Session SET expires_at = ? WHERE id = ?",
+                (self.clock() + ttl, sid),
+            )
+
+    def delete(self, sid: str):
+        with self._conn() as conn:
+            conn.execute("DELETE FROM Session WHERE id = ?", (sid,))
+
+
+class RespSessionStore(SessionStore):
+    def __init__(self, client: RespClient, prefix: str = "airbook:session:"):
+        self.client = client
+        self.prefix = prefix
+
+    def get(self, sid: str) -> Optional[bytes]:
+        return self.client.execute("GET", self.prefix + sid)
+
+    def set(self, sid: str, data: bytes, ttl: float):
+        self.client.execute("SET", self.prefix + sid, data, "PX", int(ttl * 1000))
+
+    def touch(self, sid: str, ttl: float):
+        self.client.execute("PEXPIRE", self.prefix + sid, int(ttl * 1000))
+
+    def delete(self, sid: str):
+        self.client.execute("DEL", self.prefix + sid)
+
+
+def create_session_store(backend: str) -> SessionStore:
+    if backend == "memory":
+        return MemorySessionStore(config.SESSION_MEMORY_SIZE)
+    if backend == "sqlite":
+        return SQLiteSessionStore(config.SESSION_SQLITE_PATH)
+    if backend == "redis":
+        return RespSessionStore(RespClient.from_url(config.SESSION_REDIS_URL))
+    raise ValueError("The session backend {} is not supported.".format(backend))
+
+
+def get_secret_key(backend: str) -> str:
+    """
+    The key that signs the session IDs. The sessions of the other backends are shared by
+    several processes, which all have to sign them with the same key.
+    """
+    if config.SECRET_KEY:
+        return config.SECRET_KEY
+    if backend != "memory":
+        raise ValueError(
+            "AIRBOOK_SECRET_KEY has to be set for the {} session backend.".format(
+                backend
+            )
+        )
+    return os.urandom(16).hex()
+
+
+class ServerSession(CallbackDict, SessionMixin):
+    def __init__(
+        self, initial: Optional[Dict[str, Any]] = None, sid: str = "", new=False
+    ):
+        def on_update(self):
+            self.modified = True
+
+        super().__init__(initial, on_update)
+        self.sid = sid
+        self.new = new
+        self.modified = False
+        # The IDs this session had before it was cleared, to be deleted from the store
+        self.dropped_sids: List[str] = []
+
+    def clear(self):
+        super().clear()
+        if not self.new:
+            self.dropped_sids.append(self.sid)
+            self.sid = new_session_id()
+            self.new = True
+
+
+def new_session_id() -> str:
+    return secrets.token_urlsafe(32)
+
+
+class ServerSessionInterface(SessionInterface):
+    def __init__(self, store: SessionStore, ttl: float):
+        self.store = store
+        self.ttl = ttl
+
+    def _signer(self, app: Flask) -> Signer:
+        return Signer(app.secret_key, salt="airbook-session")
+
+    def open_session(self, app: Flask, request: Request) -> ServerSession:
+        signed = request.cookies.get(self.get_cookie_name(app))
+        if signed is None:
+            return ServerSession(sid=new_session_id(), new=True)
+        try:
+            sid = self._signer(app).unsign(signed).decode("utf-8")
+        except BadSignature:
+            return ServerSession(sid=new_session_id(), new=True)
+        data = self.store.get(sid)
+        if data is None:
+            return ServerSession(sid=new_session_id(), new=True)
+        return ServerSession(loads_session(data), sid=sid)
+
+    def save_session(
+        self, app: Flask, session: ServerSession, response: Response  # type: ignore
+    ):
+        name = self.get_cookie_name(app)
+        domain = self.get_cookie_domain(app)
+        path = self.get_cookie_path(app)
+        for sid in session.dropped_sids:
+            self.store.delete(sid)
+
+        if not session:
+            # The session was emptied, or cleared at logout
+            if session.modified:
+                if not session.new:
+                    self.store.delete(session.sid)
+                response.delete_cookie(name, domain=domain, path=path)
+            return
+
+        if session.modified:
+            self.store.set(session.sid, dumps_session(dict(session)), self.ttl)
+        elif app.config["SESSION_REFRESH_EACH_REQUEST"]:
+            # Sliding expiry: every request starts the TTL over
+            self.store.touch(session.sid, self.ttl)
+        else:
+            return
+
+        response.set_cookie(
+            name,
+            self._signer(app).sign(session.sid).decode("utf-8"),
+            max_age=int(self.ttl),
+            domain=domain,
+            path=path,
+            secure=self.get_cookie_secure(app),
+            httponly=self.get_cookie_httponly(app),
+            samesite=self.get_cookie_samesite(app),
+        )
@@ -0,0 +1,49 @@
+from typing import MutableMapping, Any
+from pymysql.connections import Connection
+from backend.utils.error import JsonError, QueryError
+from backend.utils.lru import LRUCache
+from backend.utils.query import query, FetchMode, STAFF_AIRLINE
+from backend import config
+
+"""
+The airline of each staff member, which every staff request needs and which practically
+never changes.
+
+The airline is kept in the session from the login on, so that it does not have to be
+queried again. Sessions that do not have it yet look it up in an in-process map first,
+and then with STAFF_AIRLINE. Nothing in the app changes the airline of a staff member,
+so the entries are never invalidated.
+"""
+
+AIRLINES: LRUCache[str, str] = LRUCache(
+    "staff_airline", config.STAFF_AIRLINE_CACHE_SIZE
+)
+
+
+def remember_staff_airline(session: MutableMapping[str, Any], airline_name: str):
+    """
+    Keep the airline of the staff member who just logged in or registered.
+    """
+    session["staff_airline"] = airline_name
+    AIRLINES.put(session["username"], airline_name)
+
+
+def get_staff_airline(conn: Connection, session: MutableMapping[str, Any]) -> str:
+    username = session["username"]
+    airline_name = session.get("staff_airline")
+    if airline_name is not None:
+        return airline_name
+
+    airline_name = AIRLINES.get(username)
+    if airline_name is None:
+        try:
+            row = query(
+                conn, STAFF_AIRLINE, FetchMode.ONE, args=dict(username=username)
+            )
+        except QueryError:
+            raise JsonError("An unknown error occurs when finding your airline name.")
+        if row is None:
+            raise JsonError("The user might have been removed!")
+        airline_name = row[0]
+    remember_staff_airline(session, airline_name)
+    return airline_name
@@ -0,0 +1,40 @@
+import re
+
+from typing import Any, Dict, Tuple
+
+"""
+A registry of the fixed statements that the backend runs over and over.
+
+PyMySQL only speaks the text protocol, so there is no COM_STMT_PREPARE to cache on the
+server. What we can save is the client-side work: each registered statement is compiled
+once from named (`%(email)s`) to positional (`%s`) placeholders, so `query()` escapes
+exactly the parameters the statement uses instead of every value of the argument dict
+(which, for the search filters, includes the whole session and filter payload).
+
+Register a statement by wrapping its constant with `prepare()`, which returns the SQL
+unchanged; `query()` looks the text up in STATEMENTS.
+"""
+
+PARAM_PATTERN = re.compile(r"%\((\w+)\)s")
+
+
+class PreparedStatement:
+    def __init__(self, sql: str):
+        self.text = sql
+        self.sql = PARAM_PATTERN.sub("%s", sql)
+        self.params: Tuple[str, ...] = tuple(PARAM_PATTERN.findall(sql))
+
+    def bind(self, args: Dict[str, Any]) -> Tuple[Any, ...]:
+        """
+        Order the arguments by placeholder. Raises KeyError if one is missing,
+        just like formatting the statement with the dict would.
+        """
+        return tuple(args[name] for name in self.params)
+
+
+STATEMENTS: Dict[str, PreparedStatement] = {}
+
+
+def prepare(sql: str) -> str:
+    STATEMENTS[sql] = PreparedStatement(sql)
+    return sql
@@ -0,0 +1,40 @@
+-- Add the daily sales totals to an existing database, and read the Top Agents views from
+-- them. Run rollups.sql afterwards to count the tickets sold so far.
+SELECT 'Adding the daily sales totals.' AS '';
+USE airbook;
+
+CREATE TABLE IF NOT EXISTS AgentDailySales(
+    booking_agent_ID INT NOT NULL,
+    sale_date DATE NOT NULL,
+    total_commission DECIMAL(15,2) NOT NULL DEFAULT 0,
+    total_tickets INT NOT NULL DEFAULT 0,
+    PRIMARY KEY(booking_agent_ID, sale_date),
+    INDEX(sale_date),
+    FOREIGN KEY (booking_agent_ID) REFERENCES BookingAgent(booking_agent_ID)
+);
+
+CREATE TABLE IF NOT EXISTS AirlineDailySales(
+    airline_name VARCHAR(20) NOT NULL,
+    sale_date DATE NOT NULL,
+    direct_tickets INT NOT NULL DEFAULT 0,
+    indirect_tickets INT NOT NULL DEFAULT 0,
+    total_sales DECIMAL(15,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY(airline_name, sale_date),
+    FOREIGN KEY (airline_name) REFERENCES Airline(airline_name)
+);
+
+DROP VIEW IF EXISTS agent_stats_last_month;
+CREATE VIEW agent_stats_last_month AS
+    SELECT temp.booking_agent_ID, total_commission, total_tickets, email
+    FROM (SELECT booking_agent_ID, SUM(total_commission) as total_commission, SUM(total_tickets) as total_tickets
+    FROM AgentDailySales WHERE sale_date > UTC_DATE() - INTERVAL 1 MONTH
+    GROUP BY booking_agent_ID) as temp NATURAL JOIN BookingAgent
+    ;
+
+DROP VIEW IF EXISTS agent_stats_last_year;
+CREATE VIEW agent_stats_last_year AS
+    SELECT temp.booking_agent_ID, total_commission, total_tickets, email
+    FROM (SELECT booking_agent_ID, SUM(total_commission) as total_commission, SUM(total_tickets) as total_tickets
+    FROM AgentDailySales WHERE sale_date > UTC_DATE() - INTERVAL 1 YEAR
+    GROUP BY booking_agent_ID) as temp NATURAL JOIN BookingAgent
+    ;
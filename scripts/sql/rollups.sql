@@ -0,0 +1,22 @@
+-- Rebuild the daily sales totals from the tickets, for the tickets that were not sold
+-- through the backend (like the ones of data.sql), or whose totals failed to update
+-- after the purchase (see the backend log). The backend keeps them up to date
+-- afterwards. On a database created before the totals, run add_daily_sales.sql first.
+SELECT 'Rebuilding the daily sales totals.' AS '';
+USE airbook;
+
+START TRANSACTION;
+DELETE FROM AgentDailySales;
+INSERT INTO AgentDailySales (booking_agent_ID, sale_date, total_commission, total_tickets)
+    SELECT booking_agent_id, purchase_date, SUM(commission), COUNT(*)
+    FROM spendings WHERE booking_agent_id IS NOT NULL
+    GROUP BY booking_agent_id, purchase_date
+    ;
+
+DELETE FROM AirlineDailySales;
+INSERT INTO AirlineDailySales (airline_name, sale_date, direct_tickets, indirect_tickets, total_sales)
+    SELECT airline_name, purchase_date, SUM(booking_agent_id IS NULL), SUM(booking_agent_id IS NOT NULL), SUM(actual_price)
+    FROM spendings
+    GROUP BY airline_name, purchase_date
+    ;
+COMMIT;
@@ -42,7 +42,7 @@ CREATE TABLE Flight(
 CREATE TABLE Customer(
     email VARCHAR(320),
     name VARCHAR(30),
-    password CHAR(60) NOT NULL,
+    password VARCHAR(255) NOT NULL,
     salt CHAR(32) NOT NULL,
     phone_number VARCHAR(30),
     date_of_birth DATE,
@@ -59,7 +59,7 @@ CREATE TABLE Customer(
 CREATE TABLE BookingAgent(
     booking_agent_ID INT AUTO_INCREMENT,
     email VARCHAR(320) NOT NULL UNIQUE,
-    password CHAR(60) NOT NULL,
+    password VARCHAR(255) NOT NULL,
     salt CHAR(32) NOT NULL,
     PRIMARY KEY(booking_agent_ID)
 );
@@ -95,6 +95,28 @@ CREATE TABLE Book(
     FOREIGN KEY (booking_agent_ID) REFERENCES BookingAgent(booking_agent_ID)
 );
 
+-- The commission and tickets of each booking agent per day of purchase, see backend/utils/sales.py
+CREATE TABLE AgentDailySales(
+    booking_agent_ID INT NOT NULL,
+    sale_date DATE NOT NULL,
+    total_commission DECIMAL(15,2) NOT NULL DEFAULT 0,
+    total_tickets INT NOT NULL DEFAULT 0,
+    PRIMARY KEY(booking_agent_ID, sale_date),
+    INDEX(sale_date),
+    FOREIGN KEY (booking_agent_ID) REFERENCES BookingAgent(booking_agent_ID)
+);
+
+-- The tickets sold by each airline per day of purchase and what the customers paid for them
+CREATE TABLE AirlineDailySales(
+    airline_name VARCHAR(20) NOT NULL,
+    sale_date DATE NOT NULL,
+    direct_tickets INT NOT NULL DEFAULT 0,
+    indirect_tickets INT NOT NULL DEFAULT 0,
+    total_sales DECIMAL(15,2) NOT NULL DEFAULT 0,
+    PRIMARY KEY(airline_name, sale_date),
+    FOREIGN KEY (airline_name) REFERENCES Airline(airline_name)
+);
+
 CREATE TABLE Feedback(
     flight_number INT(5) NOT NULL,
     dep_date DATE NOT NULL,
@@ -110,7 +132,7 @@ CREATE TABLE Feedback(
 
 CREATE TABLE AirlineStaff(
     username VARCHAR(30),
-    password CHAR(60) NOT NULL,
+    password VARCHAR(255) NOT NULL,
     salt CHAR(32) NOT NULL,
     first_name VARCHAR(20),
     last_name VARCHAR(20),
@@ -126,4 +148,4 @@ CREATE TABLE PhoneNumber(
     phone_number VARCHAR(30),
     PRIMARY KEY(username, phone_number),
     FOREIGN KEY (username) REFERENCES AirlineStaff(username)
-);
\ No newline at end of file
+);
\ No newline at end of file
@@ -0,0 +1,8 @@
+-- Widen the password columns of an existing database for the versioned hash format,
+-- which records the algorithm, its cost and the salt next to the hash.
+-- The old hashes keep working and are upgraded when their users log in.
+USE airbook;
+
+ALTER TABLE Customer MODIFY password VARCHAR(255) NOT NULL;
+ALTER TABLE BookingAgent MODIFY password VARCHAR(255) NOT NULL;
+ALTER TABLE AirlineStaff MODIFY password VARCHAR(255) NOT NULL;
@@ -25,17 +25,17 @@ CREATE VIEW future_flights AS
 DROP VIEW IF EXISTS agent_stats_last_month;
 CREATE VIEW agent_stats_last_month AS
     SELECT temp.booking_agent_ID, total_commission, total_tickets, email
-    FROM (SELECT booking_agent_ID, SUM(commission) as total_commission, COUNT(*) as total_tickets 
-    FROM spendings WHERE purchase_date > UTC_TIMESTAMP() - INTERVAL 1 MONTH 
-    AND booking_agent_id IS NOT NULL GROUP BY booking_agent_ID) as temp NATURAL JOIN BookingAgent
+    FROM (SELECT booking_agent_ID, SUM(total_commission) as total_commission, SUM(total_tickets) as total_tickets
+    FROM AgentDailySales WHERE sale_date > UTC_DATE() - INTERVAL 1 MONTH
+    GROUP BY booking_agent_ID) as temp NATURAL JOIN BookingAgent
     ;
 
 DROP VIEW IF EXISTS agent_stats_last_year;
 CREATE VIEW agent_stats_last_year AS
     SELECT temp.booking_agent_ID, total_commission, total_tickets, email
-    FROM (SELECT booking_agent_ID, SUM(commission) as total_commission, COUNT(*) as total_tickets 
-    FROM spendings WHERE purchase_date > UTC_TIMESTAMP() - INTERVAL 1 MONTH 
-    AND booking_agent_id IS NOT NULL GROUP BY booking_agent_ID) as temp NATURAL JOIN BookingAgent
+    FROM (SELECT booking_agent_ID, SUM(total_commission) as total_commission, SUM(total_tickets) as total_tickets
+    FROM AgentDailySales WHERE sale_date > UTC_DATE() - INTERVAL 1 YEAR
+    GROUP BY booking_agent_ID) as temp NATURAL JOIN BookingAgent
     ;
 
 DELIMITER [[
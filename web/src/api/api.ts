@@ -17,6 +17,7 @@ export const getPublicSearchURL = (filter: string) =>
   `${host}/search-public/${filter}`;
 export const getSearchURL = (filter: string) => `${host}/search/${filter}`;
 export const getTicketPriceURL = () => `${host}/ticket_price`;
+export const getTicketPricesURL = () => `${host}/ticket_prices`;
 export const getTicketPurchaseURL = () => `${host}/ticket_purchase`;
 export const getAddFeedbackURL = () => `${host}/add_feedback`;
 export const getCreateFlightURL = () => `${host}/create_flight`;
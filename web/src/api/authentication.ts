@@ -95,6 +95,52 @@ export function parseUserData(
   } as UserProp;
 }
 
+// The backend sets this cookie to the version of the user data it last sent
+const PROFILE_COOKIE = "airbook_profile";
+const PROFILE_STORAGE_KEY = "airbook_profile";
+
+type CachedProfile = { version: string; user_data: any };
+
+function getProfileCookie(): string | undefined {
+  const prefix = `${PROFILE_COOKIE}=`;
+  const cookie = document.cookie
+    .split("; ")
+    .find((cookie) => cookie.startsWith(prefix));
+  return cookie?.substring(prefix.length);
+}
+
+function loadCachedProfile(): CachedProfile | undefined {
+  try {
+    const cached = sessionStorage.getItem(PROFILE_STORAGE_KEY);
+    return cached === null ? undefined : JSON.parse(cached);
+  } catch {
+    return undefined;
+  }
+}
+
+function saveCachedProfile(data: { version?: string; user_data: any }) {
+  if (data.version === undefined) {
+    sessionStorage.removeItem(PROFILE_STORAGE_KEY);
+    return;
+  }
+  sessionStorage.setItem(
+    PROFILE_STORAGE_KEY,
+    JSON.stringify({ version: data.version, user_data: data.user_data })
+  );
+}
+
+function parseUserType(userType: string) {
+  switch (userType) {
+    case "cust":
+      return UserType.CUST;
+    case "agent":
+      return UserType.AGENT;
+    case "staff":
+      return UserType.STAFF;
+  }
+  return UserType.PUBLIC;
+}
+
 export async function login(props: LoginProp): Promise<ResponseProp> {
   let data = null;
   await axios
@@ -115,6 +161,7 @@ export async function login(props: LoginProp): Promise<ResponseProp> {
       }
       try {
         data.userData = parseUserData(props.loginType, data);
+        saveCachedProfile(data);
       } catch {
         data = { result: "error", message: "Recieved malformed user data." };
         return;
@@ -182,6 +229,7 @@ export async function register(props: RegisterProp): Promise<ResponseProp> {
 }
 
 export async function logout(): Promise<ResponseProp> {
+  sessionStorage.removeItem(PROFILE_STORAGE_KEY);
   return axios.post(getLogoutURL(), {}, useCredentials).then((res) => {
     const data = res.data;
     if (data.result === "error") {
@@ -194,34 +242,37 @@ export async function logout(): Promise<ResponseProp> {
 
 export async function fetchSession(): Promise<ResponseProp> {
   // If there is a session cookie presented in this session, we will login directly.
-  return axios.post(getFetchSessionURL(), {}, useCredentials).then((res) => {
-    const data = res.data;
-    if (data.result === "error") {
-      return data;
-    }
-    if (data !== undefined) {
-      try {
-        let userType = UserType.PUBLIC;
-        switch (data.user_data.user_type) {
-          case "cust":
-            userType = UserType.CUST;
-            break;
-          case "agent":
-            userType = UserType.AGENT;
-            break;
-          case "staff":
-            userType = UserType.STAFF;
-            break;
+  const cached = loadCachedProfile();
+  // Nothing changed since the user data was fetched, no need to ask again
+  if (cached !== undefined && cached.version === getProfileCookie()) {
+    return {
+      result: "success",
+      userData: parseUserData(parseUserType(cached.user_data.user_type), cached),
+    };
+  }
+  return axios
+    .post(getFetchSessionURL(), { version: cached?.version }, useCredentials)
+    .then((res) => {
+      const data = res.data;
+      if (data.result === "error") {
+        return data;
+      }
+      if (data !== undefined) {
+        try {
+          if (data.unchanged && cached !== undefined) {
+            data.user_data = cached.user_data;
+          }
+          const userType = parseUserType(data.user_data.user_type);
+          const userData = parseUserData(userType, data);
+          saveCachedProfile(data);
+          return { result: "success", userData: userData };
+        } catch {
+          return {
+            result: "error",
+            message: "Failed to parse the user data!",
+          };
         }
-        const userData = parseUserData(userType, data);
-        return { result: "success", userData: userData };
-      } catch {
-        return {
-          result: "error",
-          message: "Failed to parse the user data!",
-        };
       }
-    }
-    return { result: "error", message: "Recieved empty user data." };
-  }, handleError);
+      return { result: "error", message: "Recieved empty user data." };
+    }, handleError);
 }
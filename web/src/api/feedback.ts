@@ -46,7 +46,6 @@ export async function getFeedbacksByFlight(
       }
       if (!!data.data) {
         // The comment will be an array of arrays
-        data.data = JSON.parse(data.data);
         data.data = parseFeedbackData(data.data);
       }
       return data;
@@ -89,7 +88,6 @@ export const getFeedback = (
     .then(handleThen, handleError)
     .then((data: ResponseProp) => {
       if (!!data.data) {
-        data.data = JSON.parse(data.data);
         if (data.data.length > 0) {
           data.data = parseFeedbackData(data.data)[0];
         }
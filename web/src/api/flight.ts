@@ -7,7 +7,7 @@ import {
   getSearchURL,
   ResponseProp,
 } from "./api";
-import axios from "axios";
+import axios, { AxiosResponse } from "axios";
 import {
   AirplaneProp,
   AirportProp,
@@ -111,97 +111,129 @@ const parseAirplaneData = (airplaneData: Array<any>): AirplaneProp[] => {
   }, []);
 };
 
+type SearchPage = {
+  result: string;
+  message?: string;
+  data?: Array<any>;
+  next?: string | null;
+};
+
+// The flight filters return their rows a page at a time, along with the token
+// of the next page in "next". Pass it back as the cursor to load that page once
+// the user asks for more flights.
+export type FlightPage = ResponseProp<FlightProp[]> & { next?: string };
+
+async function postPage(
+  url: string,
+  filterData: object = {},
+  config?: typeof useCredentials,
+  cursor?: string
+): Promise<ResponseProp<Array<any>> & { next?: string }> {
+  const res: AxiosResponse<SearchPage> = await axios.post<SearchPage>(
+    url,
+    { filter_data: { ...filterData, cursor: cursor } },
+    config
+  );
+  if (res.data.result !== "success") {
+    return {
+      result: "error",
+      message: res.data.message ?? "Some errors occurred from the serverside.",
+    };
+  }
+  return {
+    result: "success",
+    data: res.data.data ?? [],
+    next: res.data.next ?? undefined,
+  };
+}
+
 const flightDataHandler = [
-  (res: any): ResponseProp<FlightProp[]> & { message: string } => {
+  (
+    data: ResponseProp<Array<any>> & { next?: string }
+  ): FlightPage & { message: string } => {
     // A message is required for the handler
-    const data = res.data;
-    if (data.result === "error") {
-      return data;
-    }
-    let flightData = JSON.parse(data.data ?? "") as Array<any>;
-    if (flightData !== undefined) {
+    if (data.result === "error" || data.data === undefined) {
       return {
-        result: "success",
-        message: "",
-        data: parseFlightData(flightData),
+        result: "error",
+        message: data.message ?? "Failed to parse the flight data.",
       };
     }
-    return { result: "error", message: "Failed to parse the flight data." };
+    return {
+      result: "success",
+      message: "",
+      data: parseFlightData(data.data),
+      next: data.next,
+    };
   },
   handleError,
 ];
 
-export function futureFlights(): Promise<ResponseProp<FlightProp[]>> {
-  return axios
-    .post<{ data?: string; result: string; message?: string }>(
-      getPublicSearchURL("all_future")
-    )
-    .then(...flightDataHandler);
+export function futureFlights(cursor?: string): Promise<FlightPage> {
+  return postPage(getPublicSearchURL("all_future"), {}, undefined, cursor).then(
+    ...flightDataHandler
+  );
 }
 
-export function previousFlights(): Promise<ResponseProp<FlightProp[]>> {
-  return axios
-    .post(
-      getSearchURL("advanced_flight"),
-      {
-        filter_data: {
-          dep_date_upper: convertDate(new Date()),
-          dep_time_upper: convertTime(new Date()),
-          filter_by_emails: true,
-        },
-      },
-      useCredentials
-    )
-    .then(...flightDataHandler);
+export function previousFlights(cursor?: string): Promise<FlightPage> {
+  return postPage(
+    getSearchURL("advanced_flight"),
+    {
+      dep_date_upper: convertDate(new Date()),
+      dep_time_upper: convertTime(new Date()),
+      filter_by_emails: true,
+    },
+    useCredentials,
+    cursor
+  ).then(...flightDataHandler);
 }
 
-export function custFutureFlights(): Promise<ResponseProp<FlightProp[]>> {
+export function custFutureFlights(cursor?: string): Promise<FlightPage> {
   let now = new Date();
-  return axios
-    .post<{ data?: string; result: string; message?: string }>(
-      getSearchURL("advanced_flight"),
-      {
-        filter_data: {
-          filter_by_emails: true,
-          dep_date_lower: convertDate(now),
-          dep_time_lower: convertTime(now),
-        },
-      },
-      useCredentials
-    )
-    .then(...flightDataHandler);
+  return postPage(
+    getSearchURL("advanced_flight"),
+    {
+      filter_by_emails: true,
+      dep_date_lower: convertDate(now),
+      dep_time_lower: convertTime(now),
+    },
+    useCredentials,
+    cursor
+  ).then(...flightDataHandler);
 }
 
 export function searchFlightsPublic(
-  props: FlightFilterProp
-): Promise<ResponseProp<FlightProp[]>> {
-  return axios
-    .post(getPublicSearchURL("advanced_flight"), {
-      filter_data: {
-        filter_by_emails: props.filterByEmails,
-        emails: props.emails,
-        is_customer: props.isCustomer,
-        flight_number: props.flightNumber,
-        dep_date_lower: convertDate(props.depTimeLower),
-        dep_date_upper: convertDate(props.depTimeUpper),
-        dep_time_lower: convertTime(props.depTimeLower),
-        dep_time_upper: convertTime(props.depTimeUpper),
-        arr_date_lower: convertDate(props.arrTimeLower),
-        arr_date_upper: convertDate(props.arrTimeUpper),
-        arr_time_lower: convertTime(props.arrTimeLower),
-        arr_time_upper: convertTime(props.arrTimeUpper),
-        dep_airport: props.depAirport,
-        dep_city: props.depCity,
-        arr_airport: props.arrAirport,
-        arr_city: props.arrCity,
-      },
-    })
-    .then(...flightDataHandler);
+  props: FlightFilterProp,
+  cursor?: string
+): Promise<FlightPage> {
+  return postPage(
+    getPublicSearchURL("advanced_flight"),
+    {
+      filter_by_emails: props.filterByEmails,
+      emails: props.emails,
+      is_customer: props.isCustomer,
+      flight_number: props.flightNumber,
+      dep_date_lower: convertDate(props.depTimeLower),
+      dep_date_upper: convertDate(props.depTimeUpper),
+      dep_time_lower: convertTime(props.depTimeLower),
+      dep_time_upper: convertTime(props.depTimeUpper),
+      arr_date_lower: convertDate(props.arrTimeLower),
+      arr_date_upper: convertDate(props.arrTimeUpper),
+      arr_time_lower: convertTime(props.arrTimeLower),
+      arr_time_upper: convertTime(props.arrTimeUpper),
+      dep_airport: props.depAirport,
+      dep_city: props.depCity,
+      arr_airport: props.arrAirport,
+      arr_city: props.arrCity,
+    },
+    undefined,
+    cursor
+  ).then(...flightDataHandler);
 }
 
 export function searchFlightsReturnPublic(
-  props: FlightFilterProp
-): Promise<ResponseProp<FlightProp[]>> {
+  props: FlightFilterProp,
+  cursor?: string
+): Promise<FlightPage> {
   if (!props.returnTimeUpper && !props.returnTimeLower) {
     return new Promise(() => {
       return {
@@ -224,13 +256,15 @@ export function searchFlightsReturnPublic(
       depTimeUpper: props.returnTimeUpper,
       depCity: props.arrCity,
       arrCity: props.depCity,
-    } as FlightFilterProp)
+    } as FlightFilterProp),
+    cursor
   );
 }
 
 export function searchFlightsReturn(
-  props: FlightFilterProp
-): Promise<ResponseProp<FlightProp[]>> {
+  props: FlightFilterProp,
+  cursor?: string
+): Promise<FlightPage> {
   if (
     props.returnTimeUpper === undefined &&
     props.returnTimeLower === undefined
@@ -256,40 +290,39 @@ export function searchFlightsReturn(
       depTimeUpper: props.returnTimeUpper,
       depCity: props.arrCity,
       arrCity: props.depCity,
-    } as FlightFilterProp)
+    } as FlightFilterProp),
+    cursor
   );
 }
 
 export function searchFlights(
-  props: FlightFilterProp
-): Promise<ResponseProp<FlightProp[]>> {
-  return axios
-    .post(
-      getSearchURL("advanced_flight"),
-      {
-        filter_data: {
-          filter_by_emails: props.filterByEmails,
-          filter_by_agent_id: props.filterByAgentID,
-          emails: props.emails,
-          is_customer: props.isCustomer,
-          flight_number: props.flightNumber,
-          dep_date_lower: convertDate(props.depTimeLower),
-          dep_date_upper: convertDate(props.depTimeUpper),
-          dep_time_lower: convertTime(props.depTimeLower),
-          dep_time_upper: convertTime(props.depTimeUpper),
-          arr_date_lower: convertDate(props.arrTimeLower),
-          arr_date_upper: convertDate(props.arrTimeUpper),
-          arr_time_lower: convertTime(props.arrTimeLower),
-          arr_time_upper: convertTime(props.arrTimeUpper),
-          dep_airport: props.depAirport,
-          dep_city: props.depCity,
-          arr_airport: props.arrAirport,
-          arr_city: props.arrCity,
-        },
-      },
-      useCredentials
-    )
-    .then(...flightDataHandler);
+  props: FlightFilterProp,
+  cursor?: string
+): Promise<FlightPage> {
+  return postPage(
+    getSearchURL("advanced_flight"),
+    {
+      filter_by_emails: props.filterByEmails,
+      filter_by_agent_id: props.filterByAgentID,
+      emails: props.emails,
+      is_customer: props.isCustomer,
+      flight_number: props.flightNumber,
+      dep_date_lower: convertDate(props.depTimeLower),
+      dep_date_upper: convertDate(props.depTimeUpper),
+      dep_time_lower: convertTime(props.depTimeLower),
+      dep_time_upper: convertTime(props.depTimeUpper),
+      arr_date_lower: convertDate(props.arrTimeLower),
+      arr_date_upper: convertDate(props.arrTimeUpper),
+      arr_time_lower: convertTime(props.arrTimeLower),
+      arr_time_upper: convertTime(props.arrTimeUpper),
+      dep_airport: props.depAirport,
+      dep_city: props.depCity,
+      arr_airport: props.arrAirport,
+      arr_city: props.arrCity,
+    },
+    useCredentials,
+    cursor
+  ).then(...flightDataHandler);
 }
 
 export async function getFlightByNumber(
@@ -318,7 +351,6 @@ export async function getFlightCustomers(
     )
     .then(handleThen, handleError)
     .then((data: ResponseProp) => {
-      data.data = JSON.parse(data.data);
       data.data = data.data.reduce(
         (
           accumulator: { email: string; name: string; tickets: number }[],
@@ -400,7 +432,6 @@ export async function fetchAirplanes(): Promise<ResponseProp<AirplaneProp[]>> {
     .post(getSearchURL("airline_planes"), {}, useCredentials)
     .then(handleThen, handleError)
     .then((data: ResponseProp) => {
-      data.data = JSON.parse(data.data);
       data.data = parseAirplaneData(data.data);
       return data;
     });
@@ -1,4 +1,9 @@
-import { getTicketPriceURL, getTicketPurchaseURL, ResponseProp } from "./api";
+import {
+  getTicketPriceURL,
+  getTicketPricesURL,
+  getTicketPurchaseURL,
+  ResponseProp,
+} from "./api";
 import { FlightPrimaryProp, PurchaseProp } from "./data";
 import { convertDate, parseFlightPrimary } from "./flight";
 import axios from "axios";
@@ -20,6 +25,23 @@ export function getFlightPrice(
     }, handleError);
 }
 
+// Quote many flights with one request. The prices are keyed by
+// "flightNumber,depDate,depTime" and are null for flights that do not exist.
+export function getFlightPrices(
+  flights: FlightPrimaryProp[]
+): Promise<ResponseProp<{ prices: Record<string, number | null> }>> {
+  return axios
+    .post(getTicketPricesURL(), { flights: flights.map(parseFlightPrimary) })
+    .then((res) => {
+      const data = res.data;
+      if (data.result === "error") {
+        return data;
+      } else {
+        return { result: "success", data: data.data };
+      }
+    }, handleError);
+}
+
 export function purchase(props: PurchaseProp): Promise<ResponseProp> {
   return axios
     .post(
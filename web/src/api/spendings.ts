@@ -101,7 +101,6 @@ export const getSpendingsByMonth = (
       if (data.result === "error") {
         return data;
       }
-      data.data = JSON.parse(data.data);
       data.data = data.data.reduce(
         (accumulator: SpendingsGroupProp[], current: Array<any>) => {
           const temp = {
@@ -138,7 +137,6 @@ export const getSpendingsByRange = (
       if (data.result === "error") {
         return data;
       } else {
-        data.data = JSON.parse(data.data);
         data.data = parseSpendingsData(data.data);
         return data;
       }
@@ -153,7 +151,6 @@ export const getTopCustomers = (): Promise<ResponseProp<TopResult>> => {
       if (data.result === "error") {
         return data;
       } else {
-        data.data = JSON.parse(data.data);
         data.data = parseTopCustomersData(data.data);
         return data;
       }
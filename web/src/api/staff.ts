@@ -1,8 +1,7 @@
 import axios from "axios";
 import { getSearchURL, ResponseProp } from "./api";
 import { useCredentials } from "./authentication";
-import { FlightProp } from "./data";
-import { searchFlights } from "./flight";
+import { FlightPage, searchFlights } from "./flight";
 import { handleError, handleThen } from "./utils";
 
 export interface TopAgentsResults {
@@ -128,7 +127,6 @@ export async function getBookingAgents(): Promise<
     .post(getSearchURL("top_agents"), {}, useCredentials)
     .then(handleThen, handleError)
     .then((data: ResponseProp) => {
-      data.data = JSON.parse(data.data);
       data.data = parseTopAgentsData(data.data);
       return data;
     });
@@ -141,20 +139,23 @@ export async function getFrequentCustomers(): Promise<
     .post(getSearchURL("frequent_cust"), {}, useCredentials)
     .then(handleThen, handleError)
     .then((data: ResponseProp) => {
-      data.data = JSON.parse(data.data);
       data.data = parseFrequentCustomerData(data.data);
       return data;
     });
 }
 
 export async function getCustomerFlights(
-  email: string
-): Promise<ResponseProp<FlightProp[]>> {
-  return searchFlights({
-    emails: [email],
-    filterByEmails: true,
-    depTimeUpper: new Date(), //We only want the previous flights
-  });
+  email: string,
+  cursor?: string
+): Promise<FlightPage> {
+  return searchFlights(
+    {
+      emails: [email],
+      filterByEmails: true,
+      depTimeUpper: new Date(), //We only want the previous flights
+    },
+    cursor
+  );
 }
 
 export async function getRevenue(): Promise<ResponseProp<RevenueProp[]>> {
@@ -162,7 +163,6 @@ export async function getRevenue(): Promise<ResponseProp<RevenueProp[]>> {
     .post(getSearchURL("revenue_compare"), {}, useCredentials)
     .then(handleThen, handleError)
     .then((data: ResponseProp) => {
-      data.data = JSON.parse(data.data);
       data.data = data.data.map((value: any) => {
         return {
           direct: value[0],
@@ -180,7 +180,6 @@ export async function getTopDestinations(): Promise<
     .post(getSearchURL("top_destinations"), {}, useCredentials)
     .then(handleThen, handleError)
     .then((data: ResponseProp) => {
-      data.data = JSON.parse(data.data);
       data.data = parseTopDestinationsData(data.data);
       return data;
     });
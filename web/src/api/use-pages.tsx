@@ -0,0 +1,68 @@
+import { useRef, useState } from "react";
+import { FlightProp } from "./data";
+import { FlightPage } from "./flight";
+
+type FetchPage = (cursor?: string) => Promise<FlightPage>;
+
+// The flights of a paginated search, one page at a time. `load` starts a new
+// search from its first page, and `loadMore` appends the next page, which is
+// undefined once there are no more flights. The responses of a search that was
+// replaced by another one are dropped.
+const usePages = (onError: (message: string) => void) => {
+  const [flights, setFlights] = useState<FlightProp[]>([]);
+  const [next, setNext] = useState<string>();
+  const [pending, setPending] = useState(false);
+  const current = useRef<FetchPage>();
+
+  const fetchPage = (fetch: FetchPage, cursor?: string) => {
+    setPending(true);
+    return fetch(cursor)
+      .then((res) => {
+        if (current.current !== fetch) {
+          console.log("Aborted stale request");
+        } else if (res.result === "error") {
+          onError(res.message ?? "Unknown errors occurred!");
+        } else {
+          const rows = res.data ?? [];
+          setFlights((flights) =>
+            cursor === undefined ? rows : flights.concat(rows)
+          );
+          setNext(res.next);
+        }
+        return res;
+      })
+      .finally(() => {
+        if (current.current === fetch) {
+          setPending(false);
+        }
+      });
+  };
+
+  const load = (fetchFirst: FetchPage) => {
+    // A new function for each search, even if it fetches the same pages
+    const fetch: FetchPage = (cursor) => fetchFirst(cursor);
+    current.current = fetch;
+    setFlights([]);
+    setNext(undefined);
+    return fetchPage(fetch);
+  };
+
+  const clear = () => {
+    current.current = undefined;
+    setFlights([]);
+    setNext(undefined);
+    setPending(false);
+  };
+
+  const fetch = current.current;
+  const loadMore =
+    fetch === undefined || next === undefined || pending
+      ? undefined
+      : () => {
+          fetchPage(fetch, next);
+        };
+
+  return { flights, pending, load, loadMore, clear };
+};
+
+export default usePages;
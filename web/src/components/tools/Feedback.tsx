@@ -2,23 +2,18 @@ import { useEffect, useState } from "react";
 import { Button, Card, ListGroup, Modal } from "react-bootstrap";
 import { FlightProp } from "../../api/data";
 import { previousFlights } from "../../api/flight";
+import usePages from "../../api/use-pages";
 import { parseISODate, parseISOTime } from "../../api/utils";
 import AlertMessage from "../AlertMessage";
 import FeedbackForm, { FeedbackFormProp } from "../FeedbackForm";
 
 export default function Feekback() {
-  const [flights, setFlights] = useState<FlightProp[]>([]);
   const [currentFlight, setCurrentFlight] = useState<FlightProp>();
   const [show, setShow] = useState(false);
   const [errorMessage, setErrorMessage] = useState("");
+  const pages = usePages(setErrorMessage);
   useEffect(() => {
-    previousFlights().then((res) => {
-      if (res.result === "error") {
-        setErrorMessage(res.message ?? "A network error occurred");
-        return;
-      }
-      setFlights(res.data ?? []);
-    });
+    pages.load(previousFlights);
   }, []);
 
   const handleCommentSubmit = (data: FeedbackFormProp) => {
@@ -26,7 +21,7 @@ export default function Feekback() {
   };
   return (
     <div className="card-flex-container">
-      {flights.map((value, index) => {
+      {pages.flights.map((value, index) => {
         return (
           <Card key={index}>
             <Card.Header>Flight #{value.flightNumber}</Card.Header>
@@ -75,6 +70,11 @@ export default function Feekback() {
           )}
         </Modal.Body>
       </Modal>
+      {pages.loadMore !== undefined && (
+        <Button variant="outline-primary" onClick={pages.loadMore}>
+          Load more
+        </Button>
+      )}
       <AlertMessage message={errorMessage} />
     </div>
   );
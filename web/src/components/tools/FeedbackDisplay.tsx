@@ -1,8 +1,9 @@
 import { useEffect, useState } from "react";
 import { Button, Card, ListGroup, ListGroupItem, Modal } from "react-bootstrap";
-import { FeedbackProp, FlightPrimaryProp, FlightProp } from "../../api/data";
+import { FeedbackProp, FlightPrimaryProp } from "../../api/data";
 import { searchFlights } from "../../api/flight";
 import { getFeedbacksByFlight } from "../../api/feedback";
+import usePages from "../../api/use-pages";
 import {
   handleError,
   handleThen,
@@ -15,7 +16,7 @@ import { HandThumbsDownFill, HandThumbsUpFill } from "react-bootstrap-icons";
 export default function FeedbackDisplay() {
   const [show, setShow] = useState(false);
   const [errorMessage, setErrorMessage] = useState("");
-  const [flights, setFlights] = useState<FlightProp[]>([]);
+  const pages = usePages(setErrorMessage);
   const [feedbacks, setFeedbacks] = useState<FeedbackProp[]>([]);
   const [totalRating, setTotalRating] = useState(0);
 
@@ -37,25 +38,21 @@ export default function FeedbackDisplay() {
   };
 
   useEffect(() => {
-    searchFlights({ depTimeUpper: new Date() }).then((res) => {
-      if (res.result === "error") {
-        setErrorMessage(res.message ?? "Some unknown errors occurred");
-        return;
-      }
-      if (res.data?.length === 0 || res.data === undefined) {
-        setFlights([]);
-        setErrorMessage("No ratings to show here.");
-      } else {
-        setFlights(res.data);
-      }
-    });
+    const now = new Date();
+    pages
+      .load((cursor) => searchFlights({ depTimeUpper: now }, cursor))
+      .then((res) => {
+        if (res.result !== "error" && res.data?.length === 0) {
+          setErrorMessage("No ratings to show here.");
+        }
+      });
   }, []);
 
   return (
     <div>
       <AlertMessage message={errorMessage} />
       <div className="card-flex-container">
-        {flights.map((value, index) => {
+        {pages.flights.map((value, index) => {
           return (
             <Card key={index}>
               <Card.Header>{value.flightNumber}</Card.Header>
@@ -85,6 +82,11 @@ export default function FeedbackDisplay() {
           );
         })}
       </div>
+      {pages.loadMore !== undefined && (
+        <Button variant="outline-primary" onClick={pages.loadMore}>
+          Load more
+        </Button>
+      )}
       <Modal
         show={show}
         size="lg"
@@ -35,6 +35,8 @@ export const getFlightKeys = () => keys;
 export default function FlightTable(props: {
   flights: FlightProp[];
   pending: boolean;
+  // Loads the next page of the flights, if there is one
+  onLoadMore?: () => void;
 }) {
   const [show, setShow] = useState(false);
   const [flight, setFlight] = useState<FlightProp>();
@@ -153,6 +155,11 @@ export default function FlightTable(props: {
       </Modal>
       <HintMessage control={props.pending} message="Loading..." />
       <NothingHere control={!props.pending && props.flights.length === 0} />
+      {!props.pending && props.onLoadMore !== undefined && (
+        <Button variant="outline-primary" onClick={props.onLoadMore}>
+          Load more
+        </Button>
+      )}
     </div>
   );
 }
@@ -1,13 +1,12 @@
 import { useEffect, useState } from "react";
 import { Button, Modal, Table } from "react-bootstrap";
-import { FlightProp } from "../../api/data";
 import {
   FrequentCustomerProp,
   getCustomerFlights,
   getFrequentCustomers,
 } from "../../api/staff";
 import { useAuth } from "../../api/use-auth";
-import useIncrement from "../../api/use-increment";
+import usePages from "../../api/use-pages";
 import { handleError } from "../../api/utils";
 import AlertMessage from "../AlertMessage";
 import FlightTable from "./FlightTable";
@@ -18,9 +17,7 @@ export default function FrequentCustomers() {
   const auth = useAuth();
   const [error, setError] = useState("");
   const [show, setShow] = useState(false);
-  const { count, increment } = useIncrement();
-  const [pending, setPending] = useState(false);
-  const [flights, setFlights] = useState<FlightProp[]>([]);
+  const flightPages = usePages(setError);
   const [customersData, setCustomersData] = useState<FrequentCustomerProp[]>(
     []
   );
@@ -36,28 +33,8 @@ export default function FrequentCustomers() {
   }, []);
 
   const fetchCustomerFlights = (email: string) => {
-    increment();
     setShow(true);
-    setPending(true);
-    setFlights([]);
-    const current = count;
-    getCustomerFlights(email)
-      .then((res) => {
-        if (count !== current) {
-          return;
-        }
-        if (res.result === "error") {
-          setError(res.message ?? "Some unknown errors occurred!");
-        } else {
-          setFlights(res.data ?? []);
-        }
-      }, handleError)
-      .finally(() => {
-        if (count !== current) {
-          return;
-        }
-        setPending(false);
-      });
+    flightPages.load((cursor) => getCustomerFlights(email, cursor));
   };
 
   return (
@@ -100,7 +77,11 @@ export default function FrequentCustomers() {
           </Modal.Title>
         </Modal.Header>
         <Modal.Body>
-          <FlightTable pending={pending} flights={flights} />
+          <FlightTable
+            pending={flightPages.pending}
+            flights={flightPages.flights}
+            onLoadMore={flightPages.loadMore}
+          />
         </Modal.Body>
       </Modal>
     </div>
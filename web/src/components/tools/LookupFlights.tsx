@@ -3,14 +3,14 @@ import { Controller, useForm } from "react-hook-form";
 import { forwardRef, useState } from "react";
 import {
   FlightFilterProp,
+  FlightPage,
   searchFlights,
   searchFlightsPublic,
   searchFlightsReturn,
   searchFlightsReturnPublic,
 } from "../../api/flight";
-import { FlightProp } from "../../api/data";
 import FlightTable from "./FlightTable";
-import useIncrement from "../../api/use-increment";
+import usePages from "../../api/use-pages";
 import { useAuth } from "../../api/use-auth";
 import { UserType } from "../../api/authentication";
 import RangePicker from "../RangePicker";
@@ -22,89 +22,37 @@ export default function LookupFlights() {
     control,
     formState: { errors },
   } = useForm<FlightFilterProp>();
-  const [flights, setFlights] = useState<FlightProp[]>([]);
-  const [returns, setReturns] = useState<FlightProp[]>([]);
-  const [pending, setPending] = useState(false);
   const [lookupError, setLookupError] = useState("");
-  const { count, increment } = useIncrement();
+  const flightPages = usePages(setLookupError);
+  const returnPages = usePages(setLookupError);
   const auth = useAuth();
 
   const handleSearch = (props: FlightFilterProp) => {
-    setPending(true);
-    setFlights([]);
-    setReturns([]);
-    increment();
-    const currentCount = count;
-    if (auth.userProp.userType === UserType.PUBLIC) {
-      setTimeout(() => {
-        if (!!props.returnTimeLower || !!props.returnTimeUpper) {
-          searchFlightsReturnPublic(props).then((res) => {
-            if (currentCount === count) {
-              console.log("Aborted on stale search.");
-            }
-            if (res.data !== undefined && res.result !== "error") {
-              setReturns(res.data);
-              setLookupError("");
-            } else {
-              setLookupError(res.message ?? "Some errors occurred!");
-            }
-          });
-        }
-        searchFlightsPublic(props)
-          .then((res) => {
-            if (currentCount === count) {
-              console.log("Aborted on stale search.");
-            }
-            if (res.data !== undefined && res.result !== "error") {
-              setFlights(res.data);
-              setLookupError("");
-            } else {
-              setLookupError(res.message ?? "Some errors occurred!");
-            }
-          })
-          .finally(() => {
-            if (currentCount !== count) {
-              console.log("Aborted on stale search.");
-            }
-            setPending(false);
-          });
-      }, 200);
-    } else {
-      setTimeout(() => {
-        if (!!props.returnTimeLower || !!props.returnTimeUpper) {
-          searchFlightsReturn(props).then((res) => {
-            if (currentCount === count) {
-              console.log("Aborted on stale search.");
-            }
-            if (res.data !== undefined && res.result !== "error") {
-              setReturns(res.data);
-              setLookupError("");
-            } else {
-              setLookupError(res.message ?? "Some errors occurred!");
-            }
-          });
-        }
-        searchFlights(props)
-          .then((res) => {
-            if (currentCount === count) {
-              console.log("Aborted on stale search.");
-            }
-            if (res.data !== undefined && res.result !== "error") {
-              setFlights(res.data);
-              setLookupError("");
-            } else {
-              setLookupError(res.message ?? "Some errors occurred!");
-            }
-          })
-          .finally(() => {
-            if (currentCount !== count) {
-              console.log("Aborted on stale search.");
-            }
-            setPending(false);
-          });
-      }, 200);
-    }
-    return;
+    const isPublic = auth.userProp.userType === UserType.PUBLIC;
+    const handleResponse = (res: FlightPage) => {
+      if (res.result !== "error") {
+        setLookupError("");
+      }
+    };
+    returnPages.clear();
+    setTimeout(() => {
+      if (!!props.returnTimeLower || !!props.returnTimeUpper) {
+        returnPages
+          .load((cursor) =>
+            isPublic
+              ? searchFlightsReturnPublic(props, cursor)
+              : searchFlightsReturn(props, cursor)
+          )
+          .then(handleResponse);
+      }
+      flightPages
+        .load((cursor) =>
+          isPublic
+            ? searchFlightsPublic(props, cursor)
+            : searchFlights(props, cursor)
+        )
+        .then(handleResponse);
+    }, 200);
   };
 
   return (
@@ -221,9 +169,17 @@ export default function LookupFlights() {
         <FormSubmit buttonMessage="Search" errorMessage={lookupError} />
       </Form>
       <h5 style={{ color: "green" }}>One-way</h5>
-      <FlightTable flights={flights} pending={pending} />
+      <FlightTable
+        flights={flightPages.flights}
+        pending={flightPages.pending}
+        onLoadMore={flightPages.loadMore}
+      />
       <h5 style={{ color: "green" }}>Round Trips</h5>
-      <FlightTable flights={returns} pending={pending} />
+      <FlightTable
+        flights={returnPages.flights}
+        pending={returnPages.pending}
+        onLoadMore={returnPages.loadMore}
+      />
     </div>
   );
 }
@@ -1,17 +1,17 @@
 import FlightTable from "./FlightTable";
 //import { useAuth } from "../../api/use-auth";
-import { FlightProp } from "../../api/data";
 import {
   custFutureFlights,
   FlightFilterProp,
+  FlightPage,
   futureFlights,
   searchFlights,
   searchFlightsPublic,
 } from "../../api/flight";
 import useIncrement from "../../api/use-increment";
+import usePages from "../../api/use-pages";
 import { useEffect, useState } from "react";
 import { useAuth } from "../../api/use-auth";
-import { ResponseProp } from "../../api/api";
 import { UserType } from "../../api/authentication";
 import { Form } from "react-bootstrap";
 import { useForm } from "react-hook-form";
@@ -20,10 +20,9 @@ import FormSubmit from "../FormSubmit";
 import HintMessage from "../HintMessage";
 
 export default function ViewFlights() {
-  const [flights, setFlights] = useState<FlightProp[]>([]);
-  const [pending, setPending] = useState(false);
   const [tipMessage, setTipMessage] = useState("");
   const [errorMessage, setErrorMessage] = useState("");
+  const pages = usePages(setErrorMessage);
   const { count, increment } = useIncrement();
   const {
     handleSubmit,
@@ -40,58 +39,51 @@ export default function ViewFlights() {
 
   const loadFlights = (data: FlightFilterProp) => {
     const currentCount = count;
-    setPending(true);
     setTipMessage("");
     increment();
-    setFlights([]);
 
-    const handleResponse = (res: ResponseProp) => {
-      if (currentCount !== count) {
-        console.log("Aborted stale request");
-        return;
-      }
-      if (res.result === "error") {
-        setErrorMessage(res.message ?? "Unknown errors occurred!");
-      } else {
+    const handleResponse = (res: FlightPage) => {
+      if (res.result !== "error") {
         setErrorMessage("");
-        setFlights(res.data);
       }
       //const auth = useAuth();
     };
 
-    const handleFinally = () => {
-      if (currentCount !== count) {
-        console.log("Aborted stale finally.");
-        return;
-      }
-      setPending(false);
-    };
-
+    // Every page of the search uses the same bounds as the first one
+    let now = new Date();
     if (currentCount > 0) {
       if (auth.userProp.userType === UserType.PUBLIC) {
-        searchFlightsPublic(data).then(handleResponse).finally(handleFinally);
+        pages
+          .load((cursor) => searchFlightsPublic(data, cursor))
+          .then(handleResponse);
       } else if (auth.userProp.userType === UserType.CUST) {
         setTipMessage("Showing your flights within the specified range.");
-        searchFlights({ ...data, filterByEmails: true })
-          .then(handleResponse)
-          .finally(handleFinally);
+        pages
+          .load((cursor) =>
+            searchFlights({ ...data, filterByEmails: true }, cursor)
+          )
+          .then(handleResponse);
       } else if (auth.userProp.userType === UserType.AGENT) {
         setTipMessage("Showing your flights within the specified range.");
-        searchFlights({ ...data, filterByAgentID: true })
-          .then(handleResponse)
-          .finally(handleFinally);
+        pages
+          .load((cursor) =>
+            searchFlights({ ...data, filterByAgentID: true }, cursor)
+          )
+          .then(handleResponse);
       } else {
         setTipMessage(
           `Flights operated by ${auth.userProp.airlineName} within the specified range.`
         );
-        searchFlights(data).then(handleResponse).finally(handleFinally);
+        pages
+          .load((cursor) => searchFlights(data, cursor))
+          .then(handleResponse);
       }
       return;
     }
 
     if (auth.userProp.userType === UserType.CUST) {
       setTipMessage(`All your future flights.`);
-      custFutureFlights().then(handleResponse).finally(handleFinally);
+      pages.load(custFutureFlights).then(handleResponse);
     } else if (auth.userProp.userType === UserType.STAFF) {
       setTipMessage(
         `Flights operated by ${auth.userProp.airlineName} in the next 30 days.`
@@ -99,17 +91,21 @@ export default function ViewFlights() {
       // By default, we filter only the flights in the next 30 days
       let next = new Date();
       next.setUTCDate(next.getUTCDate() + 30);
-      searchFlights({ depTimeLower: new Date(), depTimeUpper: next })
-        .then(handleResponse)
-        .finally(handleFinally);
+      pages
+        .load((cursor) =>
+          searchFlights({ depTimeLower: now, depTimeUpper: next }, cursor)
+        )
+        .then(handleResponse);
     } else if (auth.userProp.userType === UserType.AGENT) {
       setTipMessage(`All the future flights purchased for customers.`);
-      searchFlights({ depTimeLower: new Date(), filterByAgentID: true })
-        .then(handleResponse)
-        .finally(handleFinally);
+      pages
+        .load((cursor) =>
+          searchFlights({ depTimeLower: now, filterByAgentID: true }, cursor)
+        )
+        .then(handleResponse);
     } else {
       setTipMessage(`Future flights on the system.`);
-      futureFlights().then(handleResponse).finally(handleFinally);
+      pages.load(futureFlights).then(handleResponse);
     }
   };
 
@@ -138,7 +134,11 @@ export default function ViewFlights() {
       </Form>
       <h5>{tipMessage}</h5>
       {!firstLoaded && !auth.authPending ? (
-        <FlightTable flights={flights} pending={pending} />
+        <FlightTable
+          flights={pages.flights}
+          pending={pages.pending}
+          onLoadMore={pages.loadMore}
+        />
       ) : (
         <HintMessage message="Validating..." control={true} />
       )}